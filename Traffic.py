@@ -269,6 +269,7 @@ class TrafficSystem(CoupledDEVS):
         print("success to connect [TrafficLight.buffer_out] -> [policeman.proc_in]")
         self.connectPorts(self.policeman.proc_out, self.trafficLight.state_in)
         print("success to connect [policeman.proc_out] -> [TrafficLight.state_in]")
+        self.select_order = [self.trafficLight, self.policeman]
 
     def select(self, immChildren):
         if self.trafficLight in immChildren:  # Prioritize TrafficLight over Policeman
@@ -286,6 +287,7 @@ class G_BPmodel(CoupledDEVS):
 
         self.connectPorts(self.generator.gen_outport, self.TrafficSystem.TrafficSystem_in)
         print("success to connect [gen_outport] -> [TrafficSystem_in]")
+        self.select_order = [self.generator, self.TrafficSystem]
 
     def select(self, imm):
         if self.generator in imm:
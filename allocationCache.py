@@ -0,0 +1,155 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+On-disk cache of initial allocations, keyed by the structure of the model
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+def atomicModels(model):
+    """
+    Get all atomic models in a model, both before and after direct connection.
+
+    :param model: the root model
+    :returns: list -- the atomic models
+    """
+    atomics = []
+    worklist = [model]
+    while worklist:
+        current = worklist.pop()
+        if hasattr(current, "component_set"):
+            worklist.extend(current.component_set)
+        else:
+            atomics.append(current)
+    return atomics
+
+def reachedInports(outport):
+    """
+    Get the input ports of atomic models that an output port of an atomic model is connected to,
+    following the connections through coupled models as direct connection does.
+
+    :param outport: the output port of an atomic model
+    :returns: set -- the input ports of atomic models
+    """
+    reached = set()
+    visited = set()
+    worklist = list(outport.outline)
+    while worklist:
+        port = worklist.pop()
+        if port in visited:
+            continue
+        visited.add(port)
+        if hasattr(port.host_DEVS, "component_set"):
+            worklist.extend(port.outline)
+        else:
+            reached.add(port)
+    return reached
+
+def structureHash(model, kernels):
+    """
+    Compute a hash of the structure of a model: the atomic models, their ports and their
+    direct connections, together with the number of kernels. The connections are always
+    flattened from the coupled models, so the hash is the same before and after direct connection.
+    The transfer functions and the states of the models are not part of the structure.
+
+    :param model: the root model
+    :param kernels: the number of kernels to allocate over
+    :returns: string -- the hexadecimal hash
+    """
+    lines = ["K %i" % kernels]
+    for aDEVS in sorted(atomicModels(model), key=lambda m: m.getModelFullName()):
+        cls = type(aDEVS)
+        lines.append("M %s %s.%s" % (aDEVS.getModelFullName(), 
+                                     cls.__module__, 
+                                     cls.__name__))
+        lines.extend(sorted(["I %s" % port.getPortName() for port in aDEVS.IPorts]))
+        for outport in aDEVS.OPorts:
+            lines.append("O %s" % outport.getPortName())
+            lines.extend(sorted(["C %s %s" % (outport.getPortFullName(), inport.getPortFullName())
+                                 for inport in reachedInports(outport)]))
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+class AllocationCache(object):
+    """
+    Stores allocations as JSON files in a directory, one file per model structure.
+    Models are identified by their full name, so the cache remains valid if model IDs change.
+    """
+    def __init__(self, directory):
+        """
+        Constructor
+
+        :param directory: the directory to store the allocations in, created if it doesn't exist
+        """
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def getPath(self, key):
+        """
+        Get the file that holds the allocations for a structure.
+
+        :param key: the structure hash
+        :returns: string -- the path of the file
+        """
+        return os.path.join(self.directory, "allocation_%s.json" % key)
+
+    def load(self, key, model_ids):
+        """
+        Load the allocations for a structure.
+
+        :param key: the structure hash
+        :param model_ids: list of all models, indexed by their model ID
+        :returns: dict -- mapping model IDs to their kernel, or None if nothing was cached
+        """
+        try:
+            with open(self.getPath(key), 'r') as f:
+                saved = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        locations = saved["allocations"]
+        allocations = {}
+        for model in model_ids:
+            name = model.getModelFullName()
+            if name not in locations:
+                # Hash collision or a damaged file, so don't trust it
+                self.misses += 1
+                return None
+            allocations[model.model_id] = locations[name]
+        self.hits += 1
+        return allocations
+
+    def store(self, key, allocations, model_ids):
+        """
+        Store the allocations for a structure. The file is replaced atomically, so concurrent
+        simulations never read a partially written file.
+
+        :param key: the structure hash
+        :param allocations: dict mapping model IDs to their kernel
+        :param model_ids: list of all models, indexed by their model ID
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        locations = {}
+        for model_id, location in allocations.items():
+            locations[model_ids[model_id].getModelFullName()] = location
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"allocations": locations}, f)
+        os.rename(tmp, self.getPath(key))
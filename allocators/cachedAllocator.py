@@ -0,0 +1,83 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Allocator wrapper that reuses the allocations of an earlier simulation of the same model structure
+"""
+
+from pypdevs.allocationCache import AllocationCache, atomicModels, structureHash
+
+class CachedAllocator(object):
+    """
+    Wraps another allocator and caches its allocations on disk, keyed by the structure of the model.
+    If the cache holds allocations for the model, the termination time is 0, so the simulator uses
+    them as a static allocation: there is no warmup run and the wrapped allocator is never called.
+    Use it as any other allocator, e.g.:
+
+        sim.setInitialAllocator(CachedAllocator(MyAllocator(), "allocations", model, 4))
+    """
+    def __init__(self, allocator, directory, model, kernels):
+        """
+        Constructor
+
+        :param allocator: the allocator to use if nothing was cached
+        :param directory: the directory of the cache
+        :param model: the root model, before or after direct connection
+        :param kernels: the number of kernels to allocate over
+        """
+        self.allocator = allocator
+        self.cache = AllocationCache(directory)
+        self.model = model
+        self.kernels = kernels
+        self.key = None
+        self.allocations = None
+
+    def lookup(self):
+        """
+        Look up the allocations of the model in the cache, once the model is complete.
+        """
+        if self.key is None:
+            self.key = structureHash(self.model, self.kernels)
+            self.allocations = self.cache.load(self.key, atomicModels(self.model))
+
+    def allocate(self, models, edges, nrnodes, total_activities):
+        """
+        Calculate allocations for the nodes, using the information provided.
+
+        :param models: the models to allocate
+        :param edges: the edges between the models
+        :param nrnodes: the number of nodes to allocate over. Simply an upper bound!
+        :param total_activities: activity tracking information from each model
+        :returns: allocation that was found
+        """
+        self.lookup()
+        if self.allocations is None:
+            self.allocations = self.allocator.allocate(models, edges, nrnodes, total_activities)
+            self.cache.store(self.key,
+                             self.allocations,
+                             {model.model_id: model for model in models})
+        return self.allocations
+
+    def getTerminationTime(self):
+        """
+        Returns the time it takes for the allocator to make an 'educated guess' of the advised allocation.
+        This is 0 if the allocations are cached, so no warmup is needed.
+
+        :returns: float -- the time at which to perform the allocations
+        """
+        self.lookup()
+        if self.allocations is not None:
+            return 0.0
+        return self.allocator.getTerminationTime()
@@ -0,0 +1,261 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Multilevel graph partitioning allocator, minimising the number of messages between kernels while balancing their load
+"""
+
+import heapq
+import random
+
+class MultilevelAllocator(object):
+    """
+    Allocate all models with a multilevel graph partitioner: the event graph is coarsened by
+    repeatedly merging the pairs of models that exchange most messages, the coarsest graph is
+    partitioned greedily, and the partition is refined on every level while projecting it back.
+    Models without any messages are merged by weight, so coarsening also makes progress on
+    models that were not connected or silent during the warmup.
+    The load of a model is its activity, or 1 if no activities were measured.
+    """
+    def __init__(self, termination_time=10.0, imbalance=0.05, refine_passes=4, seed=0):
+        """
+        Constructor
+
+        :param termination_time: the simulation time up to which messages are counted before allocating
+        :param imbalance: the allowed fraction by which a kernel's load may exceed the average load
+        :param refine_passes: the maximal number of refinement passes per level
+        :param seed: the seed for the random visiting order during coarsening
+        """
+        self.termination_time = termination_time
+        self.imbalance = imbalance
+        self.refine_passes = refine_passes
+        self.seed = seed
+
+    def allocate(self, models, edges, nrnodes, total_activities):
+        """
+        Calculate allocations for the nodes, using the information provided.
+
+        :param models: the models to allocate
+        :param edges: the edges between the models, as a dictionary of source to a dictionary of destination to the number of messages
+        :param nrnodes: the number of nodes to allocate over. Simply an upper bound!
+        :param total_activities: activity tracking information from each model
+        :returns: allocation that was found
+        """
+        models = list(models)
+        if nrnodes <= 1 or len(models) <= 1:
+            return {model.model_id: 0 for model in models}
+        index = {model: i for i, model in enumerate(models)}
+        activities = [total_activities.get(model.model_id, 0) for model in models]
+        if sum(activities) > 0:
+            weights = activities
+        else:
+            weights = [1] * len(models)
+        adjacency = [{} for _ in models]
+        for source in edges:
+            i = index.get(source)
+            if i is None:
+                continue
+            for destination, count in edges[source].items():
+                j = index.get(destination)
+                if j is None or j == i or not count:
+                    continue
+                # Direction doesn't matter for the messages between kernels
+                adjacency[i][j] = adjacency[i].get(j, 0) + count
+                adjacency[j][i] = adjacency[j].get(i, 0) + count
+
+        capacity = sum(weights) / float(nrnodes) * (1 + self.imbalance)
+        rng = random.Random(self.seed)
+
+        # Coarsening phase
+        levels = []
+        graph = (weights, adjacency)
+        target = max(nrnodes * 20, 100)
+        while len(graph[0]) > target:
+            mapping, coarse = self.coarsen(graph, capacity / 2, rng)
+            if len(coarse[0]) > 0.95 * len(graph[0]):
+                # Hardly any progress, so stop
+                break
+            levels.append((graph, mapping))
+            graph = coarse
+
+        # Initial partitioning on the coarsest graph
+        parts = self.initialPartition(graph, nrnodes, capacity)
+        self.refine(graph, parts, nrnodes, capacity)
+
+        # Uncoarsening phase
+        for graph, mapping in reversed(levels):
+            parts = [parts[coarse_vertex] for coarse_vertex in mapping]
+            self.refine(graph, parts, nrnodes, capacity)
+
+        return {model.model_id: parts[i] for i, model in enumerate(models)}
+
+    def coarsen(self, graph, max_weight, rng):
+        """
+        Coarsen a graph by heavy edge matching. Isolated vertices have nothing to match with,
+        so they are merged in pairs of the lightest ones instead.
+
+        :param graph: tuple of the vertex weights and the adjacency dictionaries
+        :param max_weight: the maximal weight of a merged vertex
+        :param rng: the random generator for the visiting order
+        :returns: tuple -- the coarse vertex of every fine vertex, and the coarse graph
+        """
+        weights, adjacency = graph
+        mapping = [-1] * len(weights)
+        order = list(range(len(weights)))
+        rng.shuffle(order)
+        coarse_weights = []
+        isolated = []
+        for v in order:
+            if mapping[v] != -1:
+                continue
+            if not adjacency[v]:
+                isolated.append(v)
+                continue
+            best = -1
+            best_weight = 0
+            for u, w in adjacency[v].items():
+                if (mapping[u] == -1 and w > best_weight and 
+                        weights[u] + weights[v] <= max_weight):
+                    best = u
+                    best_weight = w
+            mapping[v] = len(coarse_weights)
+            if best == -1:
+                coarse_weights.append(weights[v])
+            else:
+                mapping[best] = mapping[v]
+                coarse_weights.append(weights[v] + weights[best])
+        isolated.sort(key=lambda v: weights[v])
+        i = 0
+        while i < len(isolated):
+            v = isolated[i]
+            mapping[v] = len(coarse_weights)
+            if i + 1 < len(isolated) and weights[v] + weights[isolated[i + 1]] <= max_weight:
+                mapping[isolated[i + 1]] = mapping[v]
+                coarse_weights.append(weights[v] + weights[isolated[i + 1]])
+                i += 2
+            else:
+                coarse_weights.append(weights[v])
+                i += 1
+        coarse_adjacency = [{} for _ in coarse_weights]
+        for v, neighbours in enumerate(adjacency):
+            cv = mapping[v]
+            coarse_neighbours = coarse_adjacency[cv]
+            for u, w in neighbours.items():
+                cu = mapping[u]
+                if cu != cv:
+                    coarse_neighbours[cu] = coarse_neighbours.get(cu, 0) + w
+        return mapping, (coarse_weights, coarse_adjacency)
+
+    def initialPartition(self, graph, nrnodes, capacity):
+        """
+        Partition a (small) graph by greedy graph growing: every kernel starts from the heaviest vertex
+        that is still unassigned, and repeatedly takes the unassigned vertex that communicates most
+        with it until it holds its share of the load. The last kernel takes all remaining vertices.
+
+        :param graph: tuple of the vertex weights and the adjacency dictionaries
+        :param nrnodes: the number of kernels
+        :param capacity: the maximal load of a kernel
+        :returns: list -- the kernel of every vertex
+        """
+        weights, adjacency = graph
+        parts = [-1] * len(weights)
+        share = sum(weights) / float(nrnodes)
+        # Heaps with outdated entries, which are skipped when they come up
+        seeds = [(-weights[v], v) for v in range(len(weights))]
+        heapq.heapify(seeds)
+        for part in range(nrnodes - 1):
+            load = 0
+            # Connectivity of the unassigned vertices to this kernel
+            connectivity = {}
+            frontier = []
+            while load < share:
+                v = -1
+                while frontier:
+                    negative, u = heapq.heappop(frontier)
+                    if parts[u] == -1 and connectivity[u] == -negative:
+                        v = u
+                        break
+                if v == -1:
+                    while seeds and parts[seeds[0][1]] != -1:
+                        heapq.heappop(seeds)
+                    if not seeds:
+                        break
+                    v = seeds[0][1]
+                if load and load + weights[v] > capacity:
+                    break
+                parts[v] = part
+                load += weights[v]
+                for u, w in adjacency[v].items():
+                    if parts[u] == -1:
+                        connectivity[u] = connectivity.get(u, 0) + w
+                        heapq.heappush(frontier, (-connectivity[u], u))
+        for v, part in enumerate(parts):
+            if part == -1:
+                parts[v] = nrnodes - 1
+        return parts
+
+    def refine(self, graph, parts, nrnodes, capacity):
+        """
+        Refine a partition in place by moving boundary vertices to the kernel they communicate most
+        with, if this reduces the number of messages between kernels without exceeding the capacity.
+
+        :param graph: tuple of the vertex weights and the adjacency dictionaries
+        :param parts: the kernel of every vertex, modified in place
+        :param nrnodes: the number of kernels
+        :param capacity: the maximal load of a kernel
+        """
+        weights, adjacency = graph
+        loads = [0] * nrnodes
+        for v, part in enumerate(parts):
+            loads[part] += weights[v]
+        for _ in range(self.refine_passes):
+            moved = 0
+            for v, neighbours in enumerate(adjacency):
+                own = parts[v]
+                connectivity = {}
+                for u, w in neighbours.items():
+                    connectivity[parts[u]] = connectivity.get(parts[u], 0) + w
+                if len(connectivity) == 1 and own in connectivity:
+                    # Not on the boundary
+                    continue
+                internal = connectivity.get(own, 0)
+                best = own
+                best_gain = 0
+                for part, external in connectivity.items():
+                    if part == own or loads[part] + weights[v] > capacity:
+                        continue
+                    gain = external - internal
+                    if gain > best_gain or (gain == best_gain and 
+                                            best != own and 
+                                            loads[part] < loads[best]):
+                        best = part
+                        best_gain = gain
+                if best != own:
+                    parts[v] = best
+                    loads[own] -= weights[v]
+                    loads[best] += weights[v]
+                    moved += 1
+            if not moved:
+                break
+
+    def getTerminationTime(self):
+        """
+        Returns the time it takes for the allocator to make an 'educated guess' of the advised allocation.
+        This time will not be used exactly, but as soon as the GVT passes over it. While this is not exactly
+        necessary, it avoids the overhead of putting such a test in frequently used code.
+
+        :returns: float -- the time at which to perform the allocations
+        """
+        return self.termination_time
@@ -0,0 +1,255 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Atomic DEVS models whose state is stored in NumPy arrays, shared by all instances of the same class
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pypdevs.DEVS import AtomicDEVS
+from pypdevs.util import DEVSException
+
+def batchRows(values, dtype=None):
+    """
+    Build a NumPy array from a list of models or plain values.
+
+    :param values: list of BatchAtomicDEVS models (giving their rows) or of plain values
+    :param dtype: the dtype of the array, rows are used if this is None
+    :returns: NumPy array -- the resulting array
+    """
+    if dtype is None:
+        return np.fromiter((m.batch_row for m in values), dtype=np.intp, count=len(values))
+    return np.array(values, dtype=dtype)
+
+class BatchStore(object):
+    """
+    Column storage for the state of all instances of a BatchAtomicDEVS class
+    """
+    def __init__(self, fields, capacity=64):
+        """
+        Constructor
+
+        :param fields: dictionary mapping field names to NumPy dtypes
+        :param capacity: the initial number of rows to allocate
+        """
+        if np is None:
+            raise DEVSException("BatchAtomicDEVS models require NumPy")
+        self.fields = fields
+        self.size = 0
+        self.capacity = capacity
+        # Rows of removed models, reused before the arrays are grown
+        self.free_rows = []
+        self.arrays = {name: np.zeros(capacity, dtype=fields[name])
+                       for name in fields}
+
+    def allocate(self):
+        """
+        Reserve a new row in the store, growing the arrays when required
+
+        :returns: int -- the index of the new row
+        """
+        if self.free_rows:
+            return self.free_rows.pop()
+        if self.size == self.capacity:
+            self.capacity *= 2
+            for name in self.arrays:
+                grown = np.zeros(self.capacity, dtype=self.fields[name])
+                grown[:self.size] = self.arrays[name]
+                self.arrays[name] = grown
+        self.size += 1
+        return self.size - 1
+
+    def release(self, row):
+        """
+        Free the row of a removed model, so that it can be reused by a new model
+
+        :param row: the index of the row
+        """
+        for name in self.arrays:
+            self.arrays[name][row] = 0
+        self.free_rows.append(row)
+
+class BatchAtomicDEVS(AtomicDEVS):
+    """
+    An AtomicDEVS model whose state is a row in arrays shared by all instances of its class.
+
+    Subclasses declare their state layout in *state_fields* and implement the array-level
+    functions, which receive a NumPy array with the rows that must transition. The solver
+    will then transition all imminent instances of a class with a single call when batch
+    transitions are enabled. The normal per-model DEVS functions are provided on top of the
+    array-level functions, so these models also work in every other configuration.
+
+    The store of a class holds the rows of all its instances in this process, including those of
+    other simulations, but every instance has a row of its own. A row is only valid in this process:
+    when a model is pickled, e.g. to relocate it or to save its state, the values of its row are
+    pickled instead, and the unpickled model gets a new row in the store of its process.
+    """
+    # Mapping of field name to NumPy dtype, e.g. {"colour": np.int8}
+    state_fields = {}
+
+    def __init__(self, name=None):
+        """
+        Constructor
+
+        :param name: the name of the model
+        """
+        # Must come first, as the AtomicDEVS constructor already assigns the state
+        self.batch_row = type(self).getBatchStore().allocate()
+        AtomicDEVS.__init__(self, name)
+
+    @classmethod
+    def getBatchStore(cls):
+        """
+        Fetch the store shared by all instances of this class, creating it if necessary.
+
+        :returns: BatchStore -- the store of this class
+        """
+        # Look in the class dictionary, as subclasses should not share the store of their parent
+        store = cls.__dict__.get("batch_store")
+        if store is None:
+            store = BatchStore(cls.state_fields)
+            cls.batch_store = store
+        return store
+
+    @classmethod
+    def getBatchArrays(cls):
+        """
+        Fetch the arrays containing the state of all instances of this class.
+
+        :returns: dict -- mapping field names to their array
+        """
+        return cls.getBatchStore().arrays
+
+    def getState(self):
+        """
+        Get a copy of the state of this instance, as used by state saving and tracing.
+
+        :returns: dict -- mapping field names to their value
+        """
+        arrays = type(self).getBatchArrays()
+        return {name: arrays[name][self.batch_row].item() for name in arrays}
+
+    def setState(self, state):
+        """
+        Write a state to the row of this instance.
+
+        :param state: dictionary mapping field names to their value, or None
+        """
+        if state is None:
+            # Set by the AtomicDEVS constructor
+            return
+        arrays = type(self).getBatchArrays()
+        for name in state:
+            arrays[name][self.batch_row] = state[name]
+
+    state = property(getState, setState)
+
+    def __getstate__(self):
+        """
+        For pickling and copying, replacing the row by its values
+
+        :returns: dict -- the attributes of the model
+        """
+        retdict = dict(self.__dict__)
+        del retdict["batch_row"]
+        retdict["batch_state"] = self.getState()
+        return retdict
+
+    def __setstate__(self, retdict):
+        """
+        For unpickling, writing the values to a new row
+
+        :param retdict: dictionary containing attributes and their value
+        """
+        retdict = dict(retdict)
+        state = retdict.pop("batch_state")
+        self.__dict__.update(retdict)
+        self.batch_row = type(self).getBatchStore().allocate()
+        self.setState(state)
+
+    @classmethod
+    def batchIntTransition(cls, rows):
+        """
+        Array-level internal transition function, updating the arrays in place.
+
+        :param rows: NumPy array containing the rows to transition
+        """
+        raise DEVSException("batchIntTransition not implemented for %s" % cls.__name__)
+
+    @classmethod
+    def batchExtTransition(cls, rows, elapsed, inputs):
+        """
+        Array-level external transition function, updating the arrays in place.
+
+        :param rows: NumPy array containing the rows to transition
+        :param elapsed: NumPy array containing the elapsed time of every row
+        :param inputs: list containing the input bag of every row
+        """
+        raise DEVSException("batchExtTransition not implemented for %s" % cls.__name__)
+
+    @classmethod
+    def batchConfTransition(cls, rows, inputs):
+        """
+        Array-level confluent transition function, updating the arrays in place.
+        Defaults to an internal transition followed by an external transition.
+
+        :param rows: NumPy array containing the rows to transition
+        :param inputs: list containing the input bag of every row
+        """
+        cls.batchIntTransition(rows)
+        cls.batchExtTransition(rows, np.zeros(len(rows)), inputs)
+
+    @classmethod
+    def batchTimeAdvance(cls, rows):
+        """
+        Array-level time advance function.
+
+        :param rows: NumPy array containing the rows to compute the time advance for
+        :returns: NumPy array -- the time advance of every row
+        """
+        raise DEVSException("batchTimeAdvance not implemented for %s" % cls.__name__)
+
+    def intTransition(self):
+        """
+        Internal transition function, delegating to the array-level function.
+        """
+        type(self).batchIntTransition(np.array([self.batch_row]))
+        return self.state
+
+    def extTransition(self, inputs):
+        """
+        External transition function, delegating to the array-level function.
+        """
+        type(self).batchExtTransition(np.array([self.batch_row]),
+                                      np.array([self.elapsed], dtype=float),
+                                      [inputs])
+        return self.state
+
+    def confTransition(self, inputs):
+        """
+        Confluent transition function, delegating to the array-level function.
+        """
+        type(self).batchConfTransition(np.array([self.batch_row]), [inputs])
+        return self.state
+
+    def timeAdvance(self):
+        """
+        Time advance function, delegating to the array-level function.
+        """
+        return float(type(self).batchTimeAdvance(np.array([self.batch_row]))[0])
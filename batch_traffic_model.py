@@ -0,0 +1,153 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The traffic model of traffic_model.py, written as BatchAtomicDEVS models for Parallel DEVS.
+Many traffic systems side by side make the lights and policemen of all systems transition
+at the same time, so that batched transitions can handle them with a single call per class.
+"""
+
+import numpy as np
+
+# Import code for DEVS model representation:
+from pypdevs.DEVS import *
+from pypdevs.batchDEVS import BatchAtomicDEVS
+
+# Colours of the traffic light
+RED, GREEN, YELLOW, MANUAL = 0, 1, 2, 3
+COLOURS = ("red", "green", "yellow", "manual")
+NEXT_COLOUR = np.array([GREEN, YELLOW, RED, MANUAL], dtype=np.int8)
+COLOUR_DURATION = np.array([60.0, 50.0, 10.0, float('inf')])
+# What a colourblind observer sees
+OBSERVATION = ("grey", "yellow", "grey", None)
+
+# Modes of the policeman
+IDLE, WORKING = 0, 1
+MODE_DURATION = np.array([200.0, 100.0])
+COMMAND = ("toManual", "toAutonomous")
+
+def lastCommand(bag):
+    """
+    Get the last command in an input bag, or an empty string if there is none.
+    """
+    for messages in bag.values():
+        if messages:
+            return messages[-1]
+    return ""
+
+class BatchTrafficLight(BatchAtomicDEVS):
+    """
+    A traffic light
+    """
+    state_fields = {"colour": np.int8}
+
+    def __init__(self, name=None):
+        """
+        Constructor (parameterizable).
+        """
+        BatchAtomicDEVS.__init__(self, name)
+        self.state = {"colour": RED}
+        self.elapsed = 1.5
+        self.INTERRUPT = self.addInPort(name="INTERRUPT")
+        self.OBSERVED = self.addOutPort(name="OBSERVED")
+
+    @classmethod
+    def batchIntTransition(cls, rows):
+        """
+        Internal Transition Function.
+        """
+        colour = cls.getBatchArrays()["colour"]
+        colour[rows] = NEXT_COLOUR[colour[rows]]
+
+    @classmethod
+    def batchExtTransition(cls, rows, elapsed, inputs):
+        """
+        External Transition Function, only the last command of every bag counts.
+        """
+        colour = cls.getBatchArrays()["colour"]
+        commands = np.array([lastCommand(bag) for bag in inputs])
+        manual = colour[rows] == MANUAL
+        to_manual = commands == "toManual"
+        to_autonomous = (commands == "toAutonomous") & manual
+        colour[rows[to_manual]] = MANUAL
+        colour[rows[to_autonomous]] = RED
+
+    @classmethod
+    def batchTimeAdvance(cls, rows):
+        """
+        Time-Advance Function.
+        """
+        return COLOUR_DURATION[cls.getBatchArrays()["colour"][rows]]
+
+    def outputFnc(self):
+        """
+        Output Funtion, based on the OLD state.
+        """
+        return {self.OBSERVED: [OBSERVATION[self.state["colour"]]]}
+
+class BatchPoliceman(BatchAtomicDEVS):
+    """
+    A policeman producing "toManual" and "toAutonomous" events
+    """
+    state_fields = {"mode": np.int8}
+
+    def __init__(self, name=None):
+        """
+        Constructor (parameterizable).
+        """
+        BatchAtomicDEVS.__init__(self, name)
+        self.state = {"mode": IDLE}
+        self.elapsed = 0
+        self.OUT = self.addOutPort(name="OUT")
+
+    @classmethod
+    def batchIntTransition(cls, rows):
+        """
+        Internal Transition Function.
+        """
+        mode = cls.getBatchArrays()["mode"]
+        mode[rows] = 1 - mode[rows]
+
+    @classmethod
+    def batchTimeAdvance(cls, rows):
+        """
+        Time-Advance Function.
+        """
+        return MODE_DURATION[cls.getBatchArrays()["mode"][rows]]
+
+    def outputFnc(self):
+        """
+        Output Funtion.
+        """
+        return {self.OUT: [COMMAND[self.state["mode"]]]}
+
+class BatchTrafficSystem(CoupledDEVS):
+    def __init__(self, name=None):
+        """
+        A simple traffic system consisting of a Policeman and a TrafficLight.
+        """
+        CoupledDEVS.__init__(self, name)
+        self.policeman = self.addSubModel(BatchPoliceman(name="policeman"))
+        self.trafficLight = self.addSubModel(BatchTrafficLight(name="trafficLight"))
+        self.connectPorts(self.policeman.OUT, self.trafficLight.INTERRUPT)
+
+class BatchTrafficGrid(CoupledDEVS):
+    def __init__(self, name=None, size=100):
+        """
+        A number of independent traffic systems, simulated side by side.
+        """
+        CoupledDEVS.__init__(self, name)
+        self.systems = [self.addSubModel(BatchTrafficSystem(name="system%i" % i))
+                        for i in range(size)]
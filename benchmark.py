@@ -0,0 +1,309 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Synthetic benchmark suite, building DEVStone-style hierarchies out of replicas of the traffic models.
+
+Every level of the hierarchy contains *width* groups and the next (deeper) level. A group is either a
+TrafficSystem of traffic_model.py (kind 'traffic'), or a G_BPmodel of Traffic.py (kind 'gbp') whose
+generator additionally feeds *fanout* - 1 extra TrafficSystems of Traffic.py. The event density is
+the number of generators per group. Both the Classic DEVS and the Parallel DEVS path can be measured;
+for the latter, the (classic) traffic models are adapted to send and receive lists of messages.
+
+Examples:
+
+    python benchmark.py
+    python benchmark.py --kind gbp --depth 5 --width 10 --fanout 4 --save-baseline baseline.json
+    python benchmark.py --kind gbp --depth 5 --width 10 --fanout 4 --baseline baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from pypdevs.DEVS import CoupledDEVS
+from pypdevs.simulator import Simulator
+
+import traffic_model
+import Traffic
+
+# Number of transition function calls, updated by the benchmark variants of the models
+transition_count = [0]
+
+def benchmarkVariant(cls, parallel):
+    """
+    Create a subclass of an atomic model that counts its transitions and, for Parallel DEVS,
+    wraps its output in lists and passes only the last message of every input port.
+
+    :param cls: the (Classic DEVS) atomic model class
+    :param parallel: whether or not to adapt the model to Parallel DEVS
+    :returns: class -- the variant
+    """
+    class Variant(cls):
+        def intTransition(self):
+            transition_count[0] += 1
+            return cls.intTransition(self)
+
+        def extTransition(self, inputs):
+            transition_count[0] += 1
+            if parallel:
+                inputs = {port: inputs[port][-1] for port in inputs if inputs[port]}
+            return cls.extTransition(self, inputs)
+
+        if parallel:
+            def outputFnc(self):
+                output = cls.outputFnc(self)
+                return {port: [output[port]] for port in output}
+    Variant.__name__ = cls.__name__
+    return Variant
+
+ATOMIC_CLASSES = [traffic_model.TrafficLight, traffic_model.Policeman,
+                  Traffic.GeneratorCar, Traffic.TrafficLight, Traffic.Policeman]
+VARIANTS = {(cls, parallel): benchmarkVariant(cls, parallel)
+            for cls in ATOMIC_CLASSES
+            for parallel in (False, True)}
+
+class ExposedG_BPmodel(Traffic.G_BPmodel):
+    """
+    G_BPmodel with ports to connect its generator to models outside of it.
+    """
+    def __init__(self, name=None):
+        Traffic.G_BPmodel.__init__(self, name)
+        self.generator_out = self.addOutPort("generator_out")
+        self.connectPorts(self.generator.gen_outport, self.generator_out)
+        self.generator_in = self.addInPort("generator_in")
+        self.connectPorts(self.generator_in, self.TrafficSystem.TrafficSystem_in)
+
+class FanoutGroup(CoupledDEVS):
+    """
+    A G_BPmodel together with additional TrafficSystems fed by its generator, and additional generators.
+    """
+    def __init__(self, name, fanout, density):
+        CoupledDEVS.__init__(self, name)
+        self.gbp = self.addSubModel(ExposedG_BPmodel(name="gbp"))
+        self.generators = [self.gbp.generator]
+        for i in range(1, density):
+            self.generators.append(self.addSubModel(Traffic.GeneratorCar(name="generator%i" % i)))
+        self.systems = [self.gbp.TrafficSystem]
+        for i in range(1, fanout):
+            system = self.addSubModel(Traffic.TrafficSystem(name="system%i" % i))
+            self.systems.append(system)
+            self.connectPorts(self.gbp.generator_out, system.TrafficSystem_in)
+        for generator in self.generators[1:]:
+            for system in self.systems[1:]:
+                self.connectPorts(generator.gen_outport, system.TrafficSystem_in)
+            self.connectPorts(generator.gen_outport, self.gbp.generator_in)
+        self.select_order = list(self.component_set)
+
+    def select(self, imm):
+        for model in self.select_order:
+            if model in imm:
+                return model
+
+class BenchmarkLevel(CoupledDEVS):
+    """
+    A single level of the hierarchy, containing the groups of this level and the next level.
+    """
+    def __init__(self, name, kind, depth, width, fanout, density):
+        CoupledDEVS.__init__(self, name)
+        for i in range(width):
+            if kind == "traffic":
+                self.addSubModel(traffic_model.TrafficSystem(name="group%i" % i))
+            else:
+                self.addSubModel(FanoutGroup("group%i" % i, fanout, density))
+        if depth > 1:
+            self.addSubModel(BenchmarkLevel("level%i" % (depth - 1), kind, depth - 1, width, fanout, density))
+        self.select_order = list(self.component_set)
+
+    def select(self, imm):
+        for model in self.select_order:
+            if model in imm:
+                return model
+
+def specialize(model, parallel):
+    """
+    Replace the class of all atomic models in a hierarchy by their benchmark variant.
+
+    :param model: the root of the hierarchy
+    :param parallel: whether or not the Parallel DEVS variants should be used
+    """
+    if isinstance(model, CoupledDEVS):
+        for child in model.component_set:
+            specialize(child, parallel)
+    else:
+        model.__class__ = VARIANTS[(type(model), parallel)]
+
+def build(config, parallel):
+    """
+    Build the model of a configuration.
+
+    :param config: the configuration
+    :param parallel: whether or not the model is simulated with Parallel DEVS
+    :returns: CoupledDEVS -- the root model
+    """
+    model = BenchmarkLevel("level%i" % config["depth"],
+                           config["kind"],
+                           config["depth"],
+                           config["width"],
+                           config["fanout"],
+                           config["density"])
+    specialize(model, parallel)
+    return model
+
+def run(config, parallel, trace_memory):
+    """
+    Run a single configuration once.
+
+    :param config: the configuration
+    :param parallel: whether or not to use Parallel DEVS
+    :param trace_memory: whether or not to measure the peak memory, which slows down the run
+    :returns: dict -- the measurements
+    """
+    gc.collect()
+    transition_count[0] = 0
+    if trace_memory:
+        tracemalloc.start()
+    phases = {}
+    start = time.perf_counter()
+    model = build(config, parallel)
+    phases["construct"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim = Simulator(model)
+    sim.setTerminationTime(config["time"])
+    if not parallel:
+        sim.setClassicDEVS()
+    phases["setup"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim.simulate()
+    phases["simulate"] = time.perf_counter() - start
+
+    result = {"phases": phases, "events": transition_count[0]}
+    if trace_memory:
+        result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def measure(config, parallel, repeat, memory):
+    """
+    Measure a configuration, keeping the fastest of several runs.
+
+    :param config: the configuration
+    :param parallel: whether or not to use Parallel DEVS
+    :param repeat: the number of timed runs
+    :param memory: whether or not to do an additional run to measure the peak memory
+    :returns: dict -- the measurements
+    """
+    best = None
+    for _ in range(repeat):
+        result = run(config, parallel, False)
+        if best is None or result["phases"]["simulate"] < best["phases"]["simulate"]:
+            best = result
+    best["events_per_second"] = best["events"] / max(best["phases"]["simulate"], 1e-9)
+    if memory:
+        best["peak_memory"] = run(config, parallel, True)["peak_memory"]
+    return best
+
+def configName(config, formalism):
+    """
+    Get a unique name for a configuration, used to match it with its baseline.
+
+    :param config: the configuration
+    :param formalism: 'classic' or 'parallel'
+    :returns: string -- the name
+    """
+    return "%s-d%i-w%i-f%i-e%i-t%g-%s" % (config["kind"], config["depth"], config["width"],
+                                          config["fanout"], config["density"], config["time"],
+                                          formalism)
+
+# Configurations used when none is given on the command line
+DEFAULT_SUITE = [{"kind": "traffic", "depth": 10, "width": 2, "fanout": 1, "density": 1, "time": 10000.0},
+                 {"kind": "traffic", "depth": 1, "width": 200, "fanout": 1, "density": 1, "time": 10000.0},
+                 {"kind": "gbp", "depth": 5, "width": 5, "fanout": 1, "density": 1, "time": 1000.0},
+                 {"kind": "gbp", "depth": 3, "width": 5, "fanout": 8, "density": 2, "time": 1000.0}]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulator with hierarchies of traffic models")
+    parser.add_argument("--kind", choices=["traffic", "gbp"], help="the model to replicate")
+    parser.add_argument("--depth", type=int, default=3, help="the number of levels in the hierarchy")
+    parser.add_argument("--width", type=int, default=5, help="the number of groups per level")
+    parser.add_argument("--fanout", type=int, default=1, help="the number of TrafficSystems fed by a generator (gbp only)")
+    parser.add_argument("--density", type=int, default=1, help="the number of generators per group (gbp only)")
+    parser.add_argument("--time", type=float, default=1000.0, help="the termination time")
+    parser.add_argument("--formalism", choices=["classic", "parallel", "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of timed runs per configuration")
+    parser.add_argument("--no-memory", action="store_true", help="skip the (slow) peak memory measurement")
+    parser.add_argument("--save-baseline", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="the fraction by which the throughput may drop before it is a regression")
+    args = parser.parse_args()
+
+    if args.kind is None:
+        suite = DEFAULT_SUITE
+    else:
+        suite = [{"kind": args.kind, "depth": args.depth, "width": args.width,
+                  "fanout": args.fanout, "density": args.density, "time": args.time}]
+    formalisms = ["classic", "parallel"] if args.formalism == "both" else [args.formalism]
+
+    results = {}
+    stdout = sys.stdout
+    for config in suite:
+        for formalism in formalisms:
+            name = configName(config, formalism)
+            # The traffic models print every transition, which is not what we want to measure
+            with open(os.devnull, 'w') as devnull:
+                sys.stdout = devnull
+                try:
+                    results[name] = measure(config, formalism == "parallel",
+                                            args.repeat, not args.no_memory)
+                finally:
+                    sys.stdout = stdout
+            result = results[name]
+            phases = result["phases"]
+            print("%-40s %10i events %12.0f events/s  construct %.3fs  setup %.3fs  simulate %.3fs%s" %
+                  (name, result["events"], result["events_per_second"],
+                   phases["construct"], phases["setup"], phases["simulate"],
+                   "  peak %.1f MB" % (result["peak_memory"] / 1e6) if "peak_memory" in result else ""))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        for name in sorted(results):
+            if name not in baseline:
+                print("%-40s no baseline" % name)
+                continue
+            old = baseline[name]["events_per_second"]
+            new = results[name]["events_per_second"]
+            change = (new - old) / old if old else 0.0
+            status = "ok"
+            if change < -args.tolerance:
+                status = "REGRESSION"
+                regressions += 1
+            print("%-40s %+7.1f%% events/s  %s" % (name, change * 100, status))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,14 +18,20 @@ Controller used as a specific simulation kernel
 """
 from pypdevs.basesimulator import BaseSimulator
 from pypdevs.logger import *
+import sys
 import threading
+import heapq
+from collections import deque
 import pypdevs.accurate_time as time
 import pypdevs.middleware as middleware
 from pypdevs.DEVS import CoupledDEVS, AtomicDEVS
+from pypdevs.batchDEVS import BatchAtomicDEVS
 from pypdevs.util import DEVSException
 from pypdevs.activityVisualisation import visualizeLocations
 from pypdevs.realtime.threadingBackend import ThreadingBackend
 from pypdevs.realtime.asynchronousComboGenerator import AsynchronousComboGenerator
+from pypdevs.gvtInterval import AdaptiveGVTInterval
+from pypdevs.profiler import instrument, report, writeFolded
 
 class Controller(BaseSimulator):
     """
@@ -48,9 +54,18 @@ class Controller(BaseSimulator):
         self.location_cell_view = False
         self.graph = None
         self.allocations = None
-        self.running_irreversible = None
+        self.running_irreversible = set()
         self.initial_allocator = None
         self.prev_termination_time = 0.0
+        self.run_gvt = False
+        self.lock_condition = threading.Condition()
+        self.locked_kernels = set()
+        self.kernel_status = {}
+        self.gvt_metrics = deque(maxlen=1000)
+        self.gvt_interval_controller = None
+        self.ds_removed = set()
+        self.ds_compact_fraction = 0.25
+        self.free_model_ids = []
 
     def __setstate__(self, retdict):
         """
@@ -62,6 +77,7 @@ class Controller(BaseSimulator):
         self.waiting_lock = threading.Lock()
         self.no_finish_ring = threading.Lock()
         self.no_finish_ring.acquire()
+        self.lock_condition = threading.Condition()
 
     def GVTdone(self):
         """
@@ -100,15 +116,24 @@ class Controller(BaseSimulator):
                 self.waiting = 0
             return ret
 
-    def waitFinish(self, running):
+    def waitFinish(self, running, min_interval=0.001, max_interval=1.0):
         """
         Wait until the specified number of kernels have all told that simulation
         finished.
 
+        The kernels are polled with an interval that starts small and doubles after every check,
+        up to *max_interval*. Short simulations are detected within milliseconds, while long ones
+        don't run the finish ring more often than once per *max_interval*. Every check still
+        performs the double finish ring of isFinished against messages in transit.
+
         :param running: the number of kernels that is simulating
+        :param min_interval: the time before the first check
+        :param max_interval: the maximal time between two checks
         """
+        interval = min_interval
         while 1:
-            time.sleep(1)
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
             # Make sure that no relocations are running
             if self.isFinished(running):
                 # All simulation kernels have told us that they are idle at the moment
@@ -117,6 +142,13 @@ class Controller(BaseSimulator):
         self.event_gvt.set()
         self.gvt_thread.join()
 
+    def requestGVT(self):
+        """
+        Request a GVT round as soon as possible instead of waiting for the GVT interval, e.g. because a kernel is running out of memory for its history.
+        """
+        if self.run_gvt:
+            self.event_gvt.set()
+
     def startGVTThread(self, gvt_interval):
         """
         Start the GVT thread
@@ -142,20 +174,62 @@ class Controller(BaseSimulator):
         # Wait for the simulation to have done something useful before we start
         self.event_gvt.wait(freq)
         # Maybe simulation already finished...
+        gvt_round = 0
         while self.run_gvt:
+            # Might have been woken up early by requestGVT
+            self.event_gvt.clear()
+            start = time.time()
+            prev_gvt = self.GVT
             self.receiveControl([float('inf'), 
                                  float('inf'), 
                                  self.accumulator, 
                                  {}], 
                                 True)
             # Wait until the lock is released elsewhere
-            print("Waiting for clear")
             self.wait_for_gvt.wait()
             self.wait_for_gvt.clear()
+            gvt_round += 1
+            for kernel in range(self.kernels):
+                self.kernel_status[kernel] = self.getProxy(kernel).gvtRoundDone(self.GVT)
+            status = dict(self.kernel_status)
+            metrics = {"round": gvt_round,
+                       "start": start,
+                       "duration": time.time() - start,
+                       "gvt": self.GVT,
+                       "advance": self.GVT - prev_gvt,
+                       "lag": {kernel: status[kernel]["clock"] - self.GVT 
+                               for kernel in status},
+                       "interval": freq}
+            self.gvt_metrics.append(metrics)
+            assert info("GVT round %(round)i: GVT %(gvt)s (+%(advance)s) in %(duration).4fs" % metrics)
+            if self.gvt_interval_controller is not None:
+                freq = self.gvt_interval_controller.nextInterval(freq, 
+                                                                 metrics, 
+                                                                 status)
             # Limit the GVT algorithm, otherwise this will flood the ring
-            print("Cleared")
             self.event_gvt.wait(freq)
 
+    def setAdaptiveGVT(self, min_interval, max_interval, rollbacks_high=10):
+        """
+        Sets the use of an adaptive GVT interval, which is shortened when the history of the kernels grows or rollbacks are frequent, and lengthened when simulation progresses smoothly.
+        Kernels report their rollbacks after every GVT round, and their history size when they have a history budget (see setHistoryBudget).
+
+        :param min_interval: the minimal interval between two GVT rounds
+        :param max_interval: the maximal interval between two GVT rounds
+        :param rollbacks_high: number of rollbacks of all kernels in a GVT round above which the interval is shortened
+        """
+        self.gvt_interval_controller = AdaptiveGVTInterval(min_interval, 
+                                                           max_interval, 
+                                                           rollbacks_high=rollbacks_high)
+
+    def getGVTMetrics(self):
+        """
+        Get the metrics of the most recent GVT rounds: the round number, its start and duration in wall clock time, the resulting GVT, the advance of the GVT, the lag of every kernel behind the GVT and the interval that was used.
+
+        :returns: list -- a dictionary with the metrics of every round
+        """
+        return list(self.gvt_metrics)
+
     def getVCDVariables(self):
         """
         Generate a list of all variables that exist in the current scope
@@ -179,13 +253,37 @@ class Controller(BaseSimulator):
         Run the actual simulation on the controller. This will simply 'intercept' the call to the original simulate and perform location visualisation when necessary.
         """
         self.checkForTemporaryIrreversible()
+        if self.local_parallel > 1:
+            # Started for every run, so the workers begin with the current states
+            self.startLocalParallel()
         self.no_finish_ring.release()
         if self.location_cell_view:
             from pypdevs.activityVisualisation import visualizeLocations
             visualizeLocations(self)
-        # Call superclass (the actual simulation)
-        BaseSimulator.simulate(self)
-        self.prev_termination_time = self.termination_time[0]
+        try:
+            # Call superclass (the actual simulation)
+            BaseSimulator.simulate(self)
+            self.prev_termination_time = self.termination_time[0]
+        finally:
+            # The workers own the states of the models, so copy them back and stop the workers, also after an error
+            self.stopLocalParallel()
+        if self.profiling:
+            self.reportProfile()
+
+    def reportProfile(self):
+        """
+        Gather the profiling statistics of all kernels and write the report and the flame graph input.
+        """
+        records = self.getProfile()
+        for kernel in range(1, self.kernels):
+            records.extend(self.getProxy(kernel).getProfile())
+        if self.profile_filename is None:
+            report(records, sys.stdout)
+        else:
+            with open(self.profile_filename, 'w') as f:
+                report(records, f)
+        if self.folded_filename is not None:
+            writeFolded(records, self.folded_filename)
 
     def getEventGraph(self):
         """
@@ -221,10 +319,10 @@ class Controller(BaseSimulator):
             else:
                 from pypdevs.util import constructGraph, saveLocations
                 self.graph = constructGraph(self.model)
-                allocs = self.initialAllocator.allocate(self.model.component_set,
-                                                        self.getEventGraph(),
-                                                        self.kernels,
-                                                        self.total_activities)
+                allocs = self.initial_allocator.allocate(self.model.component_set,
+                                                         self.getEventGraph(),
+                                                         self.kernels,
+                                                         self.total_activities)
                 self.allocations = allocs
                 self.initial_allocator = None
                 saveLocations("locationsave.txt", 
@@ -266,12 +364,61 @@ class Controller(BaseSimulator):
         """
         self.activity_tracking = at
 
+    def setBatchTransitions(self, batch, threshold=2):
+        """
+        Sets the use of batched transitions for BatchAtomicDEVS models. All imminent instances of the same class will transition with a single array-level call.
+        Only applies when no state saving is necessary, i.e. in local simulation.
+
+        :param batch: whether or not to use batched transitions
+        :param threshold: the minimal number of models of the same class and transition type to use a batched call
+        """
+        self.batch_transitions = batch
+        self.batch_threshold = threshold
+
+    def setMessageCopy(self, copy_method):
+        """
+        Sets the way messages are copied before they are passed to their receivers.
+
+        :param copy_method: 'pickle' (deep copy by pickling), 'custom' (the copy method of the message), 'none' (no copy at all) or 'frozen' (no copy, messages are made immutable and shared by all receivers)
+        """
+        copy_methods = {"pickle": 0, "custom": 1, "none": 2, "frozen": 3}
+        try:
+            self.msg_copy = copy_methods[copy_method]
+        except KeyError:
+            raise DEVSException("Unknown message copy method '%s', use one of %s" 
+                                % (copy_method, sorted(copy_methods)))
+        # The transfer functions are compiled for a specific copy method
+        self.routing_tables = {}
+
+    def setMessageValidation(self, validate):
+        """
+        Sets the validation of received messages, raising an exception as soon as a model modifies a message it received.
+        Meant for testing models with frozen messages (message copy mode 3), as these messages are shared by all receivers.
+
+        :param validate: whether or not to validate messages
+        """
+        self.msg_validation = validate
+
+    def setLocalParallel(self, processes):
+        """
+        Sets the use of worker processes on this machine for the output and transition functions, in local Parallel DEVS simulation.
+        The workers are forked at the start of every simulation run and own the states of the models, which are copied back when they are
+        stopped at the end of the run. This can't be combined with Classic DEVS, dynamic structure, distributed simulation, time warp,
+        memoization, tracing, profiling or activity tracking, nor with other threads running in this process.
+        A termination condition should not rely on the states of the models, except for those of BatchAtomicDEVS models.
+        Only worth it for models whose output and transition functions take tens of microseconds or more, see TransitionPool.
+
+        :param processes: the number of worker processes, or 0 to simulate in this process only
+        """
+        self.local_parallel = processes
+
     def setClassicDEVS(self, classic_DEVS):
         """
         Sets the use of Classic DEVS instead of Parallel DEVS.
 
         :param classicDEVS: whether or not to use Classic DEVS
         """
+        self.classic_devs = classic_DEVS
         # Do this once, to prevent checks for the classic DEVS formalism
         if classic_DEVS:
             # Methods, so CamelCase
@@ -346,18 +493,19 @@ class Controller(BaseSimulator):
         if not relocate:
             return
 
-        if self.running_irreversible is not None:
-            self.getProxy(self.running_irreversible).unsetIrreversible()
-            self.running_irreversible = None
+        for kernel in self.running_irreversible:
+            self.getProxy(kernel).unsetIrreversible()
+        self.running_irreversible = set()
 
-        while not self.no_finish_ring.acquire(False):
+        # Block on the lock instead of spinning, but keep checking whether simulation was stopped in the meantime
+        while not self.no_finish_ring.acquire(True, 0.05):
             if not self.run_gvt:
                 self.GVTdone()
                 return
-            time.sleep(0)
 
         kernels = {}
-        self.locked_kernels = set()
+        with self.lock_condition:
+            self.locked_kernels = set()
         relocation_rules = {}
         for model_id in relocate:
             source = self.model_ids[model_id].location
@@ -374,20 +522,29 @@ class Controller(BaseSimulator):
                 self.getProxy(destination).requestMigrationLock()
             relocation_rules.setdefault((source, destination), set()).add(model_id)
         while relocation_rules:
-            # Busy loop until everything is done
-            # Don't use an iterator, as we will change the list
-            for source, destination in relocation_rules.keys():
-                if (source in self.locked_kernels and 
-                        destination in self.locked_kernels):
-                    models = relocation_rules[(source, destination)]
-                    self.getProxy(source).migrateTo(destination, models)
-                    del relocation_rules[(source, destination)]
-                    kernels[source] -= len(models)
-                    kernels[destination] -= len(models)
-                    if kernels[source] == 0:
-                        self.getProxy(source).migrationUnlock()
-                    if kernels[destination] == 0:
-                        self.getProxy(destination).migrationUnlock()
+            ready = self.waitMigrationLocks(relocation_rules)
+            if not ready:
+                # Simulation stopped while waiting, so release the kernels that are already locked
+                with self.lock_condition:
+                    locked = [kernel for kernel in kernels if kernel in self.locked_kernels]
+                for kernel in locked:
+                    self.getProxy(kernel).migrationUnlock()
+                self.no_finish_ring.release()
+                self.GVTdone()
+                return
+            for source, destination in ready:
+                # All models of one kernel pair are transferred in bulk
+                models = relocation_rules.pop((source, destination))
+                self.getProxy(source).migrateTo(destination, models)
+                kernels[source] -= len(models)
+                kernels[destination] -= len(models)
+                # Local and remote receivers changed, so routing tables must be recompiled before unlocking
+                if kernels[source] == 0:
+                    self.getProxy(source).invalidateRouting()
+                    self.getProxy(source).migrationUnlock()
+                if kernels[destination] == 0:
+                    self.getProxy(destination).invalidateRouting()
+                    self.getProxy(destination).migrationUnlock()
         # OK, now check whether we need to visualize all locations or not
         if self.location_cell_view:
             visualizeLocations(self)
@@ -398,32 +555,63 @@ class Controller(BaseSimulator):
         # Allow the finishring algorithm again
         self.no_finish_ring.release()
 
+    def waitMigrationLocks(self, pairs, interval=0.05):
+        """
+        Sleep until notifyLocked makes both kernels of at least one pair ready for migration.
+        Regularly checks whether simulation was stopped in the meantime, e.g. because a kernel died.
+
+        :param pairs: iterable of (source, destination) kernel pairs
+        :param interval: the time between two checks whether simulation was stopped
+        :returns: list -- the pairs that are ready, empty if simulation was stopped
+        """
+        with self.lock_condition:
+            while self.run_gvt:
+                ready = [pair for pair in pairs 
+                         if (pair[0] in self.locked_kernels and 
+                             pair[1] in self.locked_kernels)]
+                if ready:
+                    return ready
+                self.lock_condition.wait(interval)
+        return []
+
     def checkForTemporaryIrreversible(self):
         """
-        Checks if one node is hosting all the models. If this is the case, this node will gain 'temporary irreversibility',
-        allowing it to skip state saving and thus avoiding the main overhead associated with time warp.
+        Checks which nodes can never receive a message from another node. This is the case if one node is hosting all the models,
+        but also for every node without any incoming connection from a model on another node, such as a node hosting only generators.
+        These nodes will gain 'temporary irreversibility', allowing them to skip state saving and thus avoiding the main overhead associated with time warp.
         """
-        # Check whether or not everything is located at a single node now
         if self.relocator.useLastStateOnly():
             # If this is the case, we will be unable to know which state to save the activity for
             # So disable it for now
             # This does offer a slight negative impact, though it isn't really worth fixing for the time being
             return
-        if isinstance(self.destinations[0], int):
-            current_kernel = self.destinations[0]
-        else:
-            current_kernel = 0
+        locations = []
         for kernel in self.destinations:
-            if isinstance(kernel, int):
-                loc = kernel
+            if kernel is None:
+                # Removed by a dynamic structure change
+                locations.append(None)
+            elif isinstance(kernel, int):
+                locations.append(kernel)
             else:
-                loc = 0
-            if loc != current_kernel:
-                break
-        else:
-            # We didn't break, so one of the nodes runs all at once
-            self.getProxy(current_kernel).setIrreversible()
-            self.running_irreversible = current_kernel
+                locations.append(0)
+        hosting = set(locations)
+        hosting.discard(None)
+        if len(hosting) > 1 and self.use_DSDEVS:
+            # Connections might be added at any time, so only a single node is safe
+            return
+        receiving = set()
+        for model in self.model_ids:
+            if model is None:
+                continue
+            source = locations[model.model_id]
+            for outport in model.OPorts:
+                for inport, _ in getattr(outport, "routing_outline", ()):
+                    destination = locations[inport.host_DEVS.model_id]
+                    if destination != source:
+                        receiving.add(destination)
+        for kernel in hosting - receiving - self.running_irreversible:
+            self.getProxy(kernel).setIrreversible()
+            self.running_irreversible.add(kernel)
 
     def notifyLocked(self, remote):
         """
@@ -431,7 +619,9 @@ class Controller(BaseSimulator):
 
         :param remote: the node that is locked
         """
-        self.locked_kernels.add(remote)
+        with self.lock_condition:
+            self.locked_kernels.add(remote)
+            self.lock_condition.notify_all()
 
     def dsRemovePort(self, port):
         """
@@ -465,6 +655,28 @@ class Controller(BaseSimulator):
         """
         self.dc_altered.add(p1)
 
+    def dsCompactModels(self, force=False):
+        """
+        Drop the models removed by dynamic structure changes from the list of local models and the list of
+        all models, keeping the order of the remaining models. Until then, removed models stay in these lists
+        as tombstones, which are skipped as they are no longer local. The lists are only compacted once the
+        tombstones make up ds_compact_fraction of them, so every removal takes constant time on average.
+        The IDs of the compacted models are reused by new models, after removing their activity.
+
+        :param force: whether to compact even if there are only a few tombstones
+        """
+        removed = self.ds_removed
+        if not removed:
+            return
+        if not force and len(removed) < self.ds_compact_fraction * len(self.model.component_set):
+            return
+        self.model.component_set[:] = [m for m in self.model.component_set if m not in removed]
+        self.model.models[:] = [m for m in self.model.models if m not in removed]
+        for model in removed:
+            self.total_activities.pop(model.model_id, None)
+            heapq.heappush(self.free_model_ids, model.model_id)
+        self.ds_removed = set()
+
     def dsUnscheduleModel(self, model):
         """
         Dynamic Structure change: remove an existing model
@@ -473,19 +685,23 @@ class Controller(BaseSimulator):
         """
         if isinstance(model, CoupledDEVS):
             for m in model.component_set:
-                self.dsUnscheduleModel(m, False)
+                self.dsUnscheduleModel(m)
             for port in model.IPorts:
                 self.dsRemovePort(port)
             for port in model.OPorts:
                 self.dsRemovePort(port)
         elif isinstance(model, AtomicDEVS):
-            self.model.component_set.remove(model)
-            self.model.models.remove(model)
+            # Stays in the model lists as a tombstone, see dsCompactModels
+            self.ds_removed.add(model)
             # The model is removed, so remove it from the scheduler
             self.model.scheduler.unschedule(model)
+            self.classic_wrappers.pop(model, None)
             self.model_ids[model.model_id] = None
             self.destinations[model.model_id] = None
             self.model.local_model_ids.remove(model.model_id)
+            if isinstance(model, BatchAtomicDEVS):
+                # Its row in the shared arrays can be reused by a new model
+                type(model).getBatchStore().release(model.batch_row)
             for port in model.IPorts:
                 self.dsRemovePort(port)
             for port in model.OPorts:
@@ -508,20 +724,34 @@ class Controller(BaseSimulator):
             for p in model.OPorts:
                 self.dc_altered.add(p)
         elif isinstance(model, AtomicDEVS):
-            model.model_id = len(self.model_ids)
+            if model in self.ds_removed:
+                # Removed and added again, so make sure it is only listed once
+                self.dsCompactModels(force=True)
+            if self.free_model_ids:
+                # Lowest first, so the lists indexed by model ID stay compact
+                model.model_id = heapq.heappop(self.free_model_ids)
+                self.model_ids[model.model_id] = model
+                self.destinations[model.model_id] = model
+            else:
+                model.model_id = len(self.model_ids)
+                self.model_ids.append(model)
+                self.destinations.append(model)
             model.full_name = model.parent.full_name + "." + model.getModelName()
             model.location = self.name
-            self.model_ids.append(model)
-            self.destinations.append(model)
             self.model.component_set.append(model)
             self.model.models.append(model)
             self.model.local_model_ids.add(model.model_id)
+            if self.profiling:
+                instrument(model)
             self.atomicInit(model, self.current_clock)
             p = model.parent
             model.select_hierarchy = [model]
             while p != None:
                 model.select_hierarchy = [p] + model.select_hierarchy
                 p = p.parent
+            model.select_priority = self.selectPriority(model, {})
+            if self.classic_devs:
+                self.classicWrapper(model)
             if model.time_next[0] == self.current_clock[0]:
                 # If scheduled for 'now', update the age manually
                 model.time_next = (model.time_next[0], self.current_clock[1])
@@ -0,0 +1,129 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental state saving, only recording the attributes of a state that changed since the previous save
+"""
+
+def _changed(old, new):
+    """
+    Compare two attribute values, considering values that can't be compared as changed.
+
+    :param old: the saved value
+    :param new: the current value
+    :returns: bool -- whether or not the value changed
+    """
+    try:
+        return bool(old != new)
+    except Exception:
+        return True
+
+class DeltaState(object):
+    """
+    A saved state that only stores the attributes that changed relative to the previous saved state of the same model.
+    Every *checkpoint_interval* saves, or whenever the state has no attribute dictionary, a full copy is stored instead.
+    Both are copied with the state saver of the simulation. Loading a state walks back to the nearest full copy and
+    replays the deltas from there.
+    """
+    def __init__(self, time_last, time_next, state, activity, my_input, elapsed, previous, checkpoint_interval, state_saver):
+        """
+        Constructor
+
+        :param time_last: time_last to save
+        :param time_next: time_next to save
+        :param state: state to save
+        :param activity: the activity of the computation
+        :param my_input: the state input to save for memorisation
+        :param elapsed: the time elapsed
+        :param previous: the previously saved DeltaState of the same model, or None
+        :param checkpoint_interval: the maximal number of deltas between two full copies
+        :param state_saver: the state saver class used to copy the state and the changed attributes
+        """
+        self.time_last = time_last
+        self.time_next = time_next
+        self.activity = activity
+        self.my_input = my_input
+        self.elapsed = elapsed
+        self.state_type = type(state)
+        attrs = getattr(state, "__dict__", None)
+        if (previous is None or
+                attrs is None or
+                previous.distance + 1 >= checkpoint_interval or
+                previous.state_type is not self.state_type):
+            self.base = None
+            self.distance = 0
+            self.full = state_saver(time_last, time_next, state, activity, my_input, elapsed)
+            self.delta = None
+            self.removed = None
+            # Copy of the attributes of the state, only kept by the most recent save
+            self.current = None if attrs is None else dict(self.full.loadState().__dict__)
+        else:
+            previous_attrs = previous.materialize()
+            changed = {}
+            for name in attrs:
+                if name not in previous_attrs or _changed(previous_attrs[name], attrs[name]):
+                    changed[name] = attrs[name]
+            self.removed = [name for name in previous_attrs if name not in attrs]
+            self.base = previous
+            self.distance = previous.distance + 1
+            self.full = None
+            self.delta = state_saver(time_last, time_next, changed, activity, my_input, elapsed)
+            # Take over the materialized attributes of the previous save, instead of copying them
+            previous.current = None
+            previous_attrs.update(self.delta.loadState())
+            for name in self.removed:
+                del previous_attrs[name]
+            self.current = previous_attrs
+
+    def replay(self):
+        """
+        Rebuild the attributes of the saved state, by replaying the deltas from the nearest full copy.
+
+        :returns: dict -- mapping attribute names to a fresh copy of their saved value
+        """
+        chain = []
+        saved = self
+        while saved.base is not None:
+            chain.append(saved)
+            saved = saved.base
+        attrs = dict(saved.full.loadState().__dict__)
+        for saved in reversed(chain):
+            attrs.update(saved.delta.loadState())
+            for name in saved.removed:
+                del attrs[name]
+        return attrs
+
+    def materialize(self):
+        """
+        Get the attributes of the saved state, to compare the next state with.
+        The most recent save keeps them, older saves rebuild them without keeping the result.
+
+        :returns: dict -- mapping attribute names to their saved value
+        """
+        if self.current is not None:
+            return self.current
+        return self.replay()
+
+    def loadState(self):
+        """
+        Load the state from the saved data
+
+        :returns: state -- the state that was saved
+        """
+        if self.full is not None:
+            return self.full.loadState()
+        state = self.state_type.__new__(self.state_type)
+        state.__dict__.update(self.replay())
+        return state
@@ -0,0 +1,100 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental direct connection, only flattening the connections of the output ports affected by a structural change
+"""
+
+from pypdevs.DEVS import AtomicDEVS, CoupledDEVS
+
+def composeZ(first_z, new_z):
+    """
+    Compose two transfer functions, either of which can be None.
+
+    :param first_z: the transfer function that is applied first
+    :param new_z: the transfer function that is applied to its result
+    :returns: the composed transfer function
+    """
+    if first_z is None:
+        return new_z
+    elif new_z is None:
+        return first_z
+    else:
+        return lambda x: new_z(first_z(x))
+
+def upstreamOutports(ports):
+    """
+    Find all output ports of atomic models whose connections pass through one of the ports.
+
+    :param ports: iterable of the changed ports
+    :returns: set -- the affected output ports of atomic models
+    """
+    affected = set()
+    visited = set()
+    worklist = list(ports)
+    while worklist:
+        port = worklist.pop()
+        if port in visited:
+            continue
+        visited.add(port)
+        if isinstance(port.host_DEVS, AtomicDEVS) and not port.is_input:
+            affected.add(port)
+        else:
+            worklist.extend(port.inline)
+    return affected
+
+def expandPort(port, expansions):
+    """
+    Get all input ports of atomic models that are reached from a port of a coupled model, with the composed transfer functions.
+
+    :param port: the port of a coupled model
+    :param expansions: cache of the expansion of every port of a coupled model
+    :returns: list -- tuples of the input port and the transfer function from this port onwards
+    """
+    try:
+        return expansions[port]
+    except KeyError:
+        pass
+    expansion = []
+    for outline in port.outline:
+        z = port.z_functions.get(outline, None)
+        if isinstance(outline.host_DEVS, CoupledDEVS):
+            for inport, next_z in expandPort(outline, expansions):
+                expansion.append((inport, composeZ(z, next_z)))
+        else:
+            expansion.append((outline, z))
+    expansions[port] = expansion
+    return expansion
+
+def redoDirectConnection(ports):
+    """
+    Recompute the routing outline of all output ports of atomic models affected by changes to the ports.
+    All changes of a single time step should be passed at once, as the expansion of coupled ports is shared between them.
+
+    :param ports: iterable of the changed ports
+    :returns: set -- the output ports whose routing outline was recomputed
+    """
+    affected = upstreamOutports(ports)
+    expansions = {}
+    for outport in affected:
+        routing_outline = []
+        seen = set()
+        for inport, z in expandPort(outport, expansions):
+            # Only keep the first path to every input port
+            if inport not in seen:
+                seen.add(inport)
+                routing_outline.append((inport, z))
+        outport.routing_outline = routing_outline
+    return affected
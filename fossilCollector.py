@@ -0,0 +1,121 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fossil collection of saved states within a memory budget
+"""
+
+import pickle
+
+# Rough size of a saved state object without the state itself
+ENTRY_OVERHEAD = 200
+
+class FossilCollector(object):
+    """
+    Keeps track of the (estimated) memory used by the saved states of a kernel, and removes
+    all history that can no longer be needed once the budget is getting exhausted.
+    """
+    def __init__(self, budget, check_interval=1000, collect_fraction=0.8, request_fraction=0.9, resample=10):
+        """
+        Constructor
+
+        :param budget: the (approximate) number of bytes the history of this kernel may use
+        :param check_interval: the number of transitions between two checks of the budget
+        :param collect_fraction: fraction of the budget above which history before the GVT is removed
+        :param request_fraction: fraction of the budget above which an early GVT round is requested
+        :param resample: the number of checks after which the size of states is measured again
+        """
+        self.budget = budget
+        self.check_interval = check_interval
+        self.collect_fraction = collect_fraction
+        self.request_fraction = request_fraction
+        self.resample = resample
+        self.countdown = check_interval
+        self.checks = 0
+        self.state_sizes = {}
+        self.usage = 0
+        self.collections = 0
+        self.removed = 0
+        self.gvt_requests = 0
+        self.last_request_gvt = None
+
+    def stateSize(self, aDEVS):
+        """
+        Estimate the size of a single saved state of a model, based on a sample of its class.
+
+        :param aDEVS: the model
+        :returns: int -- the estimated size in bytes
+        """
+        cls = type(aDEVS)
+        try:
+            return self.state_sizes[cls]
+        except KeyError:
+            try:
+                size = len(pickle.dumps(aDEVS.state, pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                size = 0
+            size = self.state_sizes[cls] = size + ENTRY_OVERHEAD
+            return size
+
+    def measure(self, models):
+        """
+        Estimate the memory used by the history of all models.
+
+        :param models: iterable of the local models
+        :returns: int -- the estimated number of bytes
+        """
+        self.checks += 1
+        if self.checks % self.resample == 0:
+            self.state_sizes = {}
+        self.usage = sum([len(m.old_states) * self.stateSize(m)
+                          for m in models])
+        return self.usage
+
+    def collect(self, models, gvt):
+        """
+        Remove all history before the GVT, only keeping the last state before it, which is still needed to revert to the GVT.
+
+        :param models: iterable of the local models
+        :param gvt: the current GVT
+        """
+        self.collections += 1
+        for aDEVS in models:
+            old_states = aDEVS.old_states
+            index = 0
+            # Keep the last state before the GVT
+            while index + 1 < len(old_states) and old_states[index + 1].time_last[0] < gvt:
+                index += 1
+            if index:
+                self.removed += index
+                del old_states[:index]
+
+    def getStatistics(self, models):
+        """
+        Get the history size of every model and the counters of the collector.
+
+        :param models: iterable of the local models
+        :returns: dict -- containing the per model history under 'models' and the totals
+        """
+        per_model = {}
+        for aDEVS in models:
+            entries = len(aDEVS.old_states)
+            per_model[aDEVS.getModelFullName()] = {"entries": entries,
+                                                   "bytes": entries * self.stateSize(aDEVS)}
+        return {"models": per_model,
+                "usage": sum([v["bytes"] for v in per_model.values()]),
+                "budget": self.budget,
+                "collections": self.collections,
+                "removed": self.removed,
+                "gvt_requests": self.gvt_requests}
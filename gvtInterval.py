@@ -0,0 +1,71 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Adaptive control of the interval between two GVT rounds
+"""
+
+class AdaptiveGVTInterval(object):
+    """
+    Shortens the GVT interval when the history of the kernels grows too large or rollbacks are
+    frequent, and lengthens it when all kernels progress smoothly. As the number of rollbacks per
+    round drops with a shorter interval, a steady rollback rate makes the interval settle where
+    a round has about *rollbacks_high* rollbacks.
+    """
+    def __init__(self, min_interval, max_interval, memory_high=0.75, memory_low=0.25, shrink=0.5, grow=1.5, rollbacks_high=10):
+        """
+        Constructor
+
+        :param min_interval: the minimal interval between two GVT rounds
+        :param max_interval: the maximal interval between two GVT rounds
+        :param memory_high: fraction of the history budget above which the interval is shortened
+        :param memory_low: fraction of the history budget below which the interval may be lengthened
+        :param shrink: factor to apply to the interval when shortening it
+        :param grow: factor to apply to the interval when lengthening it
+        :param rollbacks_high: number of rollbacks in a GVT round above which the interval is shortened
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.memory_high = memory_high
+        self.memory_low = memory_low
+        self.shrink = shrink
+        self.grow = grow
+        self.rollbacks_high = rollbacks_high
+        self.prev_rollbacks = {}
+
+    def nextInterval(self, interval, metrics, status):
+        """
+        Compute the interval to wait before the next GVT round.
+
+        :param interval: the current interval
+        :param metrics: the metrics of the GVT round that just finished
+        :param status: the last status reported by every kernel
+        :returns: float -- the new interval
+        """
+        pressure = 0.0
+        rollbacks = 0
+        for kernel in status:
+            kernel_status = status[kernel]
+            if kernel_status.get("budget"):
+                pressure = max(pressure,
+                               float(kernel_status["usage"]) / kernel_status["budget"])
+            total = kernel_status.get("rollbacks", 0)
+            rollbacks += total - self.prev_rollbacks.get(kernel, 0)
+            self.prev_rollbacks[kernel] = total
+        if pressure > self.memory_high or rollbacks > self.rollbacks_high:
+            interval *= self.shrink
+        elif pressure < self.memory_low and rollbacks == 0 and metrics["advance"] > 0:
+            interval *= self.grow
+        return max(self.min_interval, min(self.max_interval, interval))
@@ -0,0 +1,175 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bounded memoization cache for transitions that are re-executed after a rollback
+"""
+
+from collections import OrderedDict
+from operator import itemgetter
+import hashlib
+import pickle
+
+# Rough per-entry overhead of the key, the saved state object and the dictionary slot
+ENTRY_OVERHEAD = 256
+
+def hashableByValue(value):
+    """
+    Check whether or not the class of a value defines its own hash, instead of hashing on identity.
+    Identity hashes can't be used, as the object might be altered in place afterwards.
+
+    :param value: the value to check
+    :returns: bool -- whether or not the value can be part of a key
+    """
+    value_hash = type(value).__hash__
+    return value_hash is not None and value_hash is not object.__hash__
+
+class MemoCache(object):
+    """
+    Memoization cache with LRU eviction, keyed by the complete transition input.
+    """
+    def __init__(self, budget=64*1024*1024, pickle_keys=False):
+        """
+        Constructor
+
+        :param budget: the (approximate) number of bytes the cache may use
+        :param pickle_keys: whether or not to pickle states and messages that aren't hashable by value
+        """
+        self.entries = OrderedDict()
+        self.budget = budget
+        self.pickle_keys = pickle_keys
+        self.state_sizes = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def makeKey(self, aDEVS, ttype, clock, elapsed):
+        """
+        Compute the key of a transition that is about to happen.
+
+        The state is represented by the result of the *memoKey* method of the model if it has one,
+        e.g. a version counter, or by the state itself if its class is hashable by value. Other
+        states and messages are only pickled if pickled keys are enabled, as pickling on every
+        transition usually costs more than the transitions it saves.
+
+        :param aDEVS: the model that will transition, still in its old state
+        :param ttype: the type of the transition
+        :param clock: the time at which the transition happens
+        :param elapsed: the elapsed time passed to the transition
+        :returns: tuple -- the key of the transition and its estimated size, the key is None if the transition can't be memoized
+        """
+        # Ports are referenced by their ID, pickling the port objects would pickle the complete model
+        inputs = sorted([(port.port_id, tuple(aDEVS.my_input[port]))
+                         for port in aDEVS.my_input], key=itemgetter(0))
+        memo_key = getattr(aDEVS, "memoKey", None)
+        state = aDEVS.state if memo_key is None else memo_key()
+        if (memo_key is not None or hashableByValue(state)) and all(
+                hashableByValue(m) for _, messages in inputs for m in messages):
+            try:
+                key = (aDEVS.model_id, ttype, clock, elapsed, state, tuple(inputs))
+                hash(key)
+            except TypeError:
+                # E.g. a tuple containing a list
+                pass
+            else:
+                return key, self.stateSize(aDEVS)
+        if not self.pickle_keys:
+            return None, 0
+        data = pickle.dumps((aDEVS.state, inputs), pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        return (aDEVS.model_id, ttype, clock, elapsed, digest), len(data)
+
+    def stateSize(self, aDEVS):
+        """
+        Estimate the size of the state of a model, based on a sample of its class.
+
+        :param aDEVS: the model
+        :returns: int -- the estimated size in bytes
+        """
+        cls = type(aDEVS)
+        try:
+            return self.state_sizes[cls]
+        except KeyError:
+            try:
+                size = len(pickle.dumps(aDEVS.state, pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                size = 0
+            self.state_sizes[cls] = size
+            return size
+
+    def lookup(self, key):
+        """
+        Look up a transition in the cache.
+
+        :param key: the key as returned by makeKey
+        :returns: the saved state after this transition, or None if it is unknown
+        """
+        try:
+            entry = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def store(self, key, size, saved):
+        """
+        Add the result of a transition to the cache, evicting the least recently used entries if the budget is exceeded.
+
+        :param key: the key as returned by makeKey
+        :param size: the estimated size of the transition data, as returned by makeKey
+        :param saved: the saved state after this transition
+        """
+        size += ENTRY_OVERHEAD
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self.entries[key] = (saved, size)
+        self.size += size
+        while self.size > self.budget and self.entries:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def fossilCollect(self, time):
+        """
+        Remove all entries for transitions before the specified time, as these can never be re-executed.
+
+        :param time: the time before which all entries are removed (typically the GVT)
+        """
+        for key in [key for key in self.entries if key[2][0] < time]:
+            self.size -= self.entries.pop(key)[1]
+
+    def clear(self):
+        """
+        Remove all entries from the cache, keeping the counters.
+        """
+        self.entries.clear()
+        self.size = 0
+
+    def getStatistics(self):
+        """
+        Get the hit and miss counters of this cache.
+
+        :returns: dict -- the counters and current usage of the cache
+        """
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "size": self.size,
+                "budget": self.budget}
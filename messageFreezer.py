@@ -0,0 +1,135 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Immutable messages, which can be shared by all receivers without copying them
+"""
+
+from collections.abc import Mapping
+from decimal import Decimal
+from enum import Enum
+from fractions import Fraction
+from types import MappingProxyType
+import pickle
+
+from pypdevs.util import DEVSException
+
+# Types that are immutable by themselves
+IMMUTABLE_TYPES = (int, float, complex, str, bytes, bool, type(None), frozenset,
+                   Decimal, Enum, Fraction)
+
+class FrozenDict(Mapping):
+    """
+    A mapping that refuses all modifications after construction.
+    It is deliberately no subclass of dict, as the methods of dict would bypass the protection.
+    """
+    __slots__ = ("_items",)
+
+    def __init__(self, items=()):
+        """
+        Constructor
+
+        :param items: the dictionary or iterable of key-value pairs to copy
+        """
+        object.__setattr__(self, "_items", MappingProxyType(dict(items)))
+
+    def __setattr__(self, name, value):
+        raise DEVSException("Attempt to modify a frozen message")
+
+    __delattr__ = __setattr__
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return "FrozenDict(%r)" % dict(self._items)
+
+    def __reduce__(self):
+        """
+        For pickling, as there is no instance dictionary
+        """
+        return (FrozenDict, (dict(self._items),))
+
+    def __hash__(self):
+        return hash(frozenset(self._items.items()))
+
+def freeze(value):
+    """
+    Convert a message to an immutable equivalent. Lists become tuples, sets become frozensets,
+    dictionaries become FrozenDicts and objects provide their own immutable version through
+    a *__freeze__* method. Objects of other classes can't be shared safely, so they are refused.
+
+    :param value: the message to freeze
+    :returns: the immutable message
+    """
+    if isinstance(value, IMMUTABLE_TYPES):
+        return value
+    elif isinstance(value, (list, tuple)):
+        frozen = tuple([freeze(v) for v in value])
+        if hasattr(value, "_fields"):
+            # Keep named tuples intact
+            return type(value)._make(frozen)
+        return frozen
+    elif isinstance(value, set):
+        return frozenset([freeze(v) for v in value])
+    elif isinstance(value, FrozenDict):
+        return value
+    elif isinstance(value, dict):
+        return FrozenDict({key: freeze(value[key]) for key in value})
+    elif isinstance(value, bytearray):
+        return bytes(value)
+    freezer = getattr(value, "__freeze__", None)
+    if freezer is None:
+        raise DEVSException("Message of class '%s' can't be frozen, define a __freeze__ method "
+                            "returning an immutable version of it" % type(value).__name__)
+    return freezer()
+
+def freezeOutput(outbag):
+    """
+    Freeze all messages in an output bag. The lists containing the messages are left untouched.
+
+    :param outbag: dictionary containing the port as key and a list of messages as value
+    :returns: dict -- the output bag with all messages frozen
+    """
+    return {port: [freeze(m) for m in outbag[port]] for port in outbag}
+
+def fingerprintInput(inbag):
+    """
+    Compute a fingerprint of all messages in an input bag, to detect mutations later on.
+
+    :param inbag: dictionary containing the port as key and a list of messages as value
+    :returns: dict -- the port as key and the fingerprint of its messages as value
+    """
+    return {port: pickle.dumps(inbag[port], pickle.HIGHEST_PROTOCOL)
+            for port in inbag}
+
+def validateInput(aDEVS, inbag, fingerprints):
+    """
+    Check that none of the messages in an input bag were modified since the fingerprints were made.
+
+    :param aDEVS: the model that received the messages, only used for the error message
+    :param inbag: dictionary containing the port as key and a list of messages as value
+    :param fingerprints: the fingerprints as returned by fingerprintInput
+    """
+    for port in inbag:
+        if pickle.dumps(inbag[port], pickle.HIGHEST_PROTOCOL) != fingerprints[port]:
+            raise DEVSException("Immutable message on port '%s' was modified by model '%s'"
+                                % (port.getPortName(), aDEVS.getModelFullName()))
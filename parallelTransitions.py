@@ -0,0 +1,286 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Conservative parallel simulation of Parallel DEVS on a single machine, with worker processes performing the output and transition functions
+"""
+
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pypdevs.batchDEVS import BatchAtomicDEVS
+from pypdevs.util import DEVSException
+
+def workerLoop(conn, models, ports, port_ids, private):
+    """
+    Main loop of a worker process, which owns the authoritative copy of its models.
+
+    :param conn: the pipe to the simulation kernel
+    :param models: dictionary of model IDs to the models owned by this worker
+    :param ports: list of all ports, indexed by their ID in the pool
+    :param port_ids: dictionary of every port to its ID in the pool
+    :param private: the IDs of the owned models whose state is not in shared memory
+    """
+    while True:
+        command = conn.recv()
+        try:
+            if command[0] == "output":
+                outputs = []
+                for model_id in command[1]:
+                    outbag = models[model_id].outputFnc()
+                    outputs.append([(port_ids[port], outbag[port]) for port in outbag])
+                conn.send(("ok", outputs))
+            elif command[0] == "transition":
+                _, clock, jobs = command
+                t, age = clock
+                times = []
+                for model_id, ttype, inputs in jobs:
+                    aDEVS = models[model_id]
+                    aDEVS.my_input = {ports[port_id]: msgs for port_id, msgs in inputs}
+                    if ttype == 1:
+                        aDEVS.elapsed = None
+                        aDEVS.state = aDEVS.intTransition()
+                    elif ttype == 2:
+                        aDEVS.elapsed = t - aDEVS.time_last[0]
+                        aDEVS.state = aDEVS.extTransition(aDEVS.my_input)
+                    else:
+                        aDEVS.elapsed = 0.
+                        aDEVS.state = aDEVS.confTransition(aDEVS.my_input)
+                    ta = aDEVS.timeAdvance()
+                    if ta < 0:
+                        raise DEVSException("Negative time advance in atomic model '" + \
+                                            aDEVS.getModelFullName() + "' with value " + \
+                                            str(ta) + " at time " + str(t))
+                    aDEVS.time_last = clock
+                    aDEVS.time_next = (t + ta, 1 if ta else (age + 1))
+                    aDEVS.my_input = {}
+                    times.append(aDEVS.time_next)
+                conn.send(("ok", times))
+            elif command[0] == "states":
+                conn.send(("ok", {model_id: models[model_id].state for model_id in private}))
+            elif command[0] == "stop":
+                conn.send(("ok", None))
+                break
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+class TransitionPool(object):
+    """
+    A pool of worker processes, forked after initialisation so that every worker inherits the models.
+    Every model is owned by a single worker, which performs all its output and transition functions.
+    The kernel exchanges the messages and the new times of the models with the workers in a single
+    command per worker and per step, so the workers synchronise conservatively and never roll back.
+    Ports are sent as their index in a table shared by all processes.
+
+    The arrays of BatchAtomicDEVS classes are moved to shared memory, so their states are always
+    visible in the kernel. Other states are only copied back to the kernel at the end of a simulation run.
+
+    Every step costs two round trips to the workers, and the kernel still routes and pickles all
+    messages: about 30 microseconds per step plus 2 microseconds per imminent model in the kernel,
+    whereas trivial models take about 0.5 microseconds per model in serial simulation. So this only
+    pays off if the output and transition functions take tens of microseconds per model or more.
+    """
+    def __init__(self, processes):
+        """
+        Constructor
+
+        :param processes: the number of worker processes
+        """
+        self.processes = processes
+        self.workers = []
+        self.connections = []
+        self.batch_memory = []
+
+    def start(self, models):
+        """
+        Fork the workers, dividing the models over them.
+
+        :param models: all (initialised) atomic models of the simulation
+        """
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            raise DEVSException("Local parallel transitions require the 'fork' start method")
+        self.models = {aDEVS.model_id: aDEVS for aDEVS in models}
+        self.ports = []
+        self.port_ids = {}
+        for aDEVS in self.models.values():
+            for port in aDEVS.IPorts + aDEVS.OPorts:
+                self.port_ids[port] = len(self.ports)
+                self.ports.append(port)
+        self.shareBatchStates()
+        for rank in range(self.processes):
+            # Must match split
+            owned = {model_id: aDEVS for model_id, aDEVS in self.models.items() 
+                     if model_id % self.processes == rank}
+            private = [model_id for model_id, aDEVS in owned.items() 
+                       if not isinstance(aDEVS, BatchAtomicDEVS)]
+            parent, child = context.Pipe()
+            worker = context.Process(target=workerLoop, 
+                                     args=(child, owned, self.ports, self.port_ids, private))
+            worker.daemon = True
+            worker.start()
+            # Only the worker uses this end, so the kernel notices when the worker dies
+            child.close()
+            self.workers.append(worker)
+            self.connections.append(parent)
+
+    def shareBatchStates(self):
+        """
+        Move the arrays of all BatchAtomicDEVS classes to shared memory, before the workers are forked.
+        """
+        classes = set([type(aDEVS) for aDEVS in self.models.values() 
+                       if isinstance(aDEVS, BatchAtomicDEVS)])
+        for cls in classes:
+            store = cls.getBatchStore()
+            for name, array in store.arrays.items():
+                memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+                shared[:] = array
+                store.arrays[name] = shared
+                self.batch_memory.append((store, name, memory))
+
+    def unshareBatchStates(self):
+        """
+        Copy the arrays of all BatchAtomicDEVS classes back to private memory, and release the shared memory.
+        """
+        for store, name, memory in self.batch_memory:
+            store.arrays[name] = np.array(store.arrays[name])
+            try:
+                memory.close()
+            except BufferError:
+                # Some array still refers to it, it is unmapped when that array is freed
+                pass
+            memory.unlink()
+        self.batch_memory = []
+
+    def broadcast(self, commands):
+        """
+        Send a command to every worker that has one, and wait for all their results.
+
+        :param commands: list containing the command for every worker, or None
+        :returns: list -- the result of every worker, or None
+        """
+        for conn, command in zip(self.connections, commands):
+            if command is not None:
+                conn.send(command)
+        results = []
+        error = None
+        for conn, command in zip(self.connections, commands):
+            if command is None:
+                results.append(None)
+                continue
+            status, result = conn.recv()
+            if status == "error":
+                # Still receive the results of the other workers, so that the next command gets the right answers
+                error = result
+                result = None
+            results.append(result)
+        if error is not None:
+            raise DEVSException("Exception in local parallel worker:\n" + error)
+        return results
+
+    def split(self, models):
+        """
+        Split models over the workers that own them.
+
+        :param models: iterable of models
+        :returns: list -- the list of models of every worker
+        """
+        processes = self.processes
+        requests = [[] for _ in range(processes)]
+        for aDEVS in models:
+            requests[aDEVS.model_id % processes].append(aDEVS)
+        return requests
+
+    def outputs(self, imminent):
+        """
+        Compute the output of all imminent models.
+
+        :param imminent: the imminent models
+        :returns: list -- tuples of the model and its output, with the output ports of the model in the kernel as keys, in the order of the imminent models
+        """
+        requests = self.split(imminent)
+        commands = [("output", [aDEVS.model_id for aDEVS in request]) if request else None
+                    for request in requests]
+        ports = self.ports
+        bags = {}
+        for request, result in zip(requests, self.broadcast(commands)):
+            if result is None:
+                continue
+            for aDEVS, bag in zip(request, result):
+                bags[aDEVS] = {ports[port_id]: msgs for port_id, msgs in bag}
+        # In the order of the imminent models, as in serial simulation, so messages are routed in the same order
+        return [(aDEVS, bags[aDEVS]) for aDEVS in imminent]
+
+    def transition(self, trans, clock):
+        """
+        Perform the transitions of all models, and update their times in the kernel.
+
+        :param trans: dictionary containing all models and their requested transition
+        :param clock: the time at which the transitions happen
+        """
+        requests = self.split(trans)
+        port_ids = self.port_ids
+        commands = []
+        for request in requests:
+            if not request:
+                commands.append(None)
+                continue
+            jobs = []
+            for aDEVS in request:
+                my_input = aDEVS.my_input
+                jobs.append((aDEVS.model_id, 
+                             trans[aDEVS], 
+                             [(port_ids[port], my_input[port]) for port in my_input]))
+            commands.append(("transition", clock, jobs))
+        for request, result in zip(requests, self.broadcast(commands)):
+            if result is None:
+                continue
+            for aDEVS, time_next in zip(request, result):
+                aDEVS.time_last = clock
+                aDEVS.time_next = time_next
+
+    def collectStates(self):
+        """
+        Copy the states of all models that are not in shared memory from the workers to the models in the kernel.
+        """
+        for states in self.broadcast([("states",)] * self.processes):
+            for model_id, state in states.items():
+                self.models[model_id].state = state
+
+    def stop(self):
+        """
+        Stop all workers and release the shared memory, also if a worker failed.
+        """
+        try:
+            self.broadcast([("stop",)] * self.processes)
+        finally:
+            for worker in self.workers:
+                worker.join(1.0)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            for conn in self.connections:
+                conn.close()
+            self.workers = []
+            self.connections = []
+            self.unshareBatchStates()
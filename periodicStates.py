@@ -0,0 +1,208 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Periodic state saving, where states between two checkpoints are recomputed by coasting forward
+"""
+
+from math import sqrt
+import pickle
+import weakref
+
+def snapshotInput(my_input):
+    """
+    Copy an input bag, so that the logged input can't be altered by the transitions that receive it.
+    The messages are copied per port, as pickling the ports would pickle the complete model.
+
+    :param my_input: dictionary containing the port as key and a list of messages as value
+    :returns: dict -- the copied input bag
+    """
+    return {port: pickle.loads(pickle.dumps(my_input[port], pickle.HIGHEST_PROTOCOL))
+            for port in my_input}
+
+class CheckpointPolicy(object):
+    """
+    Decides when a full checkpoint of a state must be saved. In adaptive mode, the interval is
+    recomputed periodically from the observed rollback rate: frequent rollbacks make coasting
+    forward expensive, so the interval shrinks, while the absence of rollbacks makes it grow.
+    """
+    def __init__(self, interval=8, adaptive=False, min_interval=1, max_interval=64, window=1000, save_cost=1.0):
+        """
+        Constructor
+
+        :param interval: the (initial) number of transitions between two checkpoints
+        :param adaptive: whether or not to adapt the interval to the observed rollbacks
+        :param min_interval: the minimal interval in adaptive mode
+        :param max_interval: the maximal interval in adaptive mode
+        :param window: the number of saves between two adaptations of the interval
+        :param save_cost: the cost of saving a state, relative to the cost of a transition
+        """
+        self.interval = interval
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.window = window
+        self.save_cost = save_cost
+        self.saves = 0
+        self.checkpoints = 0
+        self.rollbacks = 0
+        self.coast_steps = 0
+        self.window_saves = 0
+        self.window_rollbacks = 0
+
+    def needsCheckpoint(self, previous):
+        """
+        Checks whether or not the next save should be a full checkpoint.
+
+        :param previous: the previously saved state of the model, or None
+        :returns: bool -- whether or not a checkpoint is required
+        """
+        self.saves += 1
+        self.window_saves += 1
+        if self.adaptive and self.window_saves >= self.window:
+            self.adapt()
+        if previous is None or getattr(previous, "coast_distance", 0) + 1 >= self.interval:
+            self.checkpoints += 1
+            return True
+        return False
+
+    def rolledBack(self):
+        """
+        Notify the policy that the kernel rolled back.
+        """
+        self.rollbacks += 1
+        self.window_rollbacks += 1
+
+    def coasted(self, distance):
+        """
+        Notify the policy that a state was recomputed by coasting forward.
+        This also happens for other reasons than rollbacks, so it doesn't count as one.
+
+        :param distance: the number of transitions that were re-executed
+        """
+        self.coast_steps += distance
+
+    def adapt(self):
+        """
+        Recompute the interval from the rollbacks in the last window. The cost per transition is
+        save_cost / interval for saving and rollback_rate * interval / 2 for coasting forward,
+        which is minimal for interval = sqrt(2 * save_cost / rollback_rate).
+        """
+        if self.window_rollbacks == 0:
+            interval = self.interval * 2
+        else:
+            rate = float(self.window_rollbacks) / self.window_saves
+            interval = int(round(sqrt(2 * self.save_cost / rate)))
+        self.interval = max(self.min_interval, min(self.max_interval, interval))
+        self.window_saves = 0
+        self.window_rollbacks = 0
+
+    def getStatistics(self):
+        """
+        Get the statistics of this policy.
+
+        :returns: dict -- the current interval and the counters
+        """
+        return {"interval": self.interval,
+                "saves": self.saves,
+                "checkpoints": self.checkpoints,
+                "rollbacks": self.rollbacks,
+                "coast_steps": self.coast_steps}
+
+class LoggedState(object):
+    """
+    A saved state that doesn't contain the state itself, only the transition that led to it.
+    Loading it restores the nearest previous checkpoint and coasts forward by re-executing the logged
+    transitions, without producing any output or traces. This requires the transition functions to
+    only depend on the state, the elapsed time and the input, as required by the DEVS formalism.
+    Only a weak reference to the model is kept, so that the history doesn't keep removed or relocated models alive.
+    """
+    def __init__(self, time_last, time_next, activity, my_input, elapsed, ttype, model, base, policy):
+        """
+        Constructor
+
+        :param time_last: time_last to save
+        :param time_next: time_next to save
+        :param activity: the activity of the computation
+        :param my_input: a copy of the input of the transition, taken before the transition
+        :param elapsed: the elapsed time of the transition
+        :param ttype: the type of the transition
+        :param model: the model that performed the transition
+        :param base: the previously saved state of the model
+        :param policy: the CheckpointPolicy to notify when coasting forward
+        """
+        self.time_last = time_last
+        self.time_next = time_next
+        self.activity = activity
+        self.my_input = my_input
+        self.elapsed = elapsed
+        self.ttype = ttype
+        self.model = weakref.ref(model)
+        self.base = base
+        self.policy = policy
+        self.coast_distance = getattr(base, "coast_distance", 0) + 1
+
+    def __getstate__(self):
+        """
+        For pickling, e.g. when the model is relocated together with its history
+
+        :returns: dict -- the attributes, with a strong reference to the model
+        """
+        retdict = dict(self.__dict__)
+        retdict["model"] = self.model()
+        return retdict
+
+    def __setstate__(self, retdict):
+        """
+        For unpickling
+
+        :param retdict: dictionary containing attributes and their value
+        """
+        self.__dict__.update(retdict)
+        self.model = weakref.ref(retdict["model"])
+
+    def loadState(self, model=None):
+        """
+        Load the state by coasting forward from the nearest checkpoint
+
+        :param model: the model to re-execute the transitions on, defaults to the model that performed them
+        :returns: state -- the state after the logged transition
+        """
+        chain = []
+        saved = self
+        while isinstance(saved, LoggedState):
+            chain.append(saved)
+            saved = saved.base
+        state = saved.loadState()
+        if model is None:
+            model = self.model()
+        # The transition functions work on the model itself, so restore it afterwards
+        # They are looked up on the class, so that replays don't count in the profile of the model
+        cls = type(model)
+        backup = (model.state, model.elapsed)
+        try:
+            for saved in reversed(chain):
+                model.state = state
+                model.elapsed = saved.elapsed
+                if saved.ttype == 1:
+                    state = cls.intTransition(model)
+                elif saved.ttype == 2:
+                    state = cls.extTransition(model, snapshotInput(saved.my_input))
+                else:
+                    state = cls.confTransition(model, snapshotInput(saved.my_input))
+        finally:
+            model.state, model.elapsed = backup
+        self.policy.coasted(len(chain))
+        return state
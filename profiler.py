@@ -0,0 +1,152 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Profiling of the user functions of atomic models
+"""
+
+import pypdevs.accurate_time as time
+
+PROFILED_FUNCTIONS = ("intTransition", "extTransition", "confTransition", "outputFnc", "timeAdvance")
+
+# Time spent in nested profiled calls, one entry per active call
+_children = []
+
+class ProfiledFunction(object):
+    """
+    Replaces a function of a single model instance, counting its calls and measuring its time.
+    Only the model and the function name are stored, so the model remains picklable and statistics
+    move along with the model when it is relocated.
+    """
+    def __init__(self, model, name):
+        """
+        Constructor
+
+        :param model: the AtomicDEVS model
+        :param name: the name of the function to profile
+        """
+        self.model = model
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+
+    def __call__(self, *args):
+        _children.append(0.0)
+        start = time.time()
+        try:
+            return getattr(type(self.model), self.name)(self.model, *args)
+        finally:
+            elapsed = time.time() - start
+            nested = _children.pop()
+            if _children:
+                _children[-1] += elapsed
+            self.calls += 1
+            self.total += elapsed
+            self.own += elapsed - nested
+
+def instrument(aDEVS):
+    """
+    Start profiling a model. Models that aren't instrumented have no overhead at all.
+
+    :param aDEVS: the AtomicDEVS model
+    """
+    for name in PROFILED_FUNCTIONS:
+        if not isinstance(aDEVS.__dict__.get(name), ProfiledFunction):
+            setattr(aDEVS, name, ProfiledFunction(aDEVS, name))
+
+def chargeBatch(models, name, elapsed):
+    """
+    Charge the time of a single batched call, made for many models at once, to these models in equal parts.
+
+    :param models: the models the call was made for
+    :param name: the name of the function that is charged
+    :param elapsed: the time the call took
+    """
+    share = elapsed / len(models)
+    for aDEVS in models:
+        profiled = aDEVS.__dict__.get(name)
+        if isinstance(profiled, ProfiledFunction):
+            profiled.calls += 1
+            profiled.total += share
+            profiled.own += share
+
+def collect(models):
+    """
+    Collect the statistics of instrumented models.
+
+    :param models: iterable of AtomicDEVS models
+    :returns: list -- tuples of the hierarchy of model names, the class name, the function, the number of calls, the total time and the time excluding nested profiled calls
+    """
+    records = []
+    for aDEVS in models:
+        hierarchy = getattr(aDEVS, "select_hierarchy", None) or [aDEVS]
+        names = tuple([m.getModelName() for m in hierarchy])
+        for name in PROFILED_FUNCTIONS:
+            profiled = aDEVS.__dict__.get(name)
+            if isinstance(profiled, ProfiledFunction) and profiled.calls:
+                records.append((names, type(aDEVS).__name__, name, 
+                                profiled.calls, profiled.total, profiled.own))
+    return records
+
+def summarize(records, key):
+    """
+    Sum the statistics of the records per key.
+
+    :param records: the records, as returned by collect
+    :param key: function mapping a record to the key to group on
+    :returns: list -- tuples of the key, the number of calls and the total time, most expensive first
+    """
+    sums = {}
+    for record in records:
+        k = key(record)
+        calls, total = sums.get(k, (0, 0.0))
+        sums[k] = (calls + record[3], total + record[5])
+    return sorted([(k, calls, total) for k, (calls, total) in sums.items()], 
+                  key=lambda entry: -entry[2])
+
+def report(records, outfile, top=20):
+    """
+    Write a profiling report, with the time per function, per model class and per model.
+    All times exclude nested profiled calls, so they add up to the total.
+
+    :param records: the records, as returned by collect
+    :param outfile: the file to write to
+    :param top: the number of models to list
+    """
+    outfile.write("Profile of the atomic models\n")
+    sections = [("Function", lambda r: r[2], None),
+                ("Class", lambda r: r[1], None),
+                ("Model", lambda r: ".".join(r[0]), top)]
+    for title, key, limit in sections:
+        entries = summarize(records, key)
+        if limit is not None:
+            entries = entries[:limit]
+        outfile.write("\n%-50s %12s %12s %12s\n" % (title, "calls", "time (s)", "per call (us)"))
+        for k, calls, total in entries:
+            outfile.write("%-50s %12i %12.6f %12.3f\n" % (k, calls, total, total / calls * 1e6))
+
+def writeFolded(records, filename):
+    """
+    Write the profile in the folded stack format used by flame graph tools: one line per
+    model function, with the coupled models, the atomic model and the function as the stack,
+    and the time in microseconds.
+
+    :param records: the records, as returned by collect
+    :param filename: the file to write to
+    """
+    with open(filename, 'w') as f:
+        for names, _, function, _, _, own in records:
+            f.write("%s;%s %i\n" % (";".join(names), function, int(own * 1e6)))
@@ -0,0 +1,149 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Relocator that balances the predicted load of the kernels, based on the trend in the activity of every model
+"""
+
+from collections import deque
+
+class PredictiveRelocator(object):
+    """
+    Keeps a moving window of the activity of every model and extrapolates it to the next horizon
+    with a least squares fit. Models are moved from the most to the least loaded kernel only if
+    the predicted reduction of the maximal load over the next horizon exceeds the cost of a migration.
+    A model that was moved recently is not moved again, which prevents oscillations.
+    """
+    def __init__(self, window=5, migration_cost=0.0, cooldown=3, max_moves=None):
+        """
+        Constructor
+
+        :param window: the number of horizons to base the prediction on
+        :param migration_cost: the cost of migrating a single model, in the same unit as the activity
+        :param cooldown: the number of relocation rounds during which a model that was moved can't move again
+        :param max_moves: the maximal number of models to move in one round, or None for no limit
+        """
+        self.window = window
+        self.migration_cost = migration_cost
+        self.cooldown = cooldown
+        self.max_moves = max_moves
+        self.history = {}
+        self.last_moved = {}
+        self.round = 0
+        self.moves = 0
+        self.refused = 0
+
+    def setController(self, controller):
+        """
+        Configures all necessary parameters
+
+        :param controller: the controller of the simulation
+        """
+        self.kernels = controller.kernels
+        self.model_ids = controller.model_ids
+
+    def predict(self, samples):
+        """
+        Predict the next value of a series of samples, by extrapolating the least squares line through them.
+
+        :param samples: the samples, oldest first
+        :returns: float -- the predicted value, never negative
+        """
+        n = len(samples)
+        if n < 2:
+            return samples[-1] if samples else 0.0
+        mean_x = (n - 1) / 2.0
+        mean_y = sum(samples) / float(n)
+        covariance = 0.0
+        variance = 0.0
+        for x, y in enumerate(samples):
+            covariance += (x - mean_x) * (y - mean_y)
+            variance += (x - mean_x) ** 2
+        slope = covariance / variance
+        return max(0.0, mean_y + slope * (n - mean_x))
+
+    def getRelocations(self, gvt, activities, horizon):
+        """
+        Fetch the relocations that are pending for the current GVT
+
+        :param gvt: current GVT
+        :param activities: the activities of all models, as a dictionary from model ID to activity
+        :param horizon: the activity horizon that was used
+        :returns: dictionary containing all relocations
+        """
+        self.round += 1
+        predictions = {}
+        for model_id, activity in activities.items():
+            try:
+                samples = self.history[model_id]
+            except KeyError:
+                samples = self.history[model_id] = deque(maxlen=self.window)
+            samples.append(activity)
+            predictions[model_id] = self.predict(samples)
+
+        loads = [0.0] * self.kernels
+        hosted = [[] for _ in range(self.kernels)]
+        for model_id, prediction in predictions.items():
+            model = self.model_ids[model_id]
+            loads[model.location] += prediction
+            if model.relocatable:
+                hosted[model.location].append(model_id)
+
+        relocate = {}
+        while self.max_moves is None or len(relocate) < self.max_moves:
+            heaviest = loads.index(max(loads))
+            lightest = loads.index(min(loads))
+            gap = loads[heaviest] - loads[lightest]
+            best = None
+            best_gain = self.migration_cost
+            for model_id in hosted[heaviest]:
+                # The maximal load decreases by this amount when moving the model
+                gain = min(predictions[model_id], gap - predictions[model_id])
+                if gain <= best_gain:
+                    continue
+                if self.round - self.last_moved.get(model_id, -self.cooldown) < self.cooldown:
+                    # Moved recently, so it would start oscillating
+                    self.refused += 1
+                    continue
+                best = model_id
+                best_gain = gain
+            if best is None:
+                break
+            hosted[heaviest].remove(best)
+            hosted[lightest].append(best)
+            loads[heaviest] -= predictions[best]
+            loads[lightest] += predictions[best]
+            relocate[best] = lightest
+            self.last_moved[best] = self.round
+        self.moves += len(relocate)
+        return relocate
+
+    def getStatistics(self):
+        """
+        Get the statistics of this relocator.
+
+        :returns: dict -- the number of rounds, performed moves and refused moves
+        """
+        return {"rounds": self.round,
+                "moves": self.moves,
+                "refused": self.refused}
+
+    def useLastStateOnly(self):
+        """
+        Determines whether or not the activities of all steps should be accumulated, or only a single state should be used.
+
+        :returns: boolean -- True if the relocator works with a single state
+        """
+        return False
@@ -0,0 +1,144 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Scheduler that picks the most appropriate scheduler based on the first simulation steps
+"""
+
+from math import sqrt
+
+from pypdevs.schedulers.schedulerAH import SchedulerAH
+from pypdevs.schedulers.schedulerSL import SchedulerSL
+from pypdevs.schedulers.schedulerCalendar import SchedulerCalendar
+
+class SchedulerAuto(object):
+    """
+    Starts with the Activity Heap and samples the time advances and the number of rescheduled models
+    during the first steps. Afterwards, it switches to the best scheduler for what it observed:
+
+    * the Sorted List for few models, or if most models transition in every step,
+    * the Calendar Queue for many scheduled models with evenly spread time advances,
+    * the Activity Heap otherwise.
+
+    After the decision, all calls go to the chosen scheduler directly, so there is no overhead left.
+    """
+    # The number of reschedules to sample before deciding
+    SAMPLE_STEPS = 100
+    # Below this number of models, the Sorted List is used
+    FEW_MODELS = 32
+    # Above this number of scheduled models, the Calendar Queue is considered
+    MANY_MODELS = 1000
+    # Above this fraction of rescheduled models per step, the Sorted List is used
+    ACTIVE_FRACTION = 0.5
+    # Below this coefficient of variation of the time advances, the Calendar Queue is used
+    MAX_VARIATION = 2.0
+
+    def __init__(self, models, epsilon, total_models):
+        """
+        Constructor
+
+        :param models: all models in the simulation
+        :param epsilon: the allowed difference between two times to consider them equal
+        :param total_models: the total number of models in the simulation
+        """
+        self.models = models
+        self.epsilon = epsilon
+        self.total_models = total_models
+        self.scheduler = SchedulerAH(models, epsilon, total_models)
+        self.steps = 0
+        self.rescheduled = 0
+        self.samples = 0
+        self.ta_sum = 0.0
+        self.ta_square_sum = 0.0
+        self.infinite = 0
+        self.decision = None
+        self.reason = None
+        self.schedule = self.scheduler.schedule
+        self.unschedule = self.scheduler.unschedule
+        self.readFirst = self.scheduler.readFirst
+        self.getImminent = self.scheduler.getImminent
+
+    def massReschedule(self, reschedule_set):
+        """
+        Reschedule all models provided, sampling their time advances.
+
+        :param reschedule_set: iterable containing all models to reschedule
+        """
+        self.scheduler.massReschedule(reschedule_set)
+        self.steps += 1
+        for model in reschedule_set:
+            self.rescheduled += 1
+            t_next = model.time_next[0]
+            if t_next == float('inf'):
+                self.infinite += 1
+                continue
+            ta = t_next - model.time_last[0]
+            self.samples += 1
+            self.ta_sum += ta
+            self.ta_square_sum += ta * ta
+        if self.steps >= self.SAMPLE_STEPS:
+            self.decide()
+
+    def decide(self):
+        """
+        Choose the scheduler based on the samples and switch to it.
+        """
+        nr_models = len(self.models)
+        active = float(self.rescheduled) / self.steps / max(nr_models, 1)
+        if self.samples:
+            mean = self.ta_sum / self.samples
+            variance = max(0.0, self.ta_square_sum / self.samples - mean * mean)
+            variation = sqrt(variance) / mean if mean > 0 else float('inf')
+        else:
+            variation = float('inf')
+        scheduled = nr_models * (1 - float(self.infinite) / max(self.rescheduled, 1))
+        if nr_models < self.FEW_MODELS:
+            cls, self.reason = SchedulerSL, "few models"
+        elif active > self.ACTIVE_FRACTION:
+            cls, self.reason = SchedulerSL, "most models active in every step"
+        elif scheduled > self.MANY_MODELS and variation < self.MAX_VARIATION:
+            cls, self.reason = SchedulerCalendar, "many scheduled models with evenly spread time advances"
+        else:
+            cls, self.reason = SchedulerAH, "default"
+        self.statistics = {"steps": self.steps,
+                           "models": nr_models,
+                           "active_fraction": active,
+                           "ta_variation": variation,
+                           "scheduled_models": scheduled}
+        if cls is not SchedulerAH:
+            # All models are rescheduled at this point, so their time_next is up to date
+            self.scheduler = cls(self.models, self.epsilon, self.total_models)
+        self.decision = cls.__name__
+        self.schedule = self.scheduler.schedule
+        self.unschedule = self.scheduler.unschedule
+        self.massReschedule = self.scheduler.massReschedule
+        self.readFirst = self.scheduler.readFirst
+        self.getImminent = self.scheduler.getImminent
+
+    def getStatistics(self):
+        """
+        Get the statistics of the selection, and of the chosen scheduler if it has any.
+
+        :returns: dict -- the chosen scheduler, the reason and the sampled values
+        """
+        if self.decision is None:
+            return {"scheduler": None,
+                    "steps": self.steps}
+        statistics = dict(self.statistics)
+        statistics["scheduler"] = self.decision
+        statistics["reason"] = self.reason
+        if hasattr(self.scheduler, "getStatistics"):
+            statistics["scheduler_statistics"] = self.scheduler.getStatistics()
+        return statistics
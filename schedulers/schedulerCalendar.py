@@ -0,0 +1,216 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The Calendar Queue scheduler, with amortised constant time scheduling and retrieval of models
+"""
+
+from heapq import heappush, heappop, nsmallest
+
+class SchedulerCalendar(object):
+    """
+    Scheduler based on a calendar queue: events are hashed on their time into buckets of a fixed width,
+    which are visited in order like the days of a calendar. The number of buckets and their width are
+    recomputed when the number of events changes too much, so every bucket only holds a few events.
+    Like the Activity Heap, rescheduled models are invalidated instead of removed.
+    Models that are scheduled at infinity are not stored at all.
+    """
+    def __init__(self, models, epsilon, total_models):
+        """
+        Constructor
+
+        :param models: all models in the simulation
+        :param epsilon: the allowed difference between two times to consider them equal
+        :param total_models: the total number of models in the simulation
+        """
+        self.epsilon = epsilon
+        self.id_fetch = [None] * total_models
+        self.counter = 0
+        self.size = 0
+        self.invalids = 0
+        self.resizes = 0
+        self.nbuckets = 2
+        self.width = 1.0
+        self.buckets = [[], []]
+        # Number of the day (bucket width interval) that is visited first
+        self.day = 0
+        for model in models:
+            self.schedule(model)
+        self.resize(self.nbuckets)
+
+    def bucketOf(self, t):
+        """
+        Get the index of the bucket for a time
+
+        :param t: the time
+        :returns: int -- the bucket index
+        """
+        return int(t // self.width) % self.nbuckets
+
+    def insert(self, entry):
+        """
+        Insert an entry in its bucket, moving the current day back if the entry is earlier
+
+        :param entry: the entry to insert
+        """
+        day = int(entry[0] // self.width)
+        if day < self.day:
+            self.day = day
+        heappush(self.buckets[day % self.nbuckets], entry)
+
+    def schedule(self, model):
+        """
+        Schedule a model
+
+        :param model: the model to schedule
+        """
+        if model.model_id >= len(self.id_fetch):
+            self.id_fetch.extend([None] * (model.model_id + 1 - len(self.id_fetch)))
+        t, age = model.time_next
+        if t == float('inf'):
+            self.id_fetch[model.model_id] = None
+            return
+        self.counter += 1
+        entry = [t, age, self.counter, True, model]
+        self.id_fetch[model.model_id] = entry
+        self.size += 1
+        self.insert(entry)
+        if self.size > 2 * self.nbuckets:
+            self.resize(self.nbuckets * 2)
+
+    def unschedule(self, model):
+        """
+        Unschedule a model
+
+        :param model: model to unschedule
+        """
+        entry = self.id_fetch[model.model_id]
+        if entry is not None and entry[3]:
+            entry[3] = False
+            self.size -= 1
+            self.invalids += 1
+        self.id_fetch[model.model_id] = None
+        if self.nbuckets > 2 and self.size < self.nbuckets // 2:
+            self.resize(self.nbuckets // 2)
+        elif self.invalids > 2 * self.size + self.nbuckets:
+            # Too many invalidated entries, so clean up
+            self.resize(self.nbuckets)
+
+    def massReschedule(self, reschedule_set):
+        """
+        Reschedule all models provided. 
+        Equivalent to calling unschedule(model); schedule(model) on every element in the iterable.
+
+        :param reschedule_set: iterable containing all models to reschedule
+        """
+        for model in reschedule_set:
+            self.unschedule(model)
+            self.schedule(model)
+
+    def resize(self, nbuckets):
+        """
+        Rebuild the calendar with a new number of buckets and a bucket width based on the
+        average separation of the first events, dropping all invalidated entries.
+
+        :param nbuckets: the new number of buckets
+        """
+        self.resizes += 1
+        entries = [entry for bucket in self.buckets for entry in bucket if entry[3]]
+        first = nsmallest(min(len(entries), 25), entries)
+        separations = [b[0] - a[0] for a, b in zip(first, first[1:]) if b[0] - a[0] > self.epsilon]
+        if separations:
+            # Average separation, times three to have a few events per bucket
+            self.width = 3.0 * sum(separations) / len(separations)
+        self.nbuckets = nbuckets
+        self.buckets = [[] for _ in range(nbuckets)]
+        self.invalids = 0
+        self.day = int(first[0][0] // self.width) if first else 0
+        for entry in entries:
+            heappush(self.buckets[self.bucketOf(entry[0])], entry)
+
+    def findFirst(self):
+        """
+        Find the first valid entry, advancing the current day to its day
+
+        :returns: list -- the entry, or None if nothing is scheduled
+        """
+        if self.size == 0:
+            return None
+        width = self.width
+        day = self.day
+        for _ in range(self.nbuckets):
+            bucket = self.buckets[day % self.nbuckets]
+            while bucket and not bucket[0][3]:
+                heappop(bucket)
+                self.invalids -= 1
+            if bucket and int(bucket[0][0] // width) <= day:
+                self.day = day
+                return bucket[0]
+            day += 1
+        # A whole year without events, so search directly
+        best = None
+        for bucket in self.buckets:
+            while bucket and not bucket[0][3]:
+                heappop(bucket)
+                self.invalids -= 1
+            if bucket and (best is None or bucket[0] < best):
+                best = bucket[0]
+        self.day = int(best[0] // width)
+        return best
+
+    def readFirst(self):
+        """
+        Returns the time of the first model that has to transition
+
+        :returns: timestamp of the first model
+        """
+        first = self.findFirst()
+        if first is None:
+            return (float('inf'), 1)
+        return (first[0], first[1])
+
+    def getImminent(self, time):
+        """
+        Returns a list of all models that transition at the provided time, with a specified epsilon deviation allowed.
+
+        :param time: timestamp to check for models
+
+        .. warning:: For efficiency, this method only checks the **first** elements, so trying to invoke this function with a timestamp higher than the value provided with the *readFirst* method, will **always** return an empty set.
+        """
+        imm_children = []
+        t, age = time
+        epsilon = self.epsilon
+        while True:
+            first = self.findFirst()
+            if first is None or abs(first[0] - t) >= epsilon or first[1] != age:
+                break
+            heappop(self.buckets[self.bucketOf(first[0])])
+            first[3] = False
+            self.id_fetch[first[4].model_id] = None
+            self.size -= 1
+            imm_children.append(first[4])
+        return imm_children
+
+    def getStatistics(self):
+        """
+        Get the statistics of this scheduler
+
+        :returns: dict -- the size of the calendar and the number of events
+        """
+        return {"buckets": self.nbuckets,
+                "width": self.width,
+                "events": self.size,
+                "invalids": self.invalids,
+                "resizes": self.resizes}
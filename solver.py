@@ -18,6 +18,8 @@ The actual DEVS solvers containing the main DEVS implementation
 """
 
 from collections import defaultdict
+from operator import attrgetter
+import threading
 
 from pypdevs.DEVS import *
 
@@ -25,6 +27,21 @@ from pypdevs.util import *
 from pypdevs.logger import *
 
 from pypdevs.classicDEVSWrapper import ClassicDEVSWrapper
+from pypdevs.batchDEVS import BatchAtomicDEVS, batchRows
+from pypdevs.memoCache import MemoCache
+from pypdevs.messageFreezer import freezeOutput, fingerprintInput, validateInput
+from pypdevs.transferCopy import resolveTransfer
+from pypdevs.deltaStates import DeltaState
+from pypdevs.periodicStates import CheckpointPolicy, LoggedState, snapshotInput
+from pypdevs.fossilCollector import FossilCollector
+from pypdevs.directConnection import redoDirectConnection
+from pypdevs.profiler import instrument, collect, chargeBatch
+import pypdevs.accurate_time as time
+from pypdevs.parallelTransitions import TransitionPool
+
+selectPriorityKey = attrgetter("select_priority")
+# The transition function of every transition type
+TRANSITION_FUNCTIONS = {1: "intTransition", 2: "extTransition", 3: "confTransition"}
 
 class Solver(object):
     """
@@ -37,6 +54,24 @@ class Solver(object):
         self.activities = {}
         self.dsdevs_dict = {}
         self.listeners = listeners
+        self.batch_transitions = False
+        self.batch_threshold = 2
+        self.memo_cache = MemoCache()
+        self.memo_collect_time = None
+        self.msg_validation = False
+        self.routing_tables = {}
+        self.classic_devs = False
+        self.classic_wrappers = {}
+        self.delta_state_saving = 0
+        self.checkpoint_policy = None
+        self.fossil_collector = None
+        self.rollback_count = 0
+        self.last_transition_clock = (float('-inf'), 0)
+        self.profiling = False
+        self.profile_filename = None
+        self.folded_filename = None
+        self.local_parallel = 0
+        self.parallel_pool = None
 
     def atomicOutputGenerationEventTracing(self, aDEVS, time):
         """
@@ -60,6 +95,9 @@ class Solver(object):
         :returns: dict -- the generated output
         """
         aDEVS.my_output = aDEVS.outputFnc()
+        if self.msg_copy == 3:
+            # Messages are shared by all receivers, so make sure nobody can alter them
+            aDEVS.my_output = freezeOutput(aDEVS.my_output)
 
         # Being here means that this model created output, so it triggered its internal transition
         # save this knowledge in the basesimulator for usage in the actual transition step
@@ -75,6 +113,20 @@ class Solver(object):
         :param trans: iterable containing all models and their requested transition
         :param clock: the time at which the transition must happen
         """
+        if self.memo_collect_time is not None:
+            # Requested by the controller after a GVT round
+            self.memo_cache.fossilCollect(self.memo_collect_time)
+            self.memo_collect_time = None
+        if clock < self.last_transition_clock:
+            # Simulating in the past again, so a rollback happened
+            self.rollback_count += 1
+            if self.checkpoint_policy is not None:
+                self.checkpoint_policy.rolledBack()
+        self.last_transition_clock = clock
+        if (self.batch_transitions and 
+                self.temporary_irreversible and 
+                not self.activity_tracking):
+            trans = self.massBatchTransitions(trans, clock)
         t, age = clock
         partialmod = []
         for aDEVS in trans:
@@ -85,21 +137,21 @@ class Solver(object):
             ##   Skipped in local simulation
             if not self.temporary_irreversible:
                 # Memo part
-                if self.memoization and len(aDEVS.memo) >= 2:
-                    found = False
-                    prev = aDEVS.memo.pop()
-                    memo = aDEVS.memo[-1]
-                    if memo.time_last == clock and prev.loadState() == aDEVS.state:
-                        if ttype == 1:
-                            found = True
-                        elif aDEVS.my_input == memo.my_input:
-                            # Inputs should be equal too
-                            if ttype == 3:
-                                found = True
-                            elif aDEVS.elapsed == memo.elapsed and ttype == 2:
-                                found = True
-                    if found:
+                if self.memoization:
+                    memo_elapsed = (t - aDEVS.time_last[0] if ttype == 2 
+                                    else (0. if ttype == 3 else None))
+                    memo_key, memo_size = self.memo_cache.makeKey(aDEVS, 
+                                                                  ttype, 
+                                                                  clock, 
+                                                                  memo_elapsed)
+                    if memo_key is None:
+                        # Not hashable by value, so not memoized
+                        memo = None
+                    else:
+                        memo = self.memo_cache.lookup(memo_key)
+                    if memo is not None:
                         aDEVS.state = memo.loadState()
+                        aDEVS.elapsed = memo_elapsed
                         aDEVS.time_last = clock
                         aDEVS.time_next = memo.time_next
                         # Just add the copy
@@ -117,27 +169,23 @@ class Solver(object):
                             # Quit ASAP by throwing an exception
                             raise QuickStopException()
                         continue
-                    else:
-                        aDEVS.memo = []
                 activity_tracking_prevalue = aDEVS.preActivityCalculation()
             elif self.activity_tracking:
                 activity_tracking_prevalue = aDEVS.preActivityCalculation()
             ###########
 
             # Make a copy of the message before it is passed to the user
-            if self.msg_copy != 2:
-                # Prevent a pass statement, which still consumes some time in CPython
-                if self.msg_copy == 1:
-                    # Using list comprehension inside of dictionary comprehension...
-                    aDEVS.my_input = {key: 
-                            [i.copy() for i in aDEVS.my_input[key]] 
-                            for key in aDEVS.my_input}
-                elif self.msg_copy == 0:
-                    # Dictionary comprehension
-                    aDEVS.my_input = {key: 
-                            pickle.loads(pickle.dumps(aDEVS.my_input[key], 
-                                                      pickle.HIGHEST_PROTOCOL)) 
-                            for key in aDEVS.my_input}
+            if self.msg_copy < 2:
+                self.copyInput(aDEVS)
+            if self.checkpoint_policy is not None and not self.temporary_irreversible:
+                # Decide now, as a logged transition needs its input from before the transition
+                previous = aDEVS.old_states[-1] if aDEVS.old_states else None
+                if self.checkpoint_policy.needsCheckpoint(previous):
+                    logged_input = None
+                else:
+                    logged_input = snapshotInput(aDEVS.my_input)
+            if self.msg_validation:
+                fingerprints = fingerprintInput(aDEVS.my_input)
 
             # NOTE ttype mappings:            (EI)
             #       1 -- Internal transition  (01)
@@ -160,6 +208,9 @@ class Solver(object):
                     "Problem in transitioning dictionary: unknown element %s" 
                     % ttype)
 
+            if self.msg_validation:
+                validateInput(aDEVS, aDEVS.my_input, fingerprints)
+
             ta = aDEVS.timeAdvance()
             aDEVS.time_last = clock
 
@@ -177,12 +228,22 @@ class Solver(object):
                 # But only if there are multiple kernels, since otherwise there would be no other kernel to invoke a revertion
                 # This can save us lots of time for local simulation (however, all other code is written with parallellisation in mind...)
                 activity = aDEVS.postActivityCalculation(activity_tracking_prevalue)
-                aDEVS.old_states.append(self.state_saver(aDEVS.time_last,
-                                                         aDEVS.time_next,
-                                                         aDEVS.state,
-                                                         activity,
-                                                         aDEVS.my_input,
-                                                         aDEVS.elapsed))
+                if self.delta_state_saving:
+                    self.saveDeltaState(aDEVS, 
+                                        activity, 
+                                        aDEVS.my_input, 
+                                        aDEVS.elapsed)
+                elif self.checkpoint_policy is not None:
+                    self.savePeriodicState(aDEVS, activity, ttype, logged_input)
+                else:
+                    aDEVS.old_states.append(self.state_saver(aDEVS.time_last,
+                                                             aDEVS.time_next,
+                                                             aDEVS.state,
+                                                             activity,
+                                                             aDEVS.my_input,
+                                                             aDEVS.elapsed))
+                if self.memoization and memo_key is not None:
+                    self.memo_cache.store(memo_key, memo_size, aDEVS.old_states[-1])
                 if self.relocation_pending:
                     # Quit ASAP by throwing an exception
                     for m in partialmod:
@@ -208,8 +269,300 @@ class Solver(object):
       
             # Clear the bag
             aDEVS.my_input = {}
+        if self.fossil_collector is not None and not self.temporary_irreversible:
+            self.fossil_collector.countdown -= len(trans)
+            if self.fossil_collector.countdown <= 0:
+                self.checkHistoryBudget()
         self.server.flushQueuedMessages()
 
+    def setMemoCacheBudget(self, budget):
+        """
+        Sets the memory budget of the memoization cache, evicting the least recently used transitions when exceeded.
+
+        :param budget: the (approximate) number of bytes the cache may use
+        """
+        self.memo_cache.budget = budget
+
+    def setMemoKeyPickling(self, pickle_keys):
+        """
+        Sets the pickling of states and messages that aren't hashable by value to build memoization keys.
+        Without it, only models with a memoKey method or with states and messages that are hashable by value are memoized.
+
+        :param pickle_keys: whether or not to pickle states and messages to build their keys
+        """
+        self.memo_cache.pickle_keys = pickle_keys
+
+    def gvtRoundDone(self, gvt):
+        """
+        Called by the controller after every GVT round, to remove the history that is no longer needed
+        and to report the status of this kernel for the adaptive GVT interval.
+        The memoization cache is only accessed by the simulation thread, so it is cleaned at the next transition.
+
+        :param gvt: the new GVT
+        :returns: dict -- the simulation time of the last transition, the last measured history size and the history budget (both None without a budget) and the total number of rollbacks
+        """
+        self.memo_collect_time = gvt
+        collector = self.fossil_collector
+        return {"clock": self.last_transition_clock[0],
+                "usage": None if collector is None else collector.usage,
+                "budget": None if collector is None else collector.budget,
+                "rollbacks": self.rollback_count}
+
+    def getMemoStatistics(self):
+        """
+        Get the hit and miss counters of the memoization cache of this kernel.
+
+        :returns: dict -- the counters and current usage of the cache
+        """
+        return self.memo_cache.getStatistics()
+
+    def getSchedulerStatistics(self):
+        """
+        Get the statistics of the scheduler of this kernel, such as the choice made by the automatic scheduler.
+
+        :returns: dict -- the statistics, empty if the scheduler doesn't keep any
+        """
+        scheduler = self.model.scheduler
+        if hasattr(scheduler, "getStatistics"):
+            return scheduler.getStatistics()
+        return {}
+
+    def setDeltaStateSaving(self, checkpoint_interval):
+        """
+        Sets the use of incremental state saving, only saving the attributes of the state that changed since the previous save.
+        The full copies and the changed attributes are copied with the configured state saver.
+
+        :param checkpoint_interval: the number of saves between two full copies of the state, 0 to disable incremental state saving
+        """
+        if checkpoint_interval and self.checkpoint_policy is not None:
+            raise DEVSException("Incremental state saving can't be combined with periodic state saving")
+        self.delta_state_saving = checkpoint_interval
+
+    def saveDeltaState(self, aDEVS, activity, my_input, elapsed):
+        """
+        Save the current state of a model as a delta relative to its previously saved state.
+
+        :param aDEVS: the model whose state must be saved
+        :param activity: the activity of the transition
+        :param my_input: the input of the transition
+        :param elapsed: the elapsed time of the transition
+        """
+        previous = aDEVS.old_states[-1] if aDEVS.old_states else None
+        if not isinstance(previous, DeltaState):
+            previous = None
+        aDEVS.old_states.append(DeltaState(aDEVS.time_last,
+                                           aDEVS.time_next,
+                                           aDEVS.state,
+                                           activity,
+                                           my_input,
+                                           elapsed,
+                                           previous,
+                                           self.delta_state_saving,
+                                           self.state_saver))
+
+    def setPeriodicStateSaving(self, interval, adaptive=False, min_interval=1, max_interval=64):
+        """
+        Sets the use of periodic state saving, where only every *interval* transitions a full state is saved.
+        All other states are recomputed on rollback, by coasting forward from the nearest full state.
+
+        :param interval: the (initial) number of transitions between two saved states, 0 to disable periodic state saving
+        :param adaptive: whether or not to adapt the interval to the observed rollbacks
+        :param min_interval: the minimal interval in adaptive mode
+        :param max_interval: the maximal interval in adaptive mode
+        """
+        if interval and self.delta_state_saving:
+            raise DEVSException("Periodic state saving can't be combined with incremental state saving")
+        if interval:
+            self.checkpoint_policy = CheckpointPolicy(interval, 
+                                                      adaptive, 
+                                                      min_interval, 
+                                                      max_interval)
+        else:
+            self.checkpoint_policy = None
+
+    def getCheckpointStatistics(self):
+        """
+        Get the statistics of periodic state saving on this kernel.
+
+        :returns: dict -- the current interval and the counters, or None if periodic state saving is disabled
+        """
+        if self.checkpoint_policy is None:
+            return None
+        return self.checkpoint_policy.getStatistics()
+
+    def savePeriodicState(self, aDEVS, activity, ttype, logged_input):
+        """
+        Save the current state of a model, or only log its transition if no checkpoint is due.
+
+        :param aDEVS: the model whose state must be saved
+        :param activity: the activity of the transition
+        :param ttype: the type of the transition
+        :param logged_input: copy of the input bag taken before the transition, or None if a checkpoint is due
+        """
+        if logged_input is None:
+            aDEVS.old_states.append(self.state_saver(aDEVS.time_last,
+                                                     aDEVS.time_next,
+                                                     aDEVS.state,
+                                                     activity,
+                                                     aDEVS.my_input,
+                                                     aDEVS.elapsed))
+        else:
+            aDEVS.old_states.append(LoggedState(aDEVS.time_last,
+                                                aDEVS.time_next,
+                                                activity,
+                                                logged_input,
+                                                aDEVS.elapsed,
+                                                ttype,
+                                                aDEVS,
+                                                aDEVS.old_states[-1],
+                                                self.checkpoint_policy))
+
+    def setHistoryBudget(self, budget, check_interval=1000):
+        """
+        Sets the memory budget for the saved states of this kernel. When the budget is getting exhausted,
+        all history before the GVT is removed immediately and an early GVT round is requested from the controller.
+
+        :param budget: the (approximate) number of bytes the history may use, None to disable the budget
+        :param check_interval: the number of transitions between two checks of the budget
+        """
+        if budget is None:
+            self.fossil_collector = None
+        else:
+            self.fossil_collector = FossilCollector(budget, check_interval)
+
+    def getHistoryStatistics(self):
+        """
+        Get the (estimated) size of the history of every local model.
+
+        :returns: dict -- the history size per model and the totals, or None if no budget is set
+        """
+        if self.fossil_collector is None:
+            return None
+        return self.fossil_collector.getStatistics(self.localModels())
+
+    def checkHistoryBudget(self):
+        """
+        Check the memory used by the history against the budget, collecting fossils or requesting a GVT round when necessary.
+        """
+        collector = self.fossil_collector
+        collector.countdown = collector.check_interval
+        models = list(self.localModels())
+        usage = collector.measure(models)
+        if usage > collector.budget * collector.collect_fraction:
+            collector.collect(models, self.GVT)
+            self.memo_cache.fossilCollect(self.GVT)
+            usage = collector.measure(models)
+        if (usage > collector.budget * collector.request_fraction and 
+                collector.last_request_gvt != self.GVT):
+            # Only request once per GVT, the controller needs some time to run the algorithm
+            collector.last_request_gvt = self.GVT
+            collector.gvt_requests += 1
+            self.getProxy(0).requestGVT()
+
+    def localModels(self):
+        """
+        Iterate over all atomic models simulated at this kernel.
+
+        :returns: generator -- the local atomic models
+        """
+        local_model_ids = self.model.local_model_ids
+        for aDEVS in self.model.component_set:
+            if aDEVS.model_id in local_model_ids:
+                yield aDEVS
+
+    def copyInput(self, aDEVS):
+        """
+        Replace the input bag of the model by a copy, according to the message copy mode.
+        Modes 2 (no copy) and 3 (frozen messages) never copy.
+
+        :param aDEVS: the AtomicDEVS model whose input bag must be copied
+        """
+        if self.msg_copy == 1:
+            # Using list comprehension inside of dictionary comprehension...
+            aDEVS.my_input = {key: 
+                    [i.copy() for i in aDEVS.my_input[key]] 
+                    for key in aDEVS.my_input}
+        elif self.msg_copy == 0:
+            # Dictionary comprehension
+            aDEVS.my_input = {key: 
+                    pickle.loads(pickle.dumps(aDEVS.my_input[key], 
+                                              pickle.HIGHEST_PROTOCOL)) 
+                    for key in aDEVS.my_input}
+
+    def massBatchTransitions(self, trans, clock):
+        """
+        Transition all BatchAtomicDEVS models with a single call per class and transition type.
+        Only used when no states have to be saved, as the state of these models lives in shared arrays.
+
+        :param trans: dictionary containing all models and their requested transition
+        :param clock: the time at which the transition must happen
+        :returns: dict -- the transitions that still have to be performed model per model
+        """
+        t, age = clock
+        remaining = {}
+        groups = {}
+        for aDEVS in trans:
+            if isinstance(aDEVS, BatchAtomicDEVS):
+                groups.setdefault((type(aDEVS), trans[aDEVS]), []).append(aDEVS)
+            else:
+                remaining[aDEVS] = trans[aDEVS]
+
+        for (cls, ttype), models in groups.items():
+            if len(models) < self.batch_threshold:
+                # Not worth the overhead of building the arrays
+                for aDEVS in models:
+                    remaining[aDEVS] = ttype
+                continue
+            if ttype != 1 and self.msg_copy < 2:
+                for aDEVS in models:
+                    self.copyInput(aDEVS)
+            rows = batchRows(models)
+            if self.profiling:
+                start = time.time()
+            if ttype == 1:
+                for aDEVS in models:
+                    aDEVS.elapsed = None
+                cls.batchIntTransition(rows)
+            elif ttype == 2:
+                elapsed = [t - aDEVS.time_last[0] for aDEVS in models]
+                for aDEVS, e in zip(models, elapsed):
+                    aDEVS.elapsed = e
+                cls.batchExtTransition(rows, 
+                                       batchRows(elapsed, float), 
+                                       [aDEVS.my_input for aDEVS in models])
+            elif ttype == 3:
+                for aDEVS in models:
+                    aDEVS.elapsed = 0.
+                cls.batchConfTransition(rows, 
+                                        [aDEVS.my_input for aDEVS in models])
+            else:
+                raise DEVSException(
+                    "Problem in transitioning dictionary: unknown element %s" 
+                    % ttype)
+
+            if self.profiling:
+                chargeBatch(models, TRANSITION_FUNCTIONS[ttype], time.time() - start)
+                start = time.time()
+            tas = cls.batchTimeAdvance(rows).tolist()
+            if self.profiling:
+                chargeBatch(models, "timeAdvance", time.time() - start)
+            for aDEVS, ta in zip(models, tas):
+                if ta < 0:
+                    raise DEVSException("Negative time advance in atomic model '" + \
+                                        aDEVS.getModelFullName() + "' with value " + \
+                                        str(ta) + " at time " + str(t))
+                aDEVS.time_last = clock
+                aDEVS.time_next = (t + ta, 1 if ta else (age + 1))
+                if self.do_some_tracing:
+                    if ttype == 1:
+                        self.tracers.tracesInternal(aDEVS)
+                    elif ttype == 2:
+                        self.tracers.tracesExternal(aDEVS)
+                    elif ttype == 3:
+                        self.tracers.tracesConfluent(aDEVS)
+                aDEVS.my_input = {}
+        return remaining
+
     def atomicInit(self, aDEVS, time):
         """
         AtomicDEVS function to initialise the model
@@ -226,12 +579,15 @@ class Solver(object):
         aDEVS.time_next = (aDEVS.time_last[0] + ta, 1)
         # Save the state
         if not self.irreversible:
-            aDEVS.old_states.append(self.state_saver(aDEVS.time_last,
-                                                     aDEVS.time_next,
-                                                     aDEVS.state,
-                                                     0.0,
-                                                     {},
-                                                     0.0))
+            if self.delta_state_saving:
+                self.saveDeltaState(aDEVS, 0.0, {}, 0.0)
+            else:
+                aDEVS.old_states.append(self.state_saver(aDEVS.time_last,
+                                                         aDEVS.time_next,
+                                                         aDEVS.state,
+                                                         0.0,
+                                                         {},
+                                                         0.0))
 
         # All tracing features
         self.tracers.tracesInit(aDEVS, time)
@@ -254,98 +610,76 @@ class Solver(object):
         # Return value are the models to reschedule
         # self.transitioning are the models that must transition
         if len(imminent) > 1:
-            # Perform all selects
-            imminent.sort()
-            pending = imminent
-            level = 1
-            while len(pending) > 1:
-                # Take the model each time, as we need to make sure that the selectHierarchy is valid everywhere
-                model = pending[0]
-                # Make a set first to remove duplicates
-                colliding = list(set([m.select_hierarchy[level] for m in pending]))
-                chosen = model.select_hierarchy[level-1].select(
-                        sorted(colliding, key=lambda i:i.getModelFullName()))
-                pending = [m for m in pending 
-                             if m.select_hierarchy[level] == chosen]
-                level += 1
-            child = pending[0]
+            if all(m.select_priority is not None for m in imminent):
+                # Every level has a static select order, so the winner simply has the lowest key
+                child = min(imminent, key=selectPriorityKey)
+            else:
+                # Perform all selects
+                pending = imminent
+                level = 1
+                while len(pending) > 1:
+                    # Take the model each time, as we need to make sure that the selectHierarchy is valid everywhere
+                    model = pending[0]
+                    # Make a set first to remove duplicates
+                    colliding = list(set([m.select_hierarchy[level] for m in pending]))
+                    chosen = model.select_hierarchy[level-1].select(
+                            sorted(colliding, key=lambda i:i.getModelFullName()))
+                    pending = [m for m in pending 
+                                 if m.select_hierarchy[level] == chosen]
+                    level += 1
+                child = pending[0]
         else:
             child = imminent[0]
         # Recorrect the timeNext of the model that will transition
         child.time_next = (child.time_next[0], child.time_next[1] - 1)
 
-        outbag = child.my_output = ClassicDEVSWrapper(child).outputFnc()
-        self.transitioning[child] = 1
-
+        # The transitioning models are stored as their wrapper, which is created only once per model
+        transitioning = self.transitioning
+        wrappers = self.classic_wrappers
+        if transitioning:
+            # Added outside of the normal simulation loop, e.g. realtime input
+            for model in list(transitioning):
+                if not isinstance(model, ClassicDEVSWrapper):
+                    transitioning[self.classicWrapper(model)] = transitioning.pop(model)
+        wrapper = wrappers[child]
+        outbag = child.my_output = wrapper.outputFnc()
+        if self.msg_copy == 3:
+            outbag = child.my_output = freezeOutput(outbag)
+        transitioning[wrapper] = 1
+
+        routing_tables = self.routing_tables
         for outport in outbag:
-            for inport, z in outport.routing_outline:
-                payload = outbag[outport]
-                if z is not None:
-                    payload = [z(pickle.loads(pickle.dumps(m))) for m in payload]
-                aDEVS = inport.host_DEVS
-                aDEVS.my_input[inport] = list(payload)
-                self.transitioning[aDEVS] = 2
+            payload = outbag[outport]
+            try:
+                local, _ = routing_tables[outport]
+            except KeyError:
+                local, _ = self.compileRouting(outport)
+            for inport, z, copier, aDEVS in local:
+                if z is None:
+                    aDEVS.my_input[inport] = list(payload)
+                elif copier is None:
+                    aDEVS.my_input[inport] = [z(m) for m in payload]
+                else:
+                    aDEVS.my_input[inport] = [z(copier(m)) for m in payload]
+                transitioning[wrappers[aDEVS]] = 2
                 reschedule.add(aDEVS)
-        # We have now generated the transitioning variable, though we need some small magic to have it work for classic DEVS
-        self.transitioning = {ClassicDEVSWrapper(m): self.transitioning[m] 
-                              for m in self.transitioning}
         return reschedule
-    def coupledOutputGenerationClassic(self, time):
-        """
-        CoupledDEVS function to generate the output, calls the atomicDEVS models where necessary. Output is routed too.
 
-        :param time: the time at which output should be generated
-        :returns: the models that should be rescheduled
+         
+    
+    def classicWrapper(self, aDEVS):
         """
-        cDEVS = self.model
-        imminent = cDEVS.scheduler.getImminent(time)
-        if not imminent:
-            # For real time simulation, when a model is interrupted
-            return self.transitioning
-        reschedule = set(imminent)
-        for model in imminent:
-            model.time_next = (model.time_next[0], model.time_next[1] + 1)
-        # Return value are the models to reschedule
-        # self.transitioning are the models that must transition
-        if len(imminent) > 1:
-            # Perform all selects
-            pending = imminent
-            level = 1
-            while len(pending) > 1:
-                # Take the model each time, as we need to make sure that the selectHierarchy is valid everywhere
-                model = pending[0]
-                # Make a set first to remove duplicates
-                colliding = list(set([m.select_hierarchy[level] for m in pending]))
-                chosen = model.select_hierarchy[level-1].select(
-                        sorted(colliding, key=lambda i:i.getModelFullName()))
-                pending = [m for m in pending 
-                             if m.select_hierarchy[level] == chosen]
-                level += 1
-            child = pending[0]
-        else:
-            child = imminent[0]
-        # Recorrect the timeNext of the model that will transition
-        child.time_next = (child.time_next[0], child.time_next[1] - 1)
-
-        outbag = child.my_output = ClassicDEVSWrapper(child).outputFnc()
-        self.transitioning[child] = 1
+        Get the ClassicDEVSWrapper of a model, creating it the first time.
 
-        for outport in outbag:
-            for inport, z in outport.routing_outline:
-                payload = outbag[outport]
-                if z is not None:
-                    payload = [z(pickle.loads(pickle.dumps(m))) for m in payload]
-                aDEVS = inport.host_DEVS
-                aDEVS.my_input[inport] = list(payload)
-                self.transitioning[aDEVS] = 2
-                reschedule.add(aDEVS)
-        # We have now generated the transitioning variable, though we need some small magic to have it work for classic DEVS
-        self.transitioning = {ClassicDEVSWrapper(m): self.transitioning[m] 
-                              for m in self.transitioning}
-        return reschedule
+        :param aDEVS: the AtomicDEVS model to wrap
+        :returns: ClassicDEVSWrapper -- the wrapper of the model
+        """
+        try:
+            return self.classic_wrappers[aDEVS]
+        except KeyError:
+            wrapper = self.classic_wrappers[aDEVS] = ClassicDEVSWrapper(aDEVS)
+            return wrapper
 
-         
-    
     def coupledOutputGeneration(self, time):
         """
         CoupledDEVS function to generate the output, calls the atomicDEVS models where necessary. Output is routed too.
@@ -355,29 +689,180 @@ class Solver(object):
         """
         cDEVS = self.model
         remotes = {}
+        routing_tables = self.routing_tables
+        transitioning = self.transitioning
         for child in cDEVS.scheduler.getImminent(time):
             outbag = self.atomicOutputGeneration(child, time)
             for outport in outbag:
                 payload = outbag[outport]
-                if not hasattr(outport, "routing_outline"):
-                    raise Exception(outport)
-                for inport, z in outport.routing_outline:
-                    aDEVS = inport.host_DEVS
-                    if z is not None:
-                        payload = [z(pickle.loads(pickle.dumps(m))) 
-                                   for m in payload]
-                    if aDEVS.model_id in self.model.local_model_ids:
-                        # This setdefault call is responsible for our non-linear runtime in several situations...
-                        aDEVS.my_input.setdefault(inport, []).extend(payload)
-                        self.transitioning[aDEVS] |= 2
+                try:
+                    local, remote = routing_tables[outport]
+                except KeyError:
+                    local, remote = self.compileRouting(outport)
+                for inport, z, copier, aDEVS in local:
+                    if z is None:
+                        messages = payload
+                    elif copier is None:
+                        messages = [z(m) for m in payload]
+                    else:
+                        messages = [z(copier(m)) for m in payload]
+                    # Avoid setdefault, as it allocates a new list on every call
+                    bag = aDEVS.my_input.get(inport)
+                    if bag is None:
+                        aDEVS.my_input[inport] = list(messages)
+                    else:
+                        bag.extend(messages)
+                    transitioning[aDEVS] |= 2
+                for port_id, z, copier, model_id in remote:
+                    if z is None:
+                        messages = payload
+                    elif copier is None:
+                        messages = [z(m) for m in payload]
                     else:
-                        remotes.setdefault(aDEVS.model_id, 
-                                           {}).setdefault(inport.port_id, 
-                                                          []).extend(payload)
+                        messages = [z(copier(m)) for m in payload]
+                    ports = remotes.get(model_id)
+                    if ports is None:
+                        remotes[model_id] = {port_id: list(messages)}
+                    elif port_id in ports:
+                        ports[port_id].extend(messages)
+                    else:
+                        ports[port_id] = list(messages)
         for destination in remotes:
             self.send(destination, time, remotes[destination])
         return self.transitioning
 
+    def coupledOutputGenerationParallel(self, time):
+        """
+        CoupledDEVS function to generate the output, with the output functions executed by the worker processes.
+        Only used in local simulation, so all receivers are local.
+
+        :param time: the time at which output should be generated
+        :returns: the models that should be rescheduled
+        """
+        routing_tables = self.routing_tables
+        transitioning = self.transitioning
+        imminent = self.model.scheduler.getImminent(time)
+        for child, outbag in self.parallel_pool.outputs(imminent):
+            if self.msg_copy == 3:
+                outbag = freezeOutput(outbag)
+            child.my_output = outbag
+            transitioning[child] |= 1
+            for outport in outbag:
+                payload = outbag[outport]
+                try:
+                    local, _ = routing_tables[outport]
+                except KeyError:
+                    local, _ = self.compileRouting(outport)
+                for inport, z, copier, aDEVS in local:
+                    if z is None:
+                        messages = payload
+                    elif copier is None:
+                        messages = [z(m) for m in payload]
+                    else:
+                        messages = [z(copier(m)) for m in payload]
+                    bag = aDEVS.my_input.get(inport)
+                    if bag is None:
+                        aDEVS.my_input[inport] = list(messages)
+                    else:
+                        bag.extend(messages)
+                    transitioning[aDEVS] |= 2
+        return transitioning
+
+    def massAtomicTransitionsParallel(self, trans, clock):
+        """
+        AtomicDEVS function to perform all necessary transitions, with the transitions executed by the worker processes.
+        Messages are copied anyway when they are sent to the workers.
+
+        :param trans: iterable containing all models and their requested transition
+        :param clock: the time at which the transition must happen
+        """
+        self.parallel_pool.transition(trans, clock)
+        for aDEVS in trans:
+            aDEVS.my_input = {}
+        self.server.flushQueuedMessages()
+
+    def compileRouting(self, outport):
+        """
+        Compile the direct connections of an output port into a table of local receivers and a table of remote receivers.
+
+        :param outport: the output port of an AtomicDEVS model
+        :returns: tuple -- the local receivers as (inport, transfer function, copy function, model) and the remote receivers as (port ID, transfer function, copy function, model ID)
+        """
+        if not hasattr(outport, "routing_outline"):
+            raise DEVSException("No direct connections for output port '%s'" % 
+                                outport.getPortFullName())
+        local_model_ids = self.model.local_model_ids
+        local = []
+        remote = []
+        for inport, z in outport.routing_outline:
+            aDEVS = inport.host_DEVS
+            copier = None
+            if z is not None:
+                z, copier = resolveTransfer(z, self.msg_copy)
+            if aDEVS.model_id in local_model_ids:
+                local.append((inport, z, copier, aDEVS))
+            else:
+                remote.append((inport.port_id, z, copier, aDEVS.model_id))
+        self.routing_tables[outport] = (local, remote)
+        return local, remote
+
+    def compileRoutingTables(self):
+        """
+        (Re)compile the routing tables of all output ports of local models.
+        Must be called whenever the direct connections or the location of models change.
+        """
+        self.routing_tables = {}
+        for aDEVS in self.localModels():
+            for outport in aDEVS.OPorts:
+                if hasattr(outport, "routing_outline"):
+                    self.compileRouting(outport)
+
+    def invalidateRouting(self):
+        """
+        Drop all compiled routing tables, they will be recompiled lazily.
+        """
+        self.routing_tables = {}
+
+    def compileSelectPriorities(self):
+        """
+        Compile the static select order of all coupled models into a priority key for every atomic model.
+        """
+        ranks = {}
+        for aDEVS in self.model.component_set:
+            aDEVS.select_priority = self.selectPriority(aDEVS, ranks)
+
+    def selectPriority(self, aDEVS, ranks):
+        """
+        Compute the priority key of an atomic model. Coupled models declare their static select order as
+        *select_order*, a list of submodels or submodel names with the highest priority first. Comparing
+        keys then gives the same result as calling select at every level of the select hierarchy.
+
+        :param aDEVS: the atomic model to compute the key for
+        :param ranks: cache of the rank of each submodel, per coupled model
+        :returns: tuple -- the priority key, or None if some level has no static select order
+        """
+        key = []
+        hierarchy = aDEVS.select_hierarchy
+        for level in range(1, len(hierarchy)):
+            parent = hierarchy[level-1]
+            try:
+                parent_ranks = ranks[parent]
+            except KeyError:
+                order = getattr(parent, "select_order", None)
+                if order is None:
+                    parent_ranks = None
+                else:
+                    parent_ranks = {}
+                    for rank, m in enumerate(order):
+                        parent_ranks[m if isinstance(m, str) else m.getModelName()] = rank
+                ranks[parent] = parent_ranks
+            if parent_ranks is None:
+                return None
+            name = hierarchy[level].getModelName()
+            # Unlisted submodels come last, ordered by name to remain deterministic
+            key.append((parent_ranks.get(name, len(parent_ranks)), name))
+        return tuple(key)
+
     def coupledInit(self):
         """
         CoupledDEVS function to initialise the model, calls all its _local_ children too.
@@ -387,14 +872,99 @@ class Solver(object):
         # This part isn't fast, but it doesn't matter, since it just inits everything, optimizing here doesn't
         # matter as it is only called once AND every element has to be initted.
         # Only local models should receive this initialisation from us
+        if self.profiling:
+            for d in self.local:
+                instrument(d)
         for d in self.local:
             self.atomicInit(d, (0.0, 0))
             time_next = min(time_next, d.time_next)
         # NOTE do not immediately assign to the timeNext, as this is used in the GVT algorithm to see whether a node has finished
         cDEVS.time_next = time_next
         self.model.setScheduler(self.model.scheduler_type)
+        self.compileRoutingTables()
+        self.compileSelectPriorities()
+        if self.classic_devs:
+            self.classic_wrappers = {d: ClassicDEVSWrapper(d) for d in self.local}
         self.server.flushQueuedMessages()
 
+    def startLocalParallel(self):
+        """
+        Start the worker processes for local parallel transitions, and use them for all output and transition functions
+        until they are stopped. The workers only see the states at the time they are started, so this is refused
+        for everything that changes models in the kernel while simulating.
+        """
+        if self.classic_devs:
+            raise DEVSException("Local parallel transitions require Parallel DEVS")
+        if self.use_DSDEVS:
+            raise DEVSException("Local parallel transitions can't be combined with dynamic structure")
+        if len(self.model.local_model_ids) != len(self.model.models):
+            raise DEVSException("Local parallel transitions require all models on a single kernel")
+        if not (self.irreversible or self.temporary_irreversible):
+            # States are saved and rolled back in the kernel, as for time warp and relocation
+            raise DEVSException("Local parallel transitions require irreversible simulation")
+        if self.memoization:
+            raise DEVSException("Local parallel transitions can't be combined with memoization")
+        if self.do_some_tracing:
+            raise DEVSException("Local parallel transitions can't be combined with tracing")
+        if self.profiling:
+            raise DEVSException("Local parallel transitions can't be combined with profiling")
+        if self.activity_tracking:
+            # The activity is measured around the transitions, which happen in the workers
+            raise DEVSException("Local parallel transitions can't be combined with activity tracking")
+        if threading.active_count() > 1:
+            # Forking copies only the current thread, so locks held by other threads would never be released
+            raise DEVSException("Local parallel transitions can't fork a process that runs multiple threads")
+        self.parallel_pool = TransitionPool(self.local_parallel)
+        self.parallel_pool.start(self.local)
+        # Methods, so CamelCase
+        self.coupledOutputGeneration = self.coupledOutputGenerationParallel
+        self.massAtomicTransitions = self.massAtomicTransitionsParallel
+
+    def stopLocalParallel(self):
+        """
+        Copy the states of all models from the worker processes and stop them, releasing their shared memory.
+        """
+        if self.parallel_pool is not None:
+            pool = self.parallel_pool
+            self.parallel_pool = None
+            del self.coupledOutputGeneration
+            del self.massAtomicTransitions
+            try:
+                pool.collectStates()
+            finally:
+                pool.stop()
+
+    def setProfiling(self, profiling, filename=None, folded_filename=None):
+        """
+        Sets the profiling of the transition, output and time advance functions of all local models.
+        Must be set before initialisation. At the end of the simulation, the controller reports the calls and time
+        per function, per model class and per model of all kernels.
+
+        :param profiling: whether or not to profile the models
+        :param filename: file to write the report to, None for stdout
+        :param folded_filename: file to write the profile to in the folded format for flame graphs, or None
+        """
+        self.profiling = profiling
+        self.profile_filename = filename
+        self.folded_filename = folded_filename
+
+    def getProfile(self):
+        """
+        Get the profiling statistics of all local models.
+
+        :returns: list -- the statistics per model and function, see profiler.collect
+        """
+        return collect(self.localModels())
+
+    def dsCompactModels(self, force=False):
+        """
+        Called at the end of every dynamic structure step, to clean up the models that were removed.
+        Only the controller keeps the lists of models, so there is nothing to do by default.
+
+        :param force: whether to compact even if only a few models were removed
+        """
+        pass
+
     def performDSDEVS(self, transitioning):
         """
         Perform Dynamic Structure detection of the model
@@ -426,5 +996,13 @@ class Solver(object):
                     new_iterlist.append(cDEVS.parent)
             # Don't update the iterlist while we are iterating over it
             iterlist = new_iterlist
+        self.dsCompactModels()
         if self.dc_altered:
-            self.model.redoDirectConnection(self.dc_altered)
+            if getattr(self.model, "listeners", None):
+                # Listened ports are handled by the full direct connection
+                self.model.redoDirectConnection(self.dc_altered)
+                self.compileRoutingTables()
+            else:
+                # Only flatten the connections that pass through an altered port
+                for outport in redoDirectConnection(self.dc_altered):
+                    self.routing_tables.pop(outport, None)
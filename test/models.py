@@ -0,0 +1,101 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Small models shared by the tests
+"""
+
+import os
+import tempfile
+
+from pypdevs.DEVS import AtomicDEVS, CoupledDEVS
+from pypdevs.infinity import INFINITY
+
+class Emitter(AtomicDEVS):
+    """
+    Sends the number of its previous outputs at the given times
+    """
+    def __init__(self, name, times, classic=False):
+        AtomicDEVS.__init__(self, name)
+        self.times = times
+        self.classic = classic
+        self.state = 0
+        self.out = self.addOutPort("out")
+
+    def timeAdvance(self):
+        if self.state >= len(self.times):
+            return INFINITY
+        previous = self.times[self.state - 1] if self.state else 0.0
+        return self.times[self.state] - previous
+
+    def outputFnc(self):
+        return {self.out: self.state if self.classic else [self.state]}
+
+    def intTransition(self):
+        return self.state + 1
+
+class Collector(AtomicDEVS):
+    """
+    Records every input as a tuple of the time, the port name and the messages
+    """
+    def __init__(self, name, ports=("inp",)):
+        AtomicDEVS.__init__(self, name)
+        self.state = ()
+        self.ports = [self.addInPort(port) for port in ports]
+
+    def extTransition(self, inputs):
+        time = self.time_last[0] + self.elapsed
+        received = []
+        for port in self.ports:
+            if port in inputs:
+                messages = inputs[port]
+                messages = tuple(messages) if isinstance(messages, list) else (messages,)
+                received.append((time, port.getPortName(), messages))
+        return self.state + tuple(received)
+
+    def timeAdvance(self):
+        return INFINITY
+
+class Chain(CoupledDEVS):
+    """
+    Emitters feeding collectors, as a minimal model with messages
+    """
+    def __init__(self, name="chain", size=4, classic=False):
+        CoupledDEVS.__init__(self, name)
+        self.emitters = []
+        self.collectors = []
+        for i in range(size):
+            emitter = self.addSubModel(Emitter("emitter%i" % i, [1.0 + i, 3.0 + i, 10.0], classic))
+            collector = self.addSubModel(Collector("collector%i" % i))
+            self.connectPorts(emitter.out, collector.ports[0])
+            self.emitters.append(emitter)
+            self.collectors.append(collector)
+
+def traceOf(sim):
+    """
+    Run a simulation with the verbose tracer and return the trace.
+
+    :param sim: the configured simulator
+    :returns: string -- the trace
+    """
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        sim.setVerbose(filename)
+        sim.simulate()
+        with open(filename, 'r') as f:
+            return f.read()
+    finally:
+        os.remove(filename)
@@ -0,0 +1,162 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pypdevs.allocationCache import AllocationCache, structureHash
+from pypdevs.allocators.cachedAllocator import CachedAllocator
+
+class Port(object):
+    def __init__(self, host, name):
+        self.host_DEVS = host
+        self.name = name
+        self.outline = []
+
+    def getPortName(self):
+        return self.name
+
+    def getPortFullName(self):
+        return "%s.%s" % (self.host_DEVS.getModelFullName(), self.name)
+
+class Model(object):
+    def __init__(self, name, model_id):
+        self.name = name
+        self.model_id = model_id
+        self.IPorts = [Port(self, "in")]
+        self.OPorts = [Port(self, "out")]
+
+    def getModelFullName(self):
+        return "root." + self.name
+
+class Root(object):
+    def __init__(self, size):
+        self.component_set = [Model("model%i" % i, i) for i in range(size)]
+        for source, destination in zip(self.component_set, self.component_set[1:]):
+            source.OPorts[0].outline.append(destination.IPorts[0])
+
+class Group(object):
+    """
+    A coupled model holding some of the models, before direct connection
+    """
+    def __init__(self, models):
+        self.component_set = models
+        self.IPorts = [Port(self, "in")]
+        self.OPorts = [Port(self, "out")]
+
+    def getModelFullName(self):
+        return "root.group"
+
+def grouped(root, start, end):
+    """
+    Put models start to end - 1 of a chain in a coupled model, connected through its ports.
+    """
+    group = Group(root.component_set[start:end])
+    before, first = root.component_set[start - 1], root.component_set[start]
+    last, after = root.component_set[end - 1], root.component_set[end]
+    before.OPorts[0].outline = [group.IPorts[0]]
+    group.IPorts[0].outline = [first.IPorts[0]]
+    last.OPorts[0].outline = [group.OPorts[0]]
+    group.OPorts[0].outline = [after.IPorts[0]]
+    root.component_set[start:end] = [group]
+    return root
+
+class CountingAllocator(object):
+    def __init__(self):
+        self.calls = 0
+
+    def allocate(self, models, edges, nrnodes, total_activities):
+        self.calls += 1
+        return {model.model_id: model.model_id % nrnodes for model in models}
+
+    def getTerminationTime(self):
+        return 10.0
+
+class TestAllocationCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_structure_hash(self):
+        root = Root(4)
+        key = structureHash(root, 2)
+        self.assertEqual(key, structureHash(Root(4), 2))
+        self.assertNotEqual(key, structureHash(root, 3))
+        self.assertNotEqual(key, structureHash(Root(5), 2))
+        root.component_set[3].OPorts[0].outline.append(root.component_set[0].IPorts[0])
+        self.assertNotEqual(key, structureHash(root, 2))
+
+    def test_hash_of_direct_connection(self):
+        # The same structure before and after direct connection
+        self.assertEqual(structureHash(grouped(Root(5), 1, 3), 2), structureHash(Root(5), 2))
+
+    def test_hash_ignores_order_and_ids(self):
+        root = Root(4)
+        key = structureHash(root, 2)
+        root.component_set.reverse()
+        for model_id, model in enumerate(root.component_set):
+            model.model_id = model_id
+        self.assertEqual(key, structureHash(root, 2))
+
+    def test_round_trip(self):
+        root = Root(4)
+        cache = AllocationCache(os.path.join(self.directory, "cache"))
+        key = structureHash(root, 2)
+        self.assertEqual(cache.load(key, root.component_set), None)
+        cache.store(key, {0: 0, 1: 0, 2: 1, 3: 1}, root.component_set)
+
+        # Model IDs may differ in the next run, names are what counts
+        other = Root(4)
+        other.component_set.reverse()
+        for model_id, model in enumerate(other.component_set):
+            model.model_id = model_id
+        self.assertEqual(cache.load(key, other.component_set), {3: 0, 2: 0, 1: 1, 0: 1})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_unknown_model_is_a_miss(self):
+        root = Root(4)
+        cache = AllocationCache(self.directory)
+        key = structureHash(root, 2)
+        cache.store(key, {0: 0, 1: 0, 2: 1}, root.component_set)
+        self.assertEqual(cache.load(key, root.component_set), None)
+
+    def test_cached_allocator_skips_warmup(self):
+        allocator = CountingAllocator()
+        first = CachedAllocator(allocator, self.directory, Root(4), 2)
+        self.assertEqual(first.getTerminationTime(), 10.0)
+        allocations = first.allocate(Root(4).component_set, {}, 2, {})
+        self.assertEqual(allocator.calls, 1)
+
+        second = CachedAllocator(allocator, self.directory, Root(4), 2)
+        self.assertEqual(second.getTerminationTime(), 0.0)
+        self.assertEqual(second.allocate(Root(4).component_set, None, 2, None), allocations)
+        self.assertEqual(allocator.calls, 1)
+
+        other = CachedAllocator(allocator, self.directory, Root(4), 3)
+        self.assertEqual(other.getTerminationTime(), 10.0)
+
+    def test_cached_allocator_before_direct_connection(self):
+        allocator = CountingAllocator()
+        CachedAllocator(allocator, self.directory, Root(5), 2).allocate(Root(5).component_set, {}, 2, {})
+        cached = CachedAllocator(allocator, self.directory, grouped(Root(5), 1, 3), 2)
+        self.assertEqual(cached.getTerminationTime(), 0.0)
+        self.assertEqual(allocator.calls, 1)
+
+if __name__ == '__main__':
+    unittest.main()
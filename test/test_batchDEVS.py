@@ -0,0 +1,80 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import os
+import pickle
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pypdevs.simulator import Simulator
+
+@unittest.skipIf(np is None, "BatchAtomicDEVS models require NumPy")
+class TestBatchDEVS(unittest.TestCase):
+    def simulate(self, batch):
+        from batch_traffic_model import BatchTrafficGrid
+        model = BatchTrafficGrid(name="grid", size=20)
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            sim = Simulator(model)
+            sim.setTerminationTime(1750.0)
+            sim.setVerbose(filename)
+            sim.controller.setBatchTransitions(batch)
+            sim.simulate()
+            with open(filename, 'r') as f:
+                return f.read(), model
+        finally:
+            os.remove(filename)
+
+    def test_batched_trace(self):
+        unbatched, _ = self.simulate(False)
+        batched, model = self.simulate(True)
+        self.assertEqual(unbatched, batched)
+        self.assertIn("trafficLight", batched)
+        # All policemen switched to working at 1700, so all lights are in manual mode
+        for system in model.systems:
+            self.assertEqual(system.trafficLight.state, {"colour": 3})
+
+    def test_release_row(self):
+        from pypdevs.batchDEVS import BatchStore
+        store = BatchStore({"value": np.int32}, capacity=2)
+        rows = [store.allocate() for _ in range(3)]
+        self.assertEqual(rows, [0, 1, 2])
+        store.arrays["value"][1] = 5
+        store.release(1)
+        self.assertEqual(store.arrays["value"][1], 0)
+        self.assertEqual(store.allocate(), 1)
+        self.assertEqual(store.allocate(), 3)
+        self.assertEqual(store.size, 4)
+
+    def test_pickle_carries_state(self):
+        from batch_traffic_model import BatchTrafficLight, MANUAL
+        light = BatchTrafficLight(name="light")
+        light.state = {"colour": MANUAL}
+        restored = pickle.loads(pickle.dumps(light))
+        self.assertNotEqual(restored.batch_row, light.batch_row)
+        self.assertEqual(restored.state, {"colour": MANUAL})
+        # The copy has its own row, so changing one leaves the other alone
+        light.state = {"colour": 0}
+        self.assertEqual(restored.state, {"colour": MANUAL})
+        duplicate = copy.deepcopy(restored)
+        self.assertNotEqual(duplicate.batch_row, restored.batch_row)
+        self.assertEqual(duplicate.state, {"colour": MANUAL})
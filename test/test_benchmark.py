@@ -0,0 +1,89 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pypdevs.DEVS import CoupledDEVS
+
+import benchmark
+
+def atomics(model):
+    if isinstance(model, CoupledDEVS):
+        return sum([atomics(child) for child in model.component_set])
+    return 1
+
+def config(kind, depth=2, width=2, fanout=1, density=1, time=100.0):
+    return {"kind": kind, "depth": depth, "width": width, 
+            "fanout": fanout, "density": density, "time": time}
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stdout = sys.stdout
+        self.argv = sys.argv
+        # The traffic models print every transition
+        sys.stdout = open(os.devnull, 'w')
+
+    def tearDown(self):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+        sys.argv = self.argv
+        shutil.rmtree(self.directory)
+
+    def test_hierarchy_size(self):
+        self.assertEqual(atomics(benchmark.build(config("traffic", depth=3, width=2), False)), 12)
+        # A G_BPmodel, an extra generator and two extra TrafficSystems per group
+        model = benchmark.build(config("gbp", depth=2, width=3, fanout=3, density=2), True)
+        self.assertEqual(atomics(model), 2 * 3 * (3 + 1 + 2 * 2))
+
+    def test_variants(self):
+        model = benchmark.build(config("traffic", depth=1, width=1), True)
+        system = list(model.component_set)[0]
+        for child in system.component_set:
+            self.assertIs(type(child), benchmark.VARIANTS[(type(child).__bases__[0], True)])
+
+    def test_run(self):
+        for kind in ("traffic", "gbp"):
+            for parallel in (False, True):
+                result = benchmark.measure(config(kind, fanout=2), parallel, 1, False)
+                self.assertGreater(result["events"], 0)
+                self.assertGreater(result["events_per_second"], 0)
+                self.assertEqual(sorted(result["phases"]), ["construct", "setup", "simulate"])
+
+    def test_baseline(self):
+        filename = os.path.join(self.directory, "baseline.json")
+        args = ["benchmark.py", "--kind", "traffic", "--depth", "1", "--width", "2", "--time", "100",
+                "--formalism", "parallel", "--repeat", "1", "--no-memory"]
+        sys.argv = args + ["--save-baseline", filename]
+        self.assertEqual(benchmark.main(), 0)
+        with open(filename, 'r') as f:
+            baseline = json.load(f)
+        name = benchmark.configName(config("traffic", depth=1, time=100.0), "parallel")
+        self.assertEqual(list(baseline), [name])
+
+        # Far slower than the baseline
+        baseline[name]["events_per_second"] *= 1000
+        with open(filename, 'w') as f:
+            json.dump(baseline, f)
+        sys.argv = args + ["--baseline", filename]
+        self.assertEqual(benchmark.main(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
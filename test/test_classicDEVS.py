@@ -0,0 +1,45 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.classicDEVSWrapper import ClassicDEVSWrapper
+from pypdevs.simulator import Simulator
+
+from models import Chain
+
+class TestClassicDEVS(unittest.TestCase):
+    def test_chain(self):
+        model = Chain(size=3, classic=True)
+        sim = Simulator(model)
+        sim.setClassicDEVS()
+        sim.setTerminationTime(20.0)
+        sim.simulate()
+        for i, collector in enumerate(model.collectors):
+            self.assertEqual(collector.state, ((1.0 + i, "inp", (0,)),
+                                               (3.0 + i, "inp", (1,)),
+                                               (10.0, "inp", (2,))))
+
+    def test_wrappers_reused(self):
+        chain = Chain(size=3, classic=True)
+        sim = Simulator(chain)
+        sim.setClassicDEVS()
+        sim.setTerminationTime(20.0)
+        sim.simulate()
+        wrappers = sim.controller.classic_wrappers
+        # A single wrapper per model, created at initialisation
+        self.assertEqual(set(wrappers), set(chain.emitters + chain.collectors))
+        for model, wrapper in wrappers.items():
+            self.assertIsInstance(wrapper, ClassicDEVSWrapper)
@@ -0,0 +1,58 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from pypdevs.controller import Controller
+
+class Finishing(object):
+    """
+    The attributes of the controller used to wait for the end of the simulation
+    """
+    def __init__(self, checks):
+        self.checks = checks
+        self.times = []
+        self.run_gvt = True
+        self.event_gvt = threading.Event()
+        self.gvt_thread = threading.Thread(target=self.event_gvt.wait)
+        self.gvt_thread.start()
+
+    def isFinished(self, running):
+        self.times.append(time.time())
+        return len(self.times) >= self.checks
+
+class TestWaitFinish(unittest.TestCase):
+    def test_detected_quickly(self):
+        controller = Finishing(3)
+        start = time.time()
+        Controller.waitFinish(controller, 2)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(len(controller.times), 3)
+        self.assertFalse(controller.run_gvt)
+        self.assertFalse(controller.gvt_thread.is_alive())
+
+    def test_interval_grows_up_to_maximum(self):
+        controller = Finishing(8)
+        start = time.time()
+        Controller.waitFinish(controller, 2, min_interval=0.01, max_interval=0.04)
+        intervals = [b - a for a, b in zip([start] + controller.times, controller.times)]
+        self.assertLess(intervals[0], 0.03)
+        self.assertGreater(intervals[-1], 0.03)
+        self.assertLess(max(intervals), 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from copy import deepcopy
+import unittest
+
+from pypdevs.deltaStates import DeltaState
+
+class CountingSaver(object):
+    """
+    Deep copying state saver, counting how many times it is used
+    """
+    saved = 0
+
+    def __init__(self, time_last, time_next, state, activity, my_input, elapsed):
+        CountingSaver.saved += 1
+        self.state = deepcopy(state)
+
+    def loadState(self):
+        return deepcopy(self.state)
+
+class State(object):
+    def __init__(self, position, history):
+        self.position = position
+        self.history = history
+
+def save(state, time, previous, interval=16):
+    return DeltaState((time, 1), (time + 1, 1), state, 0.0, {}, 1.0, previous, interval, CountingSaver)
+
+class TestDeltaStates(unittest.TestCase):
+    def history(self, interval=16):
+        state = State(0, [])
+        saves = [save(state, 0.0, None, interval)]
+        for i in range(1, 6):
+            state.position = i
+            if i % 2 == 0:
+                state.history.append(i)
+            saves.append(save(state, float(i), saves[-1], interval))
+        return state, saves
+
+    def test_deltas_only_store_changes(self):
+        _, saves = self.history()
+        self.assertIsNotNone(saves[0].full)
+        for i in range(1, 6):
+            self.assertIsNone(saves[i].full)
+            changed = saves[i].delta.loadState()
+            expected = {"position"} if i % 2 else {"position", "history"}
+            self.assertEqual(set(changed), expected)
+
+    def test_load_every_state(self):
+        _, saves = self.history()
+        for i, saved in enumerate(saves):
+            state = saved.loadState()
+            self.assertIsInstance(state, State)
+            self.assertEqual(state.position, i)
+            self.assertEqual(state.history, [j for j in range(2, i + 1, 2)])
+
+    def test_loaded_state_is_a_copy(self):
+        _, saves = self.history()
+        state = saves[-1].loadState()
+        state.history.append(100)
+        self.assertEqual(saves[-1].loadState().history, [2, 4])
+        self.assertEqual(saves[-1].materialize()["history"], [2, 4])
+
+    def test_materialize_after_rollback(self):
+        state, saves = self.history()
+        # Roll back to the state saved at time 2 and continue from there
+        del saves[3:]
+        state = saves[-1].loadState()
+        self.assertEqual((state.position, state.history), (2, [2]))
+        state.position = 30
+        state.history.append(30)
+        saves.append(save(state, 3.0, saves[-1]))
+        self.assertEqual(saves[-1].materialize(), {"position": 30, "history": [2, 30]})
+        self.assertEqual(saves[-1].loadState().history, [2, 30])
+        # Older saves don't keep their materialized attributes
+        self.assertEqual(saves[1].materialize(), {"position": 1, "history": []})
+        self.assertIsNone(saves[1].current)
+        self.assertIsNone(saves[2].current)
+
+    def test_checkpoint_interval(self):
+        _, saves = self.history(interval=3)
+        self.assertEqual([saved.full is not None for saved in saves],
+                         [True, False, False, True, False, False])
+        self.assertEqual(saves[5].loadState().position, 5)
+
+    def test_no_attribute_dictionary(self):
+        first = save((1, 2), 0.0, None)
+        second = save((1, 3), 1.0, first)
+        self.assertIsNotNone(second.full)
+        self.assertEqual(second.loadState(), (1, 3))
+
+    def test_uses_state_saver(self):
+        before = CountingSaver.saved
+        self.history()
+        self.assertEqual(CountingSaver.saved - before, 6)
@@ -0,0 +1,207 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.controller import Controller
+from pypdevs.DEVS import AtomicDEVS, CoupledDEVS
+from pypdevs.directConnection import redoDirectConnection
+
+class Scheduler(object):
+    def __init__(self):
+        self.scheduled = set()
+
+    def schedule(self, model):
+        self.scheduled.add(model)
+
+    def unschedule(self, model):
+        self.scheduled.remove(model)
+
+class Root(CoupledDEVS):
+    def __init__(self, size):
+        CoupledDEVS.__init__(self, "root")
+        self.full_name = "root"
+        self.submodels = [self.addSubModel(AtomicDEVS("model%i" % i)) for i in range(size)]
+        for model_id, model in enumerate(self.submodels):
+            model.model_id = model_id
+        self.models = list(self.submodels)
+        self.local_model_ids = set(range(size))
+        self.scheduler = Scheduler()
+        self.scheduler.scheduled = set(self.submodels)
+
+class Sender(AtomicDEVS):
+    def __init__(self, name):
+        AtomicDEVS.__init__(self, name)
+        self.out = self.addOutPort("out")
+
+class Receiver(AtomicDEVS):
+    def __init__(self, name):
+        AtomicDEVS.__init__(self, name)
+        self.inp = self.addInPort("inp")
+
+class Group(CoupledDEVS):
+    """
+    Two receivers behind an input port, one of them behind a transfer function
+    """
+    def __init__(self, name):
+        CoupledDEVS.__init__(self, name)
+        self.inp = self.addInPort("inp")
+        self.first = self.addSubModel(Receiver("first"))
+        self.second = self.addSubModel(Receiver("second"))
+        self.connectPorts(self.inp, self.first.inp)
+        self.connectPorts(self.inp, self.second.inp, lambda x: x + 1)
+
+class Network(CoupledDEVS):
+    def __init__(self):
+        CoupledDEVS.__init__(self, "network")
+        self.sender = self.addSubModel(Sender("sender"))
+        self.group = self.addSubModel(Group("group"))
+        self.direct = self.addSubModel(Receiver("direct"))
+        self.connectPorts(self.sender.out, self.group.inp, lambda x: x * 2)
+        self.connectPorts(self.sender.out, self.direct.inp)
+
+def routing(port):
+    return [(inport.host_DEVS.getModelName(), z(3) if z is not None else None)
+            for inport, z in port.routing_outline]
+
+class Kernels(object):
+    """
+    The attributes of the controller used by dynamic structure changes of atomic models
+    """
+    def __init__(self, size):
+        self.name = 0
+        self.model = Root(size)
+        # The root's list of submodels acts as the flattened list of local models
+        self.model.component_set = list(self.model.submodels)
+        self.model_ids = list(self.model.submodels)
+        self.destinations = list(self.model.submodels)
+        self.classic_wrappers = {}
+        self.classic_devs = False
+        self.profiling = False
+        self.current_clock = (0.0, 1)
+        self.dc_altered = set()
+        self.ds_removed = set()
+        self.ds_compact_fraction = 0.25
+        self.free_model_ids = []
+        self.total_activities = {}
+
+    def atomicInit(self, model, clock):
+        model.time_last = clock
+        model.time_next = (clock[0] + 1.0, 1)
+
+    def selectPriority(self, model, ranks):
+        return ()
+
+    def dsRemovePort(self, port):
+        Controller.dsRemovePort(self, port)
+
+    def dsCompactModels(self, force=False):
+        Controller.dsCompactModels(self, force)
+
+    def dsUnscheduleModel(self, model):
+        Controller.dsUnscheduleModel(self, model)
+
+    def dsScheduleModel(self, model):
+        Controller.dsScheduleModel(self, model)
+
+    def names(self):
+        return [m.getModelName() for m in self.model.component_set]
+
+class TestDynamicStructure(unittest.TestCase):
+    def test_removal_keeps_order(self):
+        kernels = Kernels(5)
+        models = kernels.model.submodels
+        kernels.dsUnscheduleModel(models[1])
+        kernels.dsUnscheduleModel(models[3])
+        self.assertNotIn(models[1], kernels.model.scheduler.scheduled)
+        self.assertEqual(kernels.model.local_model_ids, set([0, 2, 4]))
+        kernels.dsCompactModels()
+        self.assertEqual(kernels.names(), ["model0", "model2", "model4"])
+        self.assertEqual([m.getModelName() for m in kernels.model.models], ["model0", "model2", "model4"])
+        self.assertEqual(kernels.model_ids[1], None)
+        self.assertEqual(kernels.destinations[3], None)
+
+    def test_tombstones(self):
+        kernels = Kernels(10)
+        models = kernels.model.submodels
+        kernels.dsUnscheduleModel(models[4])
+        kernels.dsCompactModels()
+        # Too few removed models to compact, so it stays listed but is no longer local
+        self.assertEqual(len(kernels.model.component_set), 10)
+        self.assertNotIn(4, kernels.model.local_model_ids)
+        kernels.dsUnscheduleModel(models[2])
+        kernels.dsUnscheduleModel(models[7])
+        kernels.dsCompactModels()
+        self.assertEqual(kernels.names(), ["model0", "model1", "model3", "model5", "model6", "model8", "model9"])
+        self.assertEqual(sorted(kernels.free_model_ids), [2, 4, 7])
+
+    def test_ids_reused_after_compacting(self):
+        kernels = Kernels(3)
+        kernels.total_activities = {0: 5.0, 1: 3.0, 2: 1.0}
+        kernels.dsUnscheduleModel(kernels.model.submodels[0])
+        kernels.dsCompactModels()
+        group = CoupledDEVS("group")
+        group.full_name = "root.group"
+        model = group.addSubModel(AtomicDEVS("new"))
+        kernels.dsScheduleModel(model)
+        self.assertEqual(model.model_id, 0)
+        self.assertIs(kernels.model_ids[0], model)
+        self.assertIs(kernels.destinations[0], model)
+        self.assertEqual(len(kernels.model_ids), 3)
+        # Nothing of the removed model is inherited
+        self.assertEqual(kernels.total_activities, {1: 3.0, 2: 1.0})
+        self.assertEqual(kernels.names(), ["model1", "model2", "new"])
+        self.assertIn(model, kernels.model.scheduler.scheduled)
+        other = group.addSubModel(AtomicDEVS("other"))
+        kernels.dsScheduleModel(other)
+        self.assertEqual(other.model_id, 3)
+
+    def test_removed_and_added_in_one_step(self):
+        kernels = Kernels(10)
+        model = kernels.model.submodels[1]
+        kernels.dsUnscheduleModel(model)
+        kernels.dsScheduleModel(model)
+        kernels.dsCompactModels()
+        self.assertEqual(kernels.names(), ["model0"] + ["model%i" % i for i in range(2, 10)] + ["model1"])
+        self.assertEqual(kernels.names().count("model1"), 1)
+        self.assertEqual(model.model_id, 1)
+        self.assertIn(1, kernels.model.local_model_ids)
+
+class TestDirectConnection(unittest.TestCase):
+    def test_nested_transfer_functions(self):
+        network = Network()
+        self.assertEqual(redoDirectConnection([network.group.inp]), set([network.sender.out]))
+        self.assertEqual(routing(network.sender.out), [("first", 6), ("second", 7), ("direct", None)])
+
+    def test_only_affected_ports(self):
+        network = Network()
+        other = Sender("other")
+        self.assertEqual(redoDirectConnection([network.direct.inp, other.out]), 
+                         set([network.sender.out, other.out]))
+        self.assertEqual(other.out.routing_outline, [])
+
+    def test_remove_duplicate_connections(self):
+        network = Network()
+        # Connected twice, so both links must go
+        network.connectPorts(network.sender.out, network.direct.inp)
+        kernels = Kernels(0)
+        kernels.dsRemovePort(network.direct.inp)
+        self.assertEqual(network.sender.out.outline, [network.group.inp])
+        self.assertEqual(kernels.dc_altered, set([network.direct.inp]))
+        redoDirectConnection(kernels.dc_altered)
+        self.assertEqual(routing(network.sender.out), [("first", 6), ("second", 7)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.fossilCollector import FossilCollector, ENTRY_OVERHEAD
+
+class Saved(object):
+    def __init__(self, time):
+        self.time_last = (time, 1)
+
+class Model(object):
+    def __init__(self, name, times, state="x" * 100):
+        self.name = name
+        self.state = state
+        self.old_states = [Saved(t) for t in times]
+
+    def getModelFullName(self):
+        return self.name
+
+class TestFossilCollector(unittest.TestCase):
+    def test_measure(self):
+        collector = FossilCollector(budget=10000)
+        models = [Model("a", [0.0, 1.0, 2.0]), Model("b", [0.0])]
+        usage = collector.measure(models)
+        size = collector.stateSize(models[0])
+        self.assertGreater(size, ENTRY_OVERHEAD)
+        self.assertEqual(usage, 4 * size)
+
+    def test_collect_keeps_last_state_before_gvt(self):
+        collector = FossilCollector(budget=10000)
+        model = Model("a", [0.0, 1.0, 2.0, 3.0, 4.0])
+        collector.collect([model], 2.5)
+        self.assertEqual([s.time_last[0] for s in model.old_states], [2.0, 3.0, 4.0])
+        self.assertEqual(collector.removed, 2)
+        # Nothing more to remove at the same GVT
+        collector.collect([model], 2.5)
+        self.assertEqual(len(model.old_states), 3)
+
+    def test_collect_single_state(self):
+        collector = FossilCollector(budget=10000)
+        model = Model("a", [0.0])
+        collector.collect([model], 5.0)
+        self.assertEqual(len(model.old_states), 1)
+
+    def test_statistics(self):
+        collector = FossilCollector(budget=10000)
+        models = [Model("a", [0.0, 1.0]), Model("b", [0.0])]
+        statistics = collector.getStatistics(models)
+        self.assertEqual(statistics["models"]["a"]["entries"], 2)
+        self.assertEqual(statistics["models"]["b"]["entries"], 1)
+        self.assertEqual(statistics["usage"], 3 * collector.stateSize(models[0]))
+        self.assertEqual(statistics["budget"], 10000)
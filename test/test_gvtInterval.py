@@ -0,0 +1,65 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.gvtInterval import AdaptiveGVTInterval
+
+def status(rollbacks, usage=None, budget=None):
+    return {"clock": 10.0, "usage": usage, "budget": budget, "rollbacks": rollbacks}
+
+class TestAdaptiveGVTInterval(unittest.TestCase):
+    def test_grows_when_smooth(self):
+        controller = AdaptiveGVTInterval(0.1, 4.0)
+        interval = 1.0
+        for _ in range(10):
+            interval = controller.nextInterval(interval, {"advance": 1.0}, {0: status(0), 1: status(0)})
+        self.assertEqual(interval, 4.0)
+
+    def test_shrinks_on_rollbacks_without_budget(self):
+        controller = AdaptiveGVTInterval(0.1, 4.0, rollbacks_high=2)
+        interval = controller.nextInterval(1.0, {"advance": 1.0}, {0: status(0), 1: status(0)})
+        self.assertEqual(interval, 1.5)
+        interval = controller.nextInterval(interval, {"advance": 1.0}, {0: status(3), 1: status(0)})
+        self.assertEqual(interval, 0.75)
+        # A steady high rollback rate keeps shortening the interval
+        interval = controller.nextInterval(interval, {"advance": 1.0}, {0: status(6), 1: status(0)})
+        self.assertEqual(interval, 0.375)
+
+    def test_few_rollbacks(self):
+        controller = AdaptiveGVTInterval(0.1, 4.0, rollbacks_high=2)
+        interval = 1.0
+        for rollbacks in range(1, 5):
+            # One rollback per round: neither shortened nor lengthened
+            interval = controller.nextInterval(interval, {"advance": 1.0}, {0: status(rollbacks)})
+        self.assertEqual(interval, 1.0)
+
+    def test_shrinks_on_memory_pressure(self):
+        controller = AdaptiveGVTInterval(0.1, 4.0)
+        interval = controller.nextInterval(1.0, {"advance": 1.0}, {0: status(0, 90, 100)})
+        self.assertEqual(interval, 0.5)
+        interval = controller.nextInterval(interval, {"advance": 1.0}, {0: status(0, 50, 100)})
+        self.assertEqual(interval, 0.5)
+
+    def test_no_growth_without_progress(self):
+        controller = AdaptiveGVTInterval(0.1, 4.0)
+        self.assertEqual(controller.nextInterval(1.0, {"advance": 0.0}, {0: status(0)}), 1.0)
+
+    def test_bounds(self):
+        controller = AdaptiveGVTInterval(0.5, 4.0)
+        interval = 1.0
+        for rollbacks in range(1, 10):
+            interval = controller.nextInterval(interval, {"advance": 1.0}, {0: status(rollbacks ** 2)})
+        self.assertEqual(interval, 0.5)
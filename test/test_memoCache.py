@@ -0,0 +1,98 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.memoCache import MemoCache
+
+class Port(object):
+    def __init__(self, port_id):
+        self.port_id = port_id
+
+class Model(object):
+    def __init__(self, state, my_input=None):
+        self.model_id = 0
+        self.state = state
+        self.my_input = my_input or {}
+
+class MutableState(object):
+    def __init__(self, value):
+        self.value = value
+
+class VersionedModel(Model):
+    def memoKey(self):
+        return self.state.value
+
+class Saved(object):
+    def __init__(self, time_last):
+        self.time_last = time_last
+
+class TestMemoCache(unittest.TestCase):
+    def test_value_key(self):
+        cache = MemoCache()
+        port = Port(3)
+        key, _ = cache.makeKey(Model(("red", 1), {port: ["toManual"]}), 2, (5.0, 1), 1.0)
+        cache.store(key, 0, Saved((5.0, 1)))
+        same, _ = cache.makeKey(Model(("red", 1), {port: ["toManual"]}), 2, (5.0, 1), 1.0)
+        self.assertIsNotNone(cache.lookup(same))
+        other, _ = cache.makeKey(Model(("red", 1), {port: ["toAutonomous"]}), 2, (5.0, 1), 1.0)
+        self.assertIsNone(cache.lookup(other))
+        self.assertEqual(cache.getStatistics()["hits"], 1)
+        self.assertEqual(cache.getStatistics()["misses"], 1)
+
+    def test_identity_hash_not_memoized(self):
+        cache = MemoCache()
+        key, _ = cache.makeKey(Model(MutableState(1)), 1, (5.0, 1), None)
+        self.assertIsNone(key)
+        key, _ = cache.makeKey(Model(1, {Port(0): [MutableState(1)]}), 2, (5.0, 1), 0.5)
+        self.assertIsNone(key)
+        key, _ = cache.makeKey(Model([1, 2]), 1, (5.0, 1), None)
+        self.assertIsNone(key)
+
+    def test_pickle_keys(self):
+        cache = MemoCache(pickle_keys=True)
+        key, size = cache.makeKey(Model(MutableState(1)), 1, (5.0, 1), None)
+        self.assertIsNotNone(key)
+        self.assertGreater(size, 0)
+        same, _ = cache.makeKey(Model(MutableState(1)), 1, (5.0, 1), None)
+        self.assertEqual(key, same)
+
+    def test_memo_key_method(self):
+        cache = MemoCache()
+        key, _ = cache.makeKey(VersionedModel(MutableState(7)), 1, (5.0, 1), None)
+        same, _ = cache.makeKey(VersionedModel(MutableState(7)), 1, (5.0, 1), None)
+        other, _ = cache.makeKey(VersionedModel(MutableState(8)), 1, (5.0, 1), None)
+        self.assertEqual(key, same)
+        self.assertNotEqual(key, other)
+
+    def test_eviction(self):
+        cache = MemoCache(budget=1000)
+        for i in range(10):
+            key, _ = cache.makeKey(Model(i), 1, (float(i), 1), None)
+            cache.store(key, 0, Saved((float(i), 1)))
+        self.assertLessEqual(cache.size, 1000)
+        self.assertGreater(cache.evictions, 0)
+        # The most recent entry is still there
+        key, _ = cache.makeKey(Model(9), 1, (9.0, 1), None)
+        self.assertIsNotNone(cache.lookup(key))
+
+    def test_fossil_collect(self):
+        cache = MemoCache()
+        for i in range(10):
+            key, _ = cache.makeKey(Model(i), 1, (float(i), 1), None)
+            cache.store(key, 0, Saved((float(i), 1)))
+        cache.fossilCollect(5.0)
+        self.assertEqual(len(cache.entries), 5)
+        self.assertTrue(all([key[2][0] >= 5.0 for key in cache.entries]))
@@ -0,0 +1,88 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+import pickle
+import unittest
+
+from pypdevs.messageFreezer import FrozenDict, freeze, freezeOutput, fingerprintInput, validateInput
+from pypdevs.util import DEVSException
+
+Car = namedtuple("Car", ["ID", "speed"])
+
+class Plain(object):
+    def __init__(self, value):
+        self.value = value
+
+class Freezable(object):
+    def __init__(self, value):
+        self.value = value
+
+    def __freeze__(self):
+        return ("Freezable", self.value)
+
+class Port(object):
+    def getPortName(self):
+        return "port"
+
+class Model(object):
+    def getModelFullName(self):
+        return "model"
+
+class TestMessageFreezer(unittest.TestCase):
+    def test_containers(self):
+        frozen = freeze({"cars": [Car(1, [3, 4])], "tags": {"a"}, "raw": bytearray(b"x")})
+        self.assertIsInstance(frozen, FrozenDict)
+        self.assertEqual(frozen["cars"], (Car(1, (3, 4)),))
+        self.assertIsInstance(frozen["cars"][0], Car)
+        self.assertEqual(frozen["tags"], frozenset(["a"]))
+        self.assertEqual(frozen["raw"], b"x")
+        hash(frozen)
+
+    def test_frozen_dict_mutation_raises(self):
+        frozen = freeze({"a": 1})
+        with self.assertRaises(TypeError):
+            frozen["a"] = 2
+        with self.assertRaises(TypeError):
+            dict.__setitem__(frozen, "a", 2)
+        with self.assertRaises(DEVSException):
+            frozen._items = {"a": 2}
+        with self.assertRaises(TypeError):
+            frozen._items["a"] = 2
+        self.assertEqual(frozen["a"], 1)
+
+    def test_pickle(self):
+        frozen = freeze({"a": [1, 2]})
+        copied = pickle.loads(pickle.dumps(frozen))
+        self.assertIsInstance(copied, FrozenDict)
+        self.assertEqual(copied, frozen)
+
+    def test_unknown_class_refused(self):
+        with self.assertRaises(DEVSException):
+            freeze(Plain(1))
+        with self.assertRaises(DEVSException):
+            freezeOutput({Port(): [[Plain(1)]]})
+
+    def test_freeze_protocol(self):
+        self.assertEqual(freeze([Freezable(3)]), (("Freezable", 3),))
+
+    def test_validation(self):
+        port = Port()
+        inbag = {port: [[1, 2]]}
+        fingerprints = fingerprintInput(inbag)
+        validateInput(Model(), inbag, fingerprints)
+        inbag[port][0].append(3)
+        with self.assertRaises(DEVSException):
+            validateInput(Model(), inbag, fingerprints)
@@ -0,0 +1,64 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from pypdevs.controller import Controller
+
+class Kernels(object):
+    """
+    The attributes of the controller used while waiting for migration locks
+    """
+    def __init__(self):
+        self.lock_condition = threading.Condition()
+        self.locked_kernels = set()
+        self.run_gvt = True
+
+    def notifyLocked(self, remote):
+        Controller.notifyLocked(self, remote)
+
+    def waitMigrationLocks(self, pairs, interval=0.05):
+        return Controller.waitMigrationLocks(self, pairs, interval)
+
+class TestMigration(unittest.TestCase):
+    def test_ready_pairs(self):
+        kernels = Kernels()
+        kernels.locked_kernels = set([0, 1, 2])
+        self.assertEqual(sorted(kernels.waitMigrationLocks([(0, 1), (1, 3), (2, 0)])), 
+                         [(0, 1), (2, 0)])
+
+    def test_woken_by_lock(self):
+        kernels = Kernels()
+        kernels.notifyLocked(0)
+        timer = threading.Timer(0.1, kernels.notifyLocked, [1])
+        timer.start()
+        start = time.time()
+        self.assertEqual(kernels.waitMigrationLocks([(0, 1)], interval=10.0), [(0, 1)])
+        self.assertLess(time.time() - start, 5.0)
+        timer.join()
+
+    def test_stopped_while_waiting(self):
+        kernels = Kernels()
+        kernels.notifyLocked(0)
+
+        def stop():
+            kernels.run_gvt = False
+        timer = threading.Timer(0.1, stop)
+        timer.start()
+        # Kernel 1 never locks, e.g. because it died
+        self.assertEqual(kernels.waitMigrationLocks([(0, 1)], interval=0.01), [])
+        timer.join()
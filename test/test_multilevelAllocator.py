@@ -0,0 +1,98 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import Counter
+import random
+import unittest
+
+from pypdevs.allocators.multilevelAllocator import MultilevelAllocator
+
+class Model(object):
+    def __init__(self, model_id):
+        self.model_id = model_id
+
+def clusters(count, size):
+    """
+    Clusters of models in a ring, exchanging many messages within a cluster and few between neighbouring clusters
+    """
+    models = [Model(i) for i in range(count * size)]
+    edges = {}
+    for c in range(count):
+        members = models[c * size:(c + 1) * size]
+        for i, model in enumerate(members):
+            edges.setdefault(model, {})[members[(i + 1) % size]] = 100
+            edges[model][members[(i + 7) % size]] = 50
+        edges[members[0]][models[((c + 1) % count) * size]] = 1
+    return models, edges
+
+def cut(edges, allocation):
+    return sum([count for source in edges 
+                      for destination, count in edges[source].items()
+                      if allocation[source.model_id] != allocation[destination.model_id]])
+
+class TestMultilevelAllocator(unittest.TestCase):
+    def test_clusters_kept_together(self):
+        models, edges = clusters(4, 60)
+        allocation = MultilevelAllocator().allocate(models, edges, 4, {})
+        self.assertEqual(set(allocation), set(range(240)))
+        for c in range(4):
+            kernels = set([allocation[i] for i in range(c * 60, (c + 1) * 60)])
+            self.assertEqual(len(kernels), 1)
+        self.assertEqual(sorted(Counter(allocation.values()).values()), [60, 60, 60, 60])
+        self.assertEqual(cut(edges, allocation), 4)
+
+    def test_better_than_round_robin(self):
+        models, edges = clusters(8, 30)
+        allocation = MultilevelAllocator().allocate(models, edges, 3, {})
+        round_robin = {model.model_id: model.model_id % 3 for model in models}
+        self.assertLess(cut(edges, allocation), cut(edges, round_robin))
+        loads = Counter(allocation.values())
+        self.assertEqual(len(loads), 3)
+        self.assertLessEqual(max(loads.values()), 240 / 3.0 * 1.05 + 30)
+
+    def test_activities_balance_load(self):
+        models = [Model(i) for i in range(10)]
+        activities = {0: 90.0}
+        activities.update({i: 10.0 for i in range(1, 10)})
+        allocation = MultilevelAllocator().allocate(models, {}, 2, activities)
+        loads = Counter()
+        for model_id, kernel in allocation.items():
+            loads[kernel] += activities[model_id]
+        self.assertEqual(sorted(loads.values()), [90.0, 90.0])
+
+    def test_isolated_models(self):
+        # Nothing to match, so coarsening has to merge unconnected models to make progress
+        models = [Model(i) for i in range(20000)]
+        allocator = MultilevelAllocator()
+        _, (weights, _) = allocator.coarsen(([1] * 20000, [{} for _ in models]), 10000, random.Random(0))
+        self.assertEqual(len(weights), 10000)
+        allocation = allocator.allocate(models, {}, 4, {})
+        loads = Counter(allocation.values())
+        self.assertEqual(len(loads), 4)
+        self.assertLessEqual(max(loads.values()), 20000 / 4.0 * 1.05)
+
+    def test_single_kernel(self):
+        models, edges = clusters(2, 10)
+        allocation = MultilevelAllocator().allocate(models, edges, 1, {})
+        self.assertEqual(set(allocation.values()), set([0]))
+
+    def test_deterministic(self):
+        models, edges = clusters(5, 40)
+        first = MultilevelAllocator(seed=3).allocate(models, edges, 4, {})
+        second = MultilevelAllocator(seed=3).allocate(models, edges, 4, {})
+        self.assertEqual(first, second)
+
+    def test_termination_time(self):
+        self.assertEqual(MultilevelAllocator(termination_time=5.0).getTerminationTime(), 5.0)
@@ -0,0 +1,233 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import threading
+import unittest
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pypdevs.DEVS import CoupledDEVS
+from pypdevs.batchDEVS import BatchAtomicDEVS
+from pypdevs.parallelTransitions import TransitionPool
+from pypdevs.simulator import Simulator
+from pypdevs.util import DEVSException
+
+from models import Emitter, Collector, Chain
+
+class FanIn(CoupledDEVS):
+    """
+    Emitters sending at the same times to a single port, so the order of the messages in a bag matters
+    """
+    def __init__(self, size=6):
+        CoupledDEVS.__init__(self, "fanin")
+        self.collector = self.addSubModel(Collector("collector"))
+        self.emitters = []
+        for i in range(size):
+            emitter = self.addSubModel(Emitter("emitter%i" % i, [1.0, 2.0, 2.0 + i]))
+            self.connectPorts(emitter.out, self.collector.ports[0])
+            self.emitters.append(emitter)
+
+class Port(object):
+    pass
+
+class Counter(object):
+    """
+    Stand-in for an initialised atomic model
+    """
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.state = 0
+        self.IPorts = [Port()]
+        self.OPorts = [Port()]
+        self.time_last = (0.0, 1)
+        self.time_next = (1.0, 1)
+        self.my_input = {}
+
+    def getModelFullName(self):
+        return "counter%i" % self.model_id
+
+    def outputFnc(self):
+        return {self.OPorts[0]: [self.model_id, self.state]}
+
+    def intTransition(self):
+        if self.state < 0:
+            raise ValueError("broken")
+        return self.state + 1
+
+    def extTransition(self, inputs):
+        return self.state + sum(inputs[self.IPorts[0]])
+
+    def timeAdvance(self):
+        return 1.0
+
+class Level(BatchAtomicDEVS):
+    """
+    A batch model counting its internal transitions
+    """
+    state_fields = {"level": np.int64} if np is not None else {}
+
+    def __init__(self, name):
+        BatchAtomicDEVS.__init__(self, name)
+        self.state = {"level": 0}
+
+    @classmethod
+    def batchIntTransition(cls, rows):
+        cls.getBatchArrays()["level"][rows] += 1
+
+    @classmethod
+    def batchTimeAdvance(cls, rows):
+        return np.ones(len(rows))
+
+    def outputFnc(self):
+        return {}
+
+def states(models):
+    return [m.state for m in models]
+
+class TestTransitionPool(unittest.TestCase):
+    def setUp(self):
+        self.models = [Counter(i) for i in range(7)]
+        self.pool = TransitionPool(3)
+        self.pool.start(self.models)
+
+    def tearDown(self):
+        if self.pool.workers:
+            self.pool.stop()
+
+    def test_outputs_in_imminent_order(self):
+        imminent = [self.models[i] for i in (5, 0, 3, 1, 6)]
+        outputs = self.pool.outputs(imminent)
+        self.assertEqual([model for model, _ in outputs], imminent)
+        for model, bag in outputs:
+            self.assertEqual(bag, {model.OPorts[0]: [model.model_id, 0]})
+
+    def test_transitions(self):
+        model = self.models[2]
+        model.my_input = {model.IPorts[0]: [10, 5]}
+        self.pool.transition({self.models[0]: 1, model: 2}, (1.0, 1))
+        self.assertEqual(model.time_last, (1.0, 1))
+        self.assertEqual(model.time_next, (2.0, 1))
+        # The kernel only gets the states back when asked
+        self.assertEqual(states(self.models), [0] * 7)
+        self.pool.collectStates()
+        self.assertEqual(states(self.models), [1, 0, 15, 0, 0, 0, 0])
+
+    def test_error_in_worker(self):
+        broken = self.models[4]
+        # Break the copy in the worker through an external transition
+        broken.my_input = {broken.IPorts[0]: [-1]}
+        self.pool.transition({broken: 2}, (1.0, 1))
+        with self.assertRaises(DEVSException):
+            self.pool.transition({m: 1 for m in self.models}, (2.0, 1))
+        # The other workers still answer the next command correctly
+        self.pool.collectStates()
+        self.assertEqual(states(self.models)[:4], [1, 1, 1, 1])
+
+    def test_stop_releases_everything(self):
+        workers = list(self.pool.workers)
+        connections = list(self.pool.connections)
+        self.pool.stop()
+        for worker in workers:
+            self.assertFalse(worker.is_alive())
+        for connection in connections:
+            self.assertTrue(connection.closed)
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestSharedBatchStates(unittest.TestCase):
+    def test_states_in_shared_memory(self):
+        models = [Level("level%i" % i) for i in range(5)]
+        for model_id, model in enumerate(models):
+            model.model_id = model_id
+            model.time_last = (0.0, 1)
+            model.time_next = (1.0, 1)
+        pool = TransitionPool(2)
+        pool.start(models)
+        names = [memory.name for _, _, memory in pool.batch_memory]
+        try:
+            pool.transition({model: 1 for model in models[:3]}, (1.0, 1))
+            # Visible in the kernel without collecting the states
+            self.assertEqual([model.state["level"] for model in models], [1, 1, 1, 0, 0])
+        finally:
+            pool.stop()
+        self.assertEqual([model.state["level"] for model in models], [1, 1, 1, 0, 0])
+        # Back in private memory, and the shared memory is gone
+        self.assertTrue(Level.getBatchArrays()["level"].flags.owndata)
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+class TestLocalParallel(unittest.TestCase):
+    def simulate(self, model, processes):
+        sim = Simulator(model)
+        sim.setTerminationTime(20.0)
+        sim.controller.setLocalParallel(processes)
+        sim.simulate()
+        self.assertIsNone(sim.controller.parallel_pool)
+        self.assertEqual(multiprocessing.active_children(), [])
+        return sim
+
+    def test_same_as_serial(self):
+        for build in (FanIn, Chain):
+            serial = build()
+            self.simulate(serial, 0)
+            for processes in (2, 3):
+                parallel = build()
+                self.simulate(parallel, processes)
+                for model, expected in zip(parallel.component_set, serial.component_set):
+                    self.assertEqual(model.state, expected.state)
+
+    def test_message_order(self):
+        model = FanIn()
+        self.simulate(model, 3)
+        self.assertEqual(model.collector.state[0], (1.0, "inp", (0, 0, 0, 0, 0, 0)))
+
+    def test_refuses_other_threads(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        try:
+            sim = Simulator(Chain())
+            sim.setTerminationTime(20.0)
+            sim.controller.setLocalParallel(2)
+            with self.assertRaises(DEVSException):
+                sim.simulate()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_refuses_activity_tracking(self):
+        sim = Simulator(Chain())
+        sim.setTerminationTime(20.0)
+        sim.setActivityTracking(True)
+        sim.controller.setLocalParallel(2)
+        with self.assertRaises(DEVSException):
+            sim.simulate()
+
+    def test_refuses_memoization(self):
+        sim = Simulator(Chain())
+        sim.setTerminationTime(20.0)
+        sim.setMemoization(True)
+        sim.controller.setLocalParallel(2)
+        with self.assertRaises(DEVSException):
+            sim.simulate()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import pickle
+import unittest
+import weakref
+
+from pypdevs.periodicStates import CheckpointPolicy, LoggedState, snapshotInput
+
+class Saved(object):
+    def __init__(self, state):
+        self.state = state
+
+    def loadState(self):
+        return self.state
+
+class Port(object):
+    pass
+
+class Accumulator(object):
+    """
+    Adds up its input, consuming the received list in place
+    """
+    def __init__(self):
+        self.state = 0
+        self.elapsed = 0.0
+        self.port = Port()
+
+    def intTransition(self):
+        return self.state + 1
+
+    def extTransition(self, inputs):
+        messages = inputs[self.port]
+        total = self.state + sum(messages)
+        del messages[:]
+        return total
+
+class TestPeriodicStates(unittest.TestCase):
+    def run_transitions(self, model, policy, inputs):
+        """
+        Perform transitions like the solver does: log the input, transition and log the transition.
+        """
+        history = [Saved(model.state)]
+        for i, values in enumerate(inputs):
+            self.assertFalse(policy.needsCheckpoint(history[-1]))
+            if values is None:
+                logged = {}
+                model.state = model.intTransition()
+                ttype = 1
+            else:
+                my_input = {model.port: list(values)}
+                logged = snapshotInput(my_input)
+                model.state = model.extTransition(my_input)
+                ttype = 2
+            history.append(LoggedState((float(i), 1), (float(i + 1), 1), 0.0, logged,
+                                       1.0, ttype, model, history[-1], policy))
+        return history
+
+    def test_coast_forward_uses_input_before_transition(self):
+        model = Accumulator()
+        policy = CheckpointPolicy(interval=100)
+        history = self.run_transitions(model, policy, [None, [2, 3], None, [10]])
+        self.assertEqual(model.state, 17)
+        self.assertEqual([saved.loadState() for saved in history], [0, 1, 6, 7, 17])
+        # Coasting forward doesn't alter the logged input, so it can be repeated
+        self.assertEqual(history[-1].loadState(), 17)
+        # The model itself is restored after coasting forward
+        self.assertEqual(model.state, 17)
+
+    def test_rollbacks_counted_separately(self):
+        model = Accumulator()
+        policy = CheckpointPolicy(interval=100)
+        history = self.run_transitions(model, policy, [None, None, None])
+        history[-1].loadState()
+        history[-1].loadState()
+        self.assertEqual(policy.rollbacks, 0)
+        self.assertEqual(policy.coast_steps, 6)
+        policy.rolledBack()
+        self.assertEqual(policy.getStatistics()["rollbacks"], 1)
+
+    def test_checkpoint_interval(self):
+        policy = CheckpointPolicy(interval=3)
+        saved = None
+        decisions = []
+        for _ in range(7):
+            checkpoint = policy.needsCheckpoint(saved)
+            decisions.append(checkpoint)
+            distance = 0 if checkpoint else saved.coast_distance
+            saved = type("Saved", (object,), {"coast_distance": distance + 1 if not checkpoint else 0})()
+        self.assertEqual(decisions, [True, False, False, True, False, False, True])
+
+    def test_adaptive_interval(self):
+        policy = CheckpointPolicy(interval=8, adaptive=True, min_interval=2, max_interval=32, window=10)
+        for _ in range(10):
+            policy.needsCheckpoint(None)
+        self.assertEqual(policy.interval, 16)
+        for _ in range(5):
+            policy.rolledBack()
+        for _ in range(10):
+            policy.needsCheckpoint(None)
+        self.assertEqual(policy.interval, 2)
+
+    def test_model_not_kept_alive(self):
+        model = Accumulator()
+        policy = CheckpointPolicy(interval=100)
+        history = self.run_transitions(model, policy, [None, [4]])
+        other = Accumulator()
+        other.port = model.port
+        reference = weakref.ref(model)
+        del model
+        gc.collect()
+        self.assertIsNone(reference())
+        # The model can still be passed explicitly
+        self.assertEqual(history[-1].loadState(other), 5)
+
+    def test_pickle_with_model(self):
+        model = Accumulator()
+        policy = CheckpointPolicy(interval=100)
+        history = self.run_transitions(model, policy, [None, [4]])
+        model.history = history
+        copied = pickle.loads(pickle.dumps(model))
+        self.assertIs(copied.history[-1].model(), copied)
+        self.assertEqual(copied.history[-1].loadState(), 5)
@@ -0,0 +1,100 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.relocators.predictiveRelocator import PredictiveRelocator
+
+class Model(object):
+    def __init__(self, model_id, location, relocatable=True):
+        self.model_id = model_id
+        self.location = location
+        self.relocatable = relocatable
+
+class Controller(object):
+    def __init__(self, locations, kernels):
+        self.kernels = kernels
+        self.model_ids = [Model(model_id, location) for model_id, location in enumerate(locations)]
+
+def relocator(controller, **kwargs):
+    relocator = PredictiveRelocator(**kwargs)
+    relocator.setController(controller)
+    return relocator
+
+def migrate(controller, relocations):
+    for model_id, location in relocations.items():
+        controller.model_ids[model_id].location = location
+
+class TestPredictiveRelocator(unittest.TestCase):
+    def test_predict(self):
+        r = PredictiveRelocator()
+        self.assertEqual(r.predict([]), 0.0)
+        self.assertEqual(r.predict([4.0]), 4.0)
+        self.assertAlmostEqual(r.predict([1.0, 2.0, 3.0]), 4.0)
+        self.assertAlmostEqual(r.predict([5.0, 5.0, 5.0]), 5.0)
+        # Never predict a negative load
+        self.assertEqual(r.predict([6.0, 3.0, 0.0]), 0.0)
+
+    def test_balances_predicted_load(self):
+        controller = Controller([0, 0, 0, 0], 2)
+        r = relocator(controller)
+        relocations = r.getRelocations(10.0, {0: 10, 1: 10, 2: 10, 3: 10}, 10.0)
+        self.assertEqual(len(relocations), 2)
+        self.assertEqual(set(relocations.values()), set([1]))
+
+    def test_follows_trend(self):
+        # The current load is balanced, but the models on kernel 0 are getting busier
+        history = [{0: 1, 1: 1, 2: 1, 3: 1, 4: 8},
+                   {0: 2, 1: 2, 2: 2, 3: 2, 4: 8}]
+        controller = Controller([0, 0, 0, 0, 1], 2)
+        r = relocator(controller, window=3)
+        self.assertEqual(r.getRelocations(0.0, history[0], 1.0), {})
+        self.assertEqual(list(r.getRelocations(0.0, history[1], 1.0).values()), [1])
+
+        controller = Controller([0, 0, 0, 0, 1], 2)
+        r = relocator(controller, window=1)
+        self.assertEqual(r.getRelocations(0.0, history[0], 1.0), {})
+        self.assertEqual(r.getRelocations(0.0, history[1], 1.0), {})
+
+    def test_migration_cost(self):
+        controller = Controller([0, 0, 1], 2)
+        activities = {0: 10, 1: 3, 2: 5}
+        self.assertEqual(relocator(controller, migration_cost=2.0).getRelocations(0.0, activities, 1.0), {1: 1})
+        self.assertEqual(relocator(controller, migration_cost=4.0).getRelocations(0.0, activities, 1.0), {})
+
+    def test_not_relocatable(self):
+        controller = Controller([0, 0, 1], 2)
+        controller.model_ids[1].relocatable = False
+        self.assertEqual(relocator(controller).getRelocations(0.0, {0: 10, 1: 3, 2: 5}, 1.0), {})
+
+    def test_max_moves(self):
+        controller = Controller([0] * 6, 3)
+        r = relocator(controller, max_moves=1)
+        self.assertEqual(len(r.getRelocations(0.0, dict.fromkeys(range(6), 1), 1.0)), 1)
+
+    def test_cooldown_prevents_oscillation(self):
+        controller = Controller([0, 0, 1], 2)
+        controller.model_ids[2].relocatable = False
+        r = relocator(controller, window=1, cooldown=3)
+        migrate(controller, r.getRelocations(0.0, {0: 10, 1: 3, 2: 5}, 1.0))
+        self.assertEqual(controller.model_ids[1].location, 1)
+        # The load shifts, so moving model 1 back would help, but it was moved too recently
+        self.assertEqual(r.getRelocations(0.0, {0: 1, 1: 3, 2: 10}, 1.0), {})
+        self.assertEqual(r.getRelocations(0.0, {0: 1, 1: 3, 2: 10}, 1.0), {})
+        self.assertEqual(r.getRelocations(0.0, {0: 1, 1: 3, 2: 10}, 1.0), {1: 0})
+        self.assertEqual(r.getStatistics(), {"rounds": 4, "moves": 2, "refused": 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import tempfile
+import time
+import unittest
+
+from pypdevs.periodicStates import CheckpointPolicy, LoggedState
+from pypdevs.profiler import (ProfiledFunction, instrument, chargeBatch, collect, 
+                              summarize, writeFolded)
+
+class Named(object):
+    def __init__(self, name):
+        self.name = name
+
+    def getModelName(self):
+        return self.name
+
+class Saved(object):
+    def __init__(self, state):
+        self.state = state
+
+    def loadState(self):
+        return self.state
+
+class Counter(Named):
+    """
+    Counts its internal transitions, calling its (sleeping) output function from the transition
+    """
+    def __init__(self, name="counter"):
+        Named.__init__(self, name)
+        self.state = 0
+        self.elapsed = 0.0
+        self.select_hierarchy = [Named("root"), self]
+
+    def outputFnc(self):
+        time.sleep(0.01)
+        return {}
+
+    def intTransition(self):
+        self.outputFnc()
+        return self.state + 1
+
+    def extTransition(self, inputs):
+        return self.state
+
+    def confTransition(self, inputs):
+        return self.state
+
+    def timeAdvance(self):
+        return 1.0
+
+class TestProfiler(unittest.TestCase):
+    def test_counts_and_nested_time(self):
+        model = Counter()
+        instrument(model)
+        self.assertIsInstance(model.__dict__["intTransition"], ProfiledFunction)
+        # Instrumenting twice doesn't profile twice
+        instrument(model)
+        self.assertEqual(model.intTransition(), 1)
+        model.timeAdvance()
+        records = {record[2]: record for record in collect([model])}
+        self.assertEqual(sorted(records), ["intTransition", "outputFnc", "timeAdvance"])
+        names, cls, _, calls, total, own = records["intTransition"]
+        self.assertEqual((names, cls, calls), (("root", "counter"), "Counter", 1))
+        # The nested output function is excluded from the own time
+        self.assertGreaterEqual(total, 0.01)
+        self.assertLess(own, 0.01)
+        self.assertGreaterEqual(records["outputFnc"][5], 0.01)
+
+    def test_not_instrumented(self):
+        model = Counter()
+        model.intTransition()
+        self.assertEqual(collect([model]), [])
+
+    def test_picklable(self):
+        model = Counter()
+        instrument(model)
+        model.intTransition()
+        copied = pickle.loads(pickle.dumps(model))
+        self.assertEqual(copied.intTransition(), 1)
+        self.assertEqual(copied.__dict__["intTransition"].calls, 2)
+
+    def test_batched_calls(self):
+        models = [Counter("counter%i" % i) for i in range(4)]
+        for model in models[:3]:
+            instrument(model)
+        chargeBatch(models, "intTransition", 2.0)
+        records = collect(models)
+        self.assertEqual(len(records), 3)
+        for record in records:
+            self.assertEqual(record[3:], (1, 0.5, 0.5))
+
+    def test_replays_not_counted(self):
+        model = Counter()
+        instrument(model)
+        policy = CheckpointPolicy(interval=100)
+        saved = Saved(0)
+        for i in range(3):
+            model.state = model.intTransition()
+            saved = LoggedState((float(i), 1), (float(i + 1), 1), 0.0, {}, 1.0, 1, model, saved, policy)
+        self.assertEqual(saved.loadState(), 3)
+        self.assertEqual(model.__dict__["intTransition"].calls, 3)
+
+    def test_summaries(self):
+        records = [(("root", "a"), "A", "intTransition", 2, 3.0, 2.0),
+                   (("root", "a"), "A", "outputFnc", 1, 1.0, 1.0),
+                   (("root", "b"), "A", "intTransition", 4, 5.0, 5.0)]
+        self.assertEqual(summarize(records, lambda r: r[2]), 
+                         [("intTransition", 6, 7.0), ("outputFnc", 1, 1.0)])
+        self.assertEqual(summarize(records, lambda r: r[1]), [("A", 7, 8.0)])
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            writeFolded(records, filename)
+            with open(filename, 'r') as f:
+                self.assertEqual(f.read().splitlines(), 
+                                 ["root;a;intTransition 2000000",
+                                  "root;a;outputFnc 1000000",
+                                  "root;b;intTransition 5000000"])
+        finally:
+            os.remove(filename)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.DEVS import CoupledDEVS
+from pypdevs.simulator import Simulator
+
+from models import Emitter, Collector
+
+def addHundred(m):
+    return m + 100
+
+def double(m):
+    return m * 2
+
+class Inner(CoupledDEVS):
+    def __init__(self):
+        CoupledDEVS.__init__(self, "inner")
+        self.inp = self.addInPort("inp")
+        self.plain = self.addSubModel(Collector("plain"))
+        self.doubled = self.addSubModel(Collector("doubled"))
+        self.connectPorts(self.inp, self.plain.ports[0])
+        self.connectPorts(self.inp, self.doubled.ports[0], double)
+
+class Root(CoupledDEVS):
+    def __init__(self):
+        CoupledDEVS.__init__(self, "root")
+        self.first = self.addSubModel(Emitter("first", [1.0, 2.0]))
+        self.second = self.addSubModel(Emitter("second", [2.0]))
+        self.inner = self.addSubModel(Inner())
+        self.direct = self.addSubModel(Collector("direct", ("inp", "other")))
+        self.connectPorts(self.first.out, self.inner.inp, addHundred)
+        self.connectPorts(self.first.out, self.direct.ports[0])
+        self.connectPorts(self.second.out, self.direct.ports[0])
+        self.connectPorts(self.second.out, self.direct.ports[1], addHundred)
+
+class TestRouting(unittest.TestCase):
+    def test_routing(self):
+        # The expected inputs follow the connections through the coupled models by hand
+        model = Root()
+        sim = Simulator(model)
+        sim.setTerminationTime(10.0)
+        sim.simulate()
+        self.assertEqual(model.inner.plain.state, ((1.0, "inp", (100,)),
+                                                   (2.0, "inp", (101,))))
+        self.assertEqual(model.inner.doubled.state, ((1.0, "inp", (200,)),
+                                                     (2.0, "inp", (202,))))
+        direct = model.direct.state
+        self.assertEqual(direct[0], (1.0, "inp", (0,)))
+        # Both emitters send to the same port at time 2, so the bag contains both messages
+        self.assertEqual(direct[1][:2], (2.0, "inp"))
+        self.assertEqual(sorted(direct[1][2]), [0, 1])
+        self.assertEqual(direct[2], (2.0, "other", (100,)))
+        self.assertEqual(len(direct), 3)
+
+    def test_routing_tables_match_connections(self):
+        model = Root()
+        sim = Simulator(model)
+        sim.setTerminationTime(10.0)
+        sim.simulate()
+        controller = sim.controller
+        for aDEVS in controller.model.component_set:
+            for outport in aDEVS.OPorts:
+                local, remote = controller.compileRouting(outport)
+                self.assertEqual(remote, [])
+                self.assertEqual(sorted([(inport.getPortFullName(), z is None) 
+                                         for inport, z, _, _ in local]),
+                                 sorted([(inport.getPortFullName(), z is None) 
+                                         for inport, z in outport.routing_outline]))
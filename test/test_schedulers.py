@@ -0,0 +1,121 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import unittest
+
+from pypdevs.schedulers.schedulerCalendar import SchedulerCalendar
+from pypdevs.schedulers.schedulerAuto import SchedulerAuto
+
+EPSILON = 1e-6
+INFINITY = float('inf')
+
+class Model(object):
+    def __init__(self, model_id, time_next):
+        self.model_id = model_id
+        self.time_last = (0.0, 1)
+        self.time_next = time_next
+
+def referenceFirst(models):
+    """
+    The first time of all scheduled models, by searching all of them
+    """
+    return min([model.time_next for model in models] + [(INFINITY, 1)])
+
+def referenceImminent(models, time):
+    return set([model for model in models 
+                      if abs(model.time_next[0] - time[0]) < EPSILON and model.time_next[1] == time[1]])
+
+class TestSchedulers(unittest.TestCase):
+    def simulate(self, scheduler_class, models, steps, time_advance, seed=1):
+        """
+        Simulate the scheduling of models like the solver does, checking every step against a search over all models.
+        Every step, the imminent models and a few random other models get a new time advance.
+
+        :returns: the scheduler
+        """
+        rng = random.Random(seed)
+        scheduler = scheduler_class(models, EPSILON, len(models))
+        for _ in range(steps):
+            first = scheduler.readFirst()
+            self.assertEqual(first, referenceFirst(models))
+            if first[0] == INFINITY:
+                break
+            expected = referenceImminent(models, first)
+            imminent = scheduler.getImminent(first)
+            self.assertEqual(len(imminent), len(expected))
+            self.assertEqual(set(imminent), expected)
+            others = rng.sample(models, min(3, len(models)))
+            changed = set(imminent) | set(others)
+            for model in changed:
+                t = first[0] if model in expected else model.time_last[0]
+                ta = time_advance(rng)
+                model.time_last = first if model in expected else model.time_last
+                if ta == 0:
+                    model.time_next = (t, first[1] + 1)
+                else:
+                    model.time_next = (t + ta, 1)
+            scheduler.massReschedule(changed)
+        return scheduler
+
+    def test_calendar_ties(self):
+        # Integer time advances, so many models transition at the same time
+        models = [Model(i, (float(i % 7), 1)) for i in range(200)]
+        self.simulate(SchedulerCalendar, models, 500, lambda rng: float(rng.randint(1, 10)))
+
+    def test_calendar_spread(self):
+        models = [Model(i, (random.Random(i).random() * 100, 1)) for i in range(500)]
+        scheduler = self.simulate(SchedulerCalendar, models, 1000, lambda rng: rng.expovariate(0.1))
+        self.assertGreater(scheduler.getStatistics()["resizes"], 1)
+
+    def test_calendar_zero_and_infinite(self):
+        models = [Model(i, (0.0, 1)) for i in range(50)]
+        advances = [0.0, INFINITY, 1.0, 2.5, 1000.0]
+        self.simulate(SchedulerCalendar, models, 500, lambda rng: rng.choice(advances))
+
+    def test_calendar_unschedule(self):
+        models = [Model(i, (float(i), 1)) for i in range(20)]
+        scheduler = SchedulerCalendar(models, EPSILON, len(models))
+        for model in models[:10]:
+            scheduler.unschedule(model)
+        self.assertEqual(scheduler.readFirst(), (10.0, 1))
+        new = Model(20, (5.0, 1))
+        scheduler.schedule(new)
+        self.assertEqual(scheduler.readFirst(), (5.0, 1))
+        self.assertEqual(scheduler.getImminent((5.0, 1)), [new])
+        self.assertEqual(scheduler.getStatistics()["events"], 10)
+
+    def test_auto_few_models(self):
+        models = [Model(i, (float(i), 1)) for i in range(10)]
+        scheduler = self.simulate(SchedulerAuto, models, 300, lambda rng: float(rng.randint(1, 5)))
+        statistics = scheduler.getStatistics()
+        self.assertEqual(statistics["scheduler"], "SchedulerSL")
+        self.assertEqual(statistics["reason"], "few models")
+
+    def test_auto_calendar(self):
+        models = [Model(i, (random.Random(i).random() * 100, 1)) for i in range(2000)]
+        scheduler = self.simulate(SchedulerAuto, models, 300, lambda rng: rng.uniform(50, 150))
+        statistics = scheduler.getStatistics()
+        self.assertEqual(statistics["scheduler"], "SchedulerCalendar")
+        self.assertEqual(statistics["steps"], SchedulerAuto.SAMPLE_STEPS)
+        self.assertIn("scheduler_statistics", statistics)
+
+    def test_auto_undecided(self):
+        models = [Model(i, (float(i), 1)) for i in range(10)]
+        scheduler = self.simulate(SchedulerAuto, models, 10, lambda rng: 1.0)
+        self.assertEqual(scheduler.getStatistics(), {"scheduler": None, "steps": 10})
+
+if __name__ == '__main__':
+    unittest.main()
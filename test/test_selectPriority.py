@@ -0,0 +1,89 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.DEVS import CoupledDEVS
+from pypdevs.simulator import Simulator
+
+from models import Emitter, Collector
+
+def highestName(models):
+    return max(models, key=lambda m: m.getModelName())
+
+class Nested(CoupledDEVS):
+    def __init__(self):
+        CoupledDEVS.__init__(self, "nested")
+        self.gamma = self.addSubModel(Emitter("gamma", [2.0, 3.0], classic=True))
+        self.out = self.addOutPort("out")
+        self.connectPorts(self.gamma.out, self.out)
+        self.select_order = [self.gamma]
+
+    def select(self, imm):
+        return highestName(imm)
+
+class Colliding(CoupledDEVS):
+    """
+    Emitters that collide at every time step, selected by the highest name first
+    """
+    def __init__(self):
+        CoupledDEVS.__init__(self, "colliding")
+        self.alpha = self.addSubModel(Emitter("alpha", [1.0, 2.0, 3.0], classic=True))
+        self.beta = self.addSubModel(Emitter("beta", [1.0, 2.0, 3.0], classic=True))
+        self.nested = self.addSubModel(Nested())
+        self.sink = self.addSubModel(Collector("sink", ("alpha", "beta", "gamma")))
+        self.connectPorts(self.alpha.out, self.sink.ports[0])
+        self.connectPorts(self.beta.out, self.sink.ports[1])
+        self.connectPorts(self.nested.out, self.sink.ports[2])
+        self.select_order = sorted(self.component_set, 
+                                   key=lambda m: m.getModelName(), 
+                                   reverse=True)
+
+    def select(self, imm):
+        return highestName(imm)
+
+EXPECTED = ((1.0, "beta", (0,)), (1.0, "alpha", (0,)),
+            (2.0, "gamma", (0,)), (2.0, "beta", (1,)), (2.0, "alpha", (1,)),
+            (3.0, "gamma", (1,)), (3.0, "beta", (2,)), (3.0, "alpha", (2,)))
+
+class TestSelectPriority(unittest.TestCase):
+    def simulate(self, static):
+        model = Colliding()
+        if not static:
+            del model.select_order
+            del model.nested.select_order
+        sim = Simulator(model)
+        sim.setClassicDEVS()
+        sim.setTerminationTime(10.0)
+        sim.simulate()
+        return model
+
+    def test_static_order(self):
+        self.assertEqual(self.simulate(True).sink.state, EXPECTED)
+
+    def test_select_function(self):
+        self.assertEqual(self.simulate(False).sink.state, EXPECTED)
+
+    def test_partial_static_order(self):
+        # A single level without static order falls back to calling select everywhere
+        model = Colliding()
+        del model.nested.select_order
+        sim = Simulator(model)
+        sim.setClassicDEVS()
+        sim.setTerminationTime(10.0)
+        sim.simulate()
+        self.assertEqual(model.sink.state, EXPECTED)
+        self.assertIsNone(model.nested.gamma.select_priority)
+        self.assertIsNotNone(model.alpha.select_priority)
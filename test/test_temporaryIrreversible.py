@@ -0,0 +1,105 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.controller import Controller
+
+class Port(object):
+    def __init__(self, host):
+        self.host_DEVS = host
+        self.routing_outline = []
+
+class Model(object):
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.inport = Port(self)
+        self.outport = Port(self)
+        self.OPorts = [self.outport]
+
+class Relocator(object):
+    def __init__(self, last_state_only=False):
+        self.last_state_only = last_state_only
+
+    def useLastStateOnly(self):
+        return self.last_state_only
+
+class Proxy(object):
+    def __init__(self):
+        self.irreversible = False
+
+    def setIrreversible(self):
+        self.irreversible = True
+
+class Kernels(object):
+    """
+    The attributes of the controller used to find the irreversible kernels
+    """
+    def __init__(self, destinations, connections, use_DSDEVS=False):
+        self.destinations = destinations
+        self.model_ids = [Model(i) for i in range(len(destinations))]
+        for source, destination in connections:
+            self.model_ids[source].outport.routing_outline.append((self.model_ids[destination].inport, None))
+        self.proxies = {}
+        self.relocator = Relocator()
+        self.use_DSDEVS = use_DSDEVS
+        self.running_irreversible = set()
+
+    def getProxy(self, kernel):
+        return self.proxies.setdefault(kernel, Proxy())
+
+    def check(self):
+        Controller.checkForTemporaryIrreversible(self)
+        return sorted([kernel for kernel, proxy in self.proxies.items() if proxy.irreversible])
+
+class TestTemporaryIrreversible(unittest.TestCase):
+    def test_single_kernel(self):
+        kernels = Kernels([1, 1, 1], [(0, 1), (1, 2), (2, 0)])
+        self.assertEqual(kernels.check(), [1])
+        self.assertEqual(kernels.running_irreversible, set([1]))
+
+    def test_local_models_are_kernel_0(self):
+        # Models on the controller's own kernel are stored as the local model instead of a kernel number
+        kernels = Kernels([object(), object()], [(0, 1)])
+        self.assertEqual(kernels.check(), [0])
+
+    def test_sources(self):
+        # Kernel 0 only sends to kernel 1, which sends to kernel 2; kernel 3 communicates within itself
+        kernels = Kernels([0, 0, 1, 2, 3, 3], [(0, 1), (1, 2), (2, 3), (4, 5), (5, 4)])
+        self.assertEqual(kernels.check(), [0, 3])
+
+    def test_cycle(self):
+        kernels = Kernels([0, 1], [(0, 1), (1, 0)])
+        self.assertEqual(kernels.check(), [])
+
+    def test_removed_models(self):
+        kernels = Kernels([0, None, 1], [(0, 2)])
+        kernels.model_ids[1] = None
+        self.assertEqual(kernels.check(), [0])
+
+    def test_dynamic_structure(self):
+        # Connections may be added later, so only a single kernel hosting everything is safe
+        kernels = Kernels([0, 0, 1], [(0, 2)], use_DSDEVS=True)
+        self.assertEqual(kernels.check(), [])
+        kernels = Kernels([1, 1], [(0, 1)], use_DSDEVS=True)
+        self.assertEqual(kernels.check(), [1])
+
+    def test_last_state_only(self):
+        kernels = Kernels([0, 0], [(0, 1)])
+        kernels.relocator = Relocator(last_state_only=True)
+        self.assertEqual(kernels.check(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+from pypdevs.DEVS import AtomicDEVS, CoupledDEVS
+from pypdevs.infinity import INFINITY
+from pypdevs.simulator import Simulator
+from pypdevs.tracers.tracerBuffered import TracerBuffered
+
+from models import Emitter, traceOf
+
+class Record(object):
+    """
+    A state with a nested list that is changed in place
+    """
+    def __init__(self):
+        self.seen = []
+
+    def __str__(self):
+        return "Record(%s)" % self.seen
+
+class Accumulator(AtomicDEVS):
+    def __init__(self, name):
+        AtomicDEVS.__init__(self, name)
+        self.state = Record()
+        self.inp = self.addInPort("inp")
+
+    def extTransition(self, inputs):
+        self.state.seen.extend(inputs[self.inp])
+        return self.state
+
+    def timeAdvance(self):
+        return INFINITY
+
+class Accumulating(CoupledDEVS):
+    def __init__(self):
+        CoupledDEVS.__init__(self, "accumulating")
+        emitter = self.addSubModel(Emitter("emitter", [1.0, 2.0, 3.0]))
+        accumulator = self.addSubModel(Accumulator("accumulator"))
+        self.connectPorts(emitter.out, accumulator.inp)
+
+class Port(object):
+    def __init__(self, name):
+        self.name = name
+
+    def getPortName(self):
+        return self.name
+
+class Model(object):
+    def __init__(self):
+        self.IPorts = [Port("inp")]
+        self.OPorts = []
+        self.state = Record()
+        self.time_last = (1.0, 1)
+        self.time_next = (INFINITY, 1)
+        self.my_input = {self.IPorts[0]: [[1]]}
+
+    def getModelFullName(self):
+        return "model"
+
+def bufferedTraceOf(sim):
+    """
+    Run a simulation with the buffered tracer and return the trace.
+    """
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        sim.setCustomTracer("pypdevs.tracers.tracerBuffered", "TracerBuffered", [filename])
+        sim.simulate()
+        with open(filename, 'r') as f:
+            return f.read()
+    finally:
+        os.remove(filename)
+
+class TestTracerBuffered(unittest.TestCase):
+    def test_same_trace_as_verbose(self):
+        sim = Simulator(Accumulating())
+        sim.setTerminationTime(10.0)
+        expected = traceOf(sim)
+        sim = Simulator(Accumulating())
+        sim.setTerminationTime(10.0)
+        self.assertEqual(bufferedTraceOf(sim), expected)
+        self.assertIn("New State: Record([0, 1, 2])", expected)
+
+    def test_strings_taken_when_traced(self):
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            tracer = TracerBuffered(0, None, filename)
+            tracer.startTracer(False)
+            model = Model()
+            tracer.traceExternal(model)
+            # Changed in place after the transition, before the event is formatted
+            model.state.seen.append(2)
+            model.my_input[model.IPorts[0]][0].append(3)
+            tracer.stopTracer()
+            with open(filename, 'r') as f:
+                trace = f.read()
+        finally:
+            os.remove(filename)
+        self.assertIn("New State: Record([])", trace)
+        self.assertIn("\t\t\t\t[1]\n", trace)
+
+if __name__ == '__main__':
+    unittest.main()
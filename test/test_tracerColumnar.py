@@ -0,0 +1,181 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from pypdevs.tracers.tracerColumnar import (TracerColumnar, ColumnarTraceReader, MAGIC, BLOCK, 
+                                            EVENTS, EVENTS_HEADER, INIT, INTERNAL, USER, np)
+
+class Port(object):
+    def __init__(self, name):
+        self.name = name
+
+    def getPortName(self):
+        return self.name
+
+class Model(object):
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.state = 0
+        self.IPorts = []
+        self.OPorts = [Port("out")]
+        self.my_output = {}
+
+    def getModelFullName(self):
+        return "root.model%i" % self.model_id
+
+def portValues(state):
+    return str([("out", [str(state)])])
+
+class TestTracerColumnar(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "trace.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, steps, models=3, stop=True, **kwargs):
+        """
+        Trace the initialisation of some models, followed by internal transitions at times 1 .. steps,
+        where model i has state time * 10 + i.
+
+        :returns: list -- the expected events
+        """
+        tracer = TracerColumnar(0, None, self.filename, **kwargs)
+        tracer.startTracer(False)
+        expected = []
+        models = [Model(i) for i in range(models)]
+        for model in models:
+            tracer.traceInit(model, (0.0, 1))
+            expected.append((0.0, 1, model.getModelFullName(), INIT, "0", None))
+        for time in range(1, steps + 1):
+            for model in models:
+                model.state = time * 10 + model.model_id
+                model.time_last = (float(time), 1)
+                model.my_output = {model.OPorts[0]: [model.state]}
+                tracer.traceInternal(model)
+                expected.append((float(time), 1, model.getModelFullName(), INTERNAL, 
+                                 str(model.state), portValues(model.state)))
+        tracer.traceUser((float(steps), 2), models[0], "state", 5)
+        expected.append((float(steps), 2, "root.model0", USER, None, "state=5"))
+        if stop:
+            tracer.stopTracer()
+        else:
+            # Simulation crashed, so only what was written so far is in the file
+            tracer.trace_file.flush()
+        self.tracer = tracer
+        return expected
+
+    def read(self):
+        reader = ColumnarTraceReader(self.filename)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_round_trip(self):
+        expected = self.write(10, chunk_size=7)
+        reader = self.read()
+        self.assertTrue(reader.complete)
+        self.assertEqual(list(reader.events()), expected)
+        self.assertEqual(reader.model_names, {0: "root.model0", 1: "root.model1", 2: "root.model2"})
+
+    def test_reused_model_id(self):
+        tracer = TracerColumnar(0, None, self.filename)
+        tracer.startTracer(False)
+        removed = Model(0)
+        tracer.traceInit(removed, (0.0, 1))
+        # A new model that got the ID of a removed one
+        new = Model(0)
+        new.getModelFullName = lambda: "root.new"
+        tracer.traceInit(new, (1.0, 1))
+        tracer.stopTracer()
+        reader = self.read()
+        self.assertEqual([e[2] for e in reader.events()], ["root.model0", "root.new"])
+
+    def test_filters(self):
+        expected = self.write(10, chunk_size=4)
+        reader = self.read()
+        self.assertEqual(list(reader.events(models=["root.model1"])), 
+                         [e for e in expected if e[2] == "root.model1"])
+        self.assertEqual(list(reader.events(models=[2], start=3.0, end=4.0)), 
+                         [e for e in expected if e[2] == "root.model2" and 3.0 <= e[0] <= 4.0])
+        # Only the chunks overlapping with the window are read
+        self.assertEqual(len(reader.selectChunks(None, 3.0, 4.0)), 2)
+        self.assertEqual(len(reader.index["events"]), 9)
+        replayed = []
+        reader.replay(lambda *event: replayed.append(event), start=10.0)
+        self.assertEqual(replayed, [e for e in expected if e[0] == 10.0])
+
+    def test_bounded_interning(self):
+        expected = self.write(20, chunk_size=5, intern_size=4)
+        self.assertEqual(len(self.tracer.values), 4)
+        reader = ColumnarTraceReader(self.filename, value_cache=2)
+        self.addCleanup(reader.close)
+        self.assertEqual(list(reader.events()), expected)
+        self.assertLessEqual(len(reader.value_chunks), 2)
+        self.assertGreater(len(reader.index["values"]), 2)
+
+    def test_recover_after_crash(self):
+        expected = self.write(10, chunk_size=6, stop=False)
+        reader = ColumnarTraceReader(self.filename)
+        self.assertFalse(reader.complete)
+        self.assertEqual(list(reader.events()), expected[:30])
+        last = reader.index["events"][-1][0]
+        reader.close()
+        # Cut off in the middle of the last chunk of events
+        with open(self.filename, 'r+b') as f:
+            f.truncate(last + 20)
+        reader = self.read()
+        self.assertEqual(list(reader.events()), expected[:24])
+
+    def test_little_endian(self):
+        self.write(1)
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        offset = len(MAGIC)
+        while True:
+            kind, size = BLOCK.unpack_from(data, offset)
+            if kind == EVENTS:
+                break
+            offset += BLOCK.size + size
+        count, start, end, model_count = EVENTS_HEADER.unpack_from(data, offset + BLOCK.size)
+        self.assertEqual((count, start, end, model_count), (7, 0.0, 1.0, 3))
+        columns = offset + BLOCK.size + EVENTS_HEADER.size + 4 * model_count
+        self.assertEqual(struct.unpack_from("<4d", data, columns)[3], 1.0)
+
+    def test_not_a_trace(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b"something else")
+        with self.assertRaises(ValueError):
+            ColumnarTraceReader(self.filename)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy(self):
+        expected = self.write(10, chunk_size=4)
+        reader = self.read()
+        columns = reader.toNumpy(models=[1], start=2.0)
+        expected = [e for e in expected if e[2] == "root.model1" and e[0] >= 2.0]
+        self.assertEqual(list(columns["time"]), [e[0] for e in expected])
+        self.assertEqual(list(columns["age"]), [e[1] for e in expected])
+        self.assertEqual(list(columns["type"]), [e[3] for e in expected])
+        self.assertEqual([reader.value(v) for v in columns["state"]], [e[4] for e in expected])
+        self.assertEqual([reader.value(v) for v in columns["ports"]], [e[5] for e in expected])
+
+if __name__ == '__main__':
+    unittest.main()
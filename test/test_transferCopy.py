@@ -0,0 +1,66 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from pypdevs.messageFreezer import freeze
+from pypdevs.transferCopy import (TransferFunction, resolveTransfer, autoCopy,
+                                  COPY_NONE, COPY_DEEP, COPY_AUTO)
+from pypdevs.util import DEVSException
+
+class Message(object):
+    def __init__(self, values):
+        self.values = values
+
+def append(msg):
+    msg.values.append(1)
+    return msg
+
+class TestTransferCopy(unittest.TestCase):
+    def test_declared_policy(self):
+        z, copier = resolveTransfer(TransferFunction(append, COPY_NONE), 0)
+        self.assertIs(z, append)
+        self.assertIsNone(copier)
+        z, copier = resolveTransfer(TransferFunction(append, COPY_DEEP), 0)
+        msg = Message([])
+        self.assertEqual(z(copier(msg)).values, [1])
+        self.assertEqual(msg.values, [])
+
+    def test_undeclared_policy(self):
+        z, copier = resolveTransfer(append, 0)
+        self.assertIs(z, append)
+        self.assertIs(copier, autoCopy)
+        msg = Message([])
+        z(copier(msg))
+        self.assertEqual(msg.values, [])
+
+    def test_frozen_messages(self):
+        _, copier = resolveTransfer(append, 3)
+        self.assertIsNone(copier)
+        _, copier = resolveTransfer(TransferFunction(append, COPY_DEEP), 3)
+        self.assertIsNotNone(copier)
+
+    def test_auto_copy(self):
+        frozen = freeze({"a": [1]})
+        for msg in (1, "a", (1, "b"), frozen):
+            self.assertIs(autoCopy(msg), msg)
+        for msg in ([1], (1, [2]), Message([1]), {"a": 1}):
+            copied = autoCopy(msg)
+            self.assertIsNot(copied, msg)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(DEVSException):
+            TransferFunction(append, "unknown")
+        self.assertEqual(TransferFunction(append).copy_policy, COPY_AUTO)
@@ -0,0 +1,230 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Verbose tracer that records events in a buffer and formats and writes them in a background thread
+"""
+
+import sys
+import threading
+from collections import deque
+
+INIT = 0
+INTERNAL = 1
+EXTERNAL = 2
+CONFLUENT = 3
+USER = 4
+
+class TracerBuffered(object):
+    """
+    A tracer with the same output as the verbose tracer, but which only appends a compact tuple to a
+    buffer during simulation. A background thread fills in the template of the events and writes them
+    in batches. The string of the state and of every message is taken when the event is recorded,
+    as the model may still change its state in place afterwards.
+
+    Only meant for local simulation, where traces are never rolled back. Enable it with:
+
+        sim.setCustomTracer("pypdevs.tracers.tracerBuffered", "TracerBuffered", [filename])
+    """
+    def __init__(self, uid, server, filename, batch_size=4096, capacity=1000000):
+        """
+        Constructor
+
+        :param uid: the UID of this tracer
+        :param server: the server to make remote calls on
+        :param filename: file to save the trace to, can be None for output to stdout
+        :param batch_size: the number of buffered events after which the writer is woken up
+        :param capacity: the maximal number of buffered events, after which the simulation formats events itself
+        """
+        self.server = server
+        self.uid = uid
+        self.filename = filename
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.buffer = deque()
+        self.write_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.writer = None
+        self.running = False
+        self.prevtime = None
+
+    def startTracer(self, recover):
+        """
+        Starts up the tracer and its writer thread
+
+        :param recover: whether or not this is a recovery call (so whether or not the file should be appended to)
+        """
+        if self.filename is None:
+            self.verb_file = sys.stdout
+        elif recover:
+            self.verb_file = open(self.filename, 'a+')
+        else:
+            self.verb_file = open(self.filename, 'w')
+        self.running = True
+        self.writer = threading.Thread(target=self.writeLoop)
+        self.writer.daemon = True
+        self.writer.start()
+
+    def stopTracer(self):
+        """
+        Stop the writer thread after writing all buffered events, and flush the file
+        """
+        self.running = False
+        self.wakeup.set()
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        self.drain()
+        self.verb_file.flush()
+        if self.filename is not None:
+            self.verb_file.close()
+
+    def writeLoop(self):
+        """
+        Main loop of the writer thread
+        """
+        while self.running:
+            self.wakeup.wait(0.1)
+            self.wakeup.clear()
+            self.drain()
+
+    def drain(self):
+        """
+        Format and write all buffered events
+        """
+        with self.write_lock:
+            buffer = self.buffer
+            lines = []
+            while buffer:
+                lines.append(self.format(buffer.popleft()))
+            if lines:
+                self.verb_file.write("".join(lines))
+
+    def record(self, event):
+        """
+        Record an event, the only work done on the simulation thread
+
+        :param event: tuple describing the event
+        """
+        buffer = self.buffer
+        buffer.append(event)
+        size = len(buffer)
+        if size >= self.capacity:
+            # The writer can't keep up, so don't let the buffer grow any further
+            self.drain()
+        elif size % self.batch_size == 0:
+            self.wakeup.set()
+
+    def snapshotBag(self, bag):
+        """
+        Get the messages to record
+
+        :param bag: dictionary of the messages on every port
+        :returns: dict -- the strings of the messages on every port
+        """
+        return {port: [str(msg) for msg in messages] for port, messages in bag.items()}
+
+    def traceInternal(self, aDEVS):
+        """
+        Tracing done for the internal transition function
+
+        :param aDEVS: the model that transitioned
+        """
+        self.record((INTERNAL, aDEVS.time_last[0], aDEVS, 
+                     str(aDEVS.state), self.snapshotBag(aDEVS.my_output), aDEVS.time_next[0]))
+
+    def traceExternal(self, aDEVS):
+        """
+        Tracing done for the external transition function
+
+        :param aDEVS: the model that transitioned
+        """
+        self.record((EXTERNAL, aDEVS.time_last[0], aDEVS, 
+                     str(aDEVS.state), self.snapshotBag(aDEVS.my_input), aDEVS.time_next[0]))
+
+    def traceConfluent(self, aDEVS):
+        """
+        Tracing done for the confluent transition function
+
+        :param aDEVS: the model that transitioned
+        """
+        self.record((CONFLUENT, aDEVS.time_last[0], aDEVS, str(aDEVS.state), 
+                     (self.snapshotBag(aDEVS.my_input), self.snapshotBag(aDEVS.my_output)), aDEVS.time_next[0]))
+
+    def traceInit(self, aDEVS, t):
+        """
+        Tracing done for the initialisation
+
+        :param aDEVS: the model that was initialised
+        :param t: time at which it should be traced
+        """
+        self.record((INIT, t[0], aDEVS, str(aDEVS.state), None, aDEVS.time_next[0]))
+
+    def traceUser(self, time, aDEVS, variable, value):
+        """
+        Tracing done for a user change of a variable
+
+        :param time: the time at which the change happened
+        :param aDEVS: the model that was changed
+        :param variable: the attribute that was changed
+        :param value: the new value of the attribute
+        """
+        self.record((USER, time[0], aDEVS, None, (variable, str(value)), None))
+
+    def format(self, event):
+        """
+        Format a single event, like the verbose tracer does
+
+        :param event: the recorded event
+        :returns: string -- the text of the event
+        """
+        kind, time, aDEVS, state, ports, time_next = event
+        text = ""
+        if time != self.prevtime:
+            text += ("\n__  Current Time: %10.2f " + "_" * 42 + " \n\n") % time
+            self.prevtime = time
+        name = aDEVS.getModelFullName()
+        if kind == USER:
+            variable, value = ports
+            text += "\n"
+            text += "\tUSER CHANGE in model <%s>\n" % name
+            text += "\t\tAltered attribute <%s> to value <%s>\n" % (variable, value)
+            return text
+        text += "\n"
+        if kind == INIT:
+            text += "\tINITIAL CONDITIONS in model <%s>\n" % name
+        elif kind == INTERNAL:
+            text += "\tINTERNAL TRANSITION in model <%s>\n" % name
+        elif kind == EXTERNAL:
+            text += "\tEXTERNAL TRANSITION in model <%s>\n" % name
+        else:
+            text += "\tCONFLUENT TRANSITION in model <%s>\n" % name
+        if kind == EXTERNAL or kind == CONFLUENT:
+            my_input = ports[0] if kind == CONFLUENT else ports
+            text += "\t\tInput Port Configuration:\n"
+            for port in aDEVS.IPorts:
+                text += "\t\t\tport <%s>:\n" % port.getPortName()
+                for msg in my_input.get(port, []):
+                    text += "\t\t\t\t%s\n" % msg
+        text += "\t\tNew State: %s\n" % state
+        if kind == INTERNAL or kind == CONFLUENT:
+            my_output = ports[1] if kind == CONFLUENT else ports
+            text += "\t\tOutput Port Configuration:\n"
+            for port in aDEVS.OPorts:
+                text += "\t\t\tport <%s>:\n" % port.getPortName()
+                for msg in my_output.get(port, []):
+                    text += "\t\t\t\t%s\n" % msg
+        text += "\t\tNext scheduled internal transition at time %.2f\n" % time_next
+        return text
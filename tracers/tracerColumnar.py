@@ -0,0 +1,606 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Tracer writing a chunked columnar binary trace, and a memory-mapped reader for it
+
+A trace file starts with MAGIC, followed by a sequence of blocks. Every block starts with a BLOCK
+header holding its kind and the size of its payload:
+
+* MODELS: the full names of the models that were first seen since the previous MODELS block, with
+  their model ID in the trace. These IDs are numbered by the tracer in the order in which the models
+  first appear, so a model ID that the simulator reuses after a model was removed never mixes up two models.
+* VALUES: a chunk of the table of interned state and port values, holding consecutive value IDs
+* EVENTS: a chunk of events, with its number of events, time range and models, followed by
+  the events column by column, in the order of COLUMNS
+* INDEX: the offsets of all other blocks, as JSON
+
+Models and values are always written before the first events that refer to them. A complete
+file ends with the INDEX block and a TRAILER holding its offset and MAGIC again. If the trailer
+is missing, e.g. because the simulation crashed, the reader recovers all complete blocks by
+following the block headers. All numbers are little-endian.
+"""
+
+import array
+import bisect
+import json
+import mmap
+import struct
+import sys
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"PDEVSCT2"
+TRAILER = struct.Struct("<Q8s")
+BLOCK = struct.Struct("<4sQ")
+# Number of events, start time, end time and number of models of an EVENTS block
+EVENTS_HEADER = struct.Struct("<QddI")
+# First value ID and number of values of a VALUES block
+VALUES_HEADER = struct.Struct("<QI")
+# Model ID and length of the name of every entry in a MODELS block
+MODEL_ENTRY = struct.Struct("<iI")
+
+MODELS = b"MODS"
+VALUES = b"VALS"
+EVENTS = b"EVTS"
+INDEX = b"INDX"
+
+# Name, array typecode and NumPy dtype of every column
+COLUMNS = [("time", "d", "<f8"),
+           ("age", "q", "<i8"),
+           ("model", "i", "<i4"),
+           ("type", "b", "i1"),
+           ("state", "q", "<i8"),
+           ("ports", "q", "<i8")]
+
+INIT = 0
+INTERNAL = 1
+EXTERNAL = 2
+CONFLUENT = 3
+USER = 4
+
+BIG_ENDIAN = sys.byteorder == "big"
+
+def toBytes(column):
+    """
+    Get the little-endian bytes of an array
+
+    :param column: the array
+    :returns: bytes -- its contents
+    """
+    if BIG_ENDIAN:
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+def fromBytes(typecode, data):
+    """
+    Create an array from little-endian bytes
+
+    :param typecode: the typecode of the array
+    :param data: the bytes
+    :returns: array -- the array
+    """
+    column = array.array(typecode)
+    column.frombytes(data)
+    if BIG_ENDIAN:
+        column.byteswap()
+    return column
+
+class TracerColumnar(object):
+    """
+    A tracer writing all events in the columnar binary format. States and port values are
+    converted to strings and interned, so equal values are mostly stored only once: only the
+    most recently used values are remembered, so a value that was forgotten is stored again.
+
+    Only meant for local simulation, where traces are never rolled back. Enable it with:
+
+        sim.setCustomTracer("pypdevs.tracers.tracerColumnar", "TracerColumnar", [filename])
+    """
+    def __init__(self, uid, server, filename, chunk_size=65536, intern_size=65536):
+        """
+        Constructor
+
+        :param uid: the UID of this tracer
+        :param server: the server to make remote calls on
+        :param filename: file to save the trace to
+        :param chunk_size: the number of events per chunk, and the maximal number of values per chunk of values
+        :param intern_size: the number of values remembered for interning
+        """
+        self.server = server
+        self.uid = uid
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.intern_size = intern_size
+
+    def startTracer(self, recover):
+        """
+        Starts up the tracer
+
+        :param recover: whether or not this is a recovery call, which is not supported by this format
+        """
+        self.trace_file = open(self.filename, 'wb')
+        self.trace_file.write(MAGIC)
+        self.offset = len(MAGIC)
+        self.index = {"models": [], "values": [], "events": []}
+        self.trace_ids = {}
+        self.new_models = []
+        self.values = OrderedDict()
+        self.next_value_id = 0
+        self.new_values = []
+        self.newChunk()
+
+    def stopTracer(self):
+        """
+        Stop the tracer, writing the last chunk, the index and the trailer
+        """
+        self.writeChunk()
+        index_offset = self.offset
+        self.writeBlock(INDEX, [json.dumps(self.index).encode("utf-8")])
+        self.trace_file.write(TRAILER.pack(index_offset, MAGIC))
+        self.trace_file.close()
+
+    def writeBlock(self, kind, parts):
+        """
+        Write a block to the file
+
+        :param kind: the kind of the block
+        :param parts: list of the bytes of the payload
+        :returns: int -- the offset of the block
+        """
+        offset = self.offset
+        size = sum([len(part) for part in parts])
+        self.trace_file.write(BLOCK.pack(kind, size))
+        for part in parts:
+            self.trace_file.write(part)
+        self.offset += BLOCK.size + size
+        return offset
+
+    def writeModels(self):
+        """
+        Write the names of all new models
+        """
+        if not self.new_models:
+            return
+        parts = []
+        for model_id, name in self.new_models:
+            name = name.encode("utf-8")
+            parts.append(MODEL_ENTRY.pack(model_id, len(name)))
+            parts.append(name)
+        self.index["models"].append(self.writeBlock(MODELS, parts))
+        self.new_models = []
+
+    def writeValues(self):
+        """
+        Write all new values as a chunk of the value table
+        """
+        if not self.new_values:
+            return
+        data = [value.encode("utf-8") for value in self.new_values]
+        lengths = array.array("I", [len(value) for value in data])
+        first = self.next_value_id - len(data)
+        offset = self.writeBlock(VALUES, [VALUES_HEADER.pack(first, len(data)), toBytes(lengths)] + data)
+        self.index["values"].append([offset, first, len(data)])
+        self.new_values = []
+
+    def newChunk(self):
+        """
+        Start a new chunk
+        """
+        self.columns = [array.array(typecode) for _, typecode, _ in COLUMNS]
+        self.chunk_models = set()
+
+    def writeChunk(self):
+        """
+        Write the current chunk to the file, if it contains any events, preceded by the models and values it refers to
+        """
+        columns = self.columns
+        count = len(columns[0])
+        if count == 0:
+            return
+        self.writeModels()
+        self.writeValues()
+        times = columns[0]
+        start = min(times)
+        end = max(times)
+        models = array.array("i", sorted(self.chunk_models))
+        offset = self.writeBlock(EVENTS, [EVENTS_HEADER.pack(count, start, end, len(models)), toBytes(models)] +
+                                         [toBytes(column) for column in columns])
+        self.index["events"].append([offset, count, start, end])
+        self.newChunk()
+
+    def intern(self, value):
+        """
+        Get the ID of a value in the value table
+
+        :param value: the string to intern
+        :returns: int -- the ID of the value
+        """
+        values = self.values
+        try:
+            value_id = values[value]
+            values.move_to_end(value)
+            return value_id
+        except KeyError:
+            value_id = values[value] = self.next_value_id
+            self.next_value_id += 1
+            if len(values) > self.intern_size:
+                values.popitem(last=False)
+            self.new_values.append(value)
+            if len(self.new_values) >= self.chunk_size:
+                self.writeValues()
+            return value_id
+
+    def record(self, time, aDEVS, ttype, state, ports):
+        """
+        Record a single event
+
+        :param time: the time of the event as a (time, age) tuple
+        :param aDEVS: the model of the event
+        :param ttype: the type of the event
+        :param state: the string of the state, or None
+        :param ports: the string of the port values, or None
+        """
+        name = aDEVS.getModelFullName()
+        model_id = self.trace_ids.get(name)
+        if model_id is None:
+            model_id = self.trace_ids[name] = len(self.trace_ids)
+            self.new_models.append((model_id, name))
+        self.chunk_models.add(model_id)
+        columns = self.columns
+        columns[0].append(time[0])
+        columns[1].append(time[1])
+        columns[2].append(model_id)
+        columns[3].append(ttype)
+        columns[4].append(-1 if state is None else self.intern(state))
+        columns[5].append(-1 if ports is None else self.intern(ports))
+        if len(columns[0]) >= self.chunk_size:
+            self.writeChunk()
+
+    def portValues(self, ports, bag):
+        """
+        Convert the messages on ports to a string
+
+        :param ports: the ports to include
+        :param bag: dictionary of ports to their messages
+        :returns: string -- the port values
+        """
+        return str([(port.getPortName(), [str(msg) for msg in bag.get(port, [])]) 
+                    for port in ports])
+
+    def traceInternal(self, aDEVS):
+        """
+        Tracing done for the internal transition function
+
+        :param aDEVS: the model that transitioned
+        """
+        self.record(aDEVS.time_last, aDEVS, INTERNAL, str(aDEVS.state), 
+                    self.portValues(aDEVS.OPorts, aDEVS.my_output))
+
+    def traceExternal(self, aDEVS):
+        """
+        Tracing done for the external transition function
+
+        :param aDEVS: the model that transitioned
+        """
+        self.record(aDEVS.time_last, aDEVS, EXTERNAL, str(aDEVS.state), 
+                    self.portValues(aDEVS.IPorts, aDEVS.my_input))
+
+    def traceConfluent(self, aDEVS):
+        """
+        Tracing done for the confluent transition function
+
+        :param aDEVS: the model that transitioned
+        """
+        self.record(aDEVS.time_last, aDEVS, CONFLUENT, str(aDEVS.state), 
+                    self.portValues(aDEVS.IPorts, aDEVS.my_input) + 
+                    self.portValues(aDEVS.OPorts, aDEVS.my_output))
+
+    def traceInit(self, aDEVS, t):
+        """
+        Tracing done for the initialisation
+
+        :param aDEVS: the model that was initialised
+        :param t: time at which it should be traced
+        """
+        self.record(t, aDEVS, INIT, str(aDEVS.state), None)
+
+    def traceUser(self, time, aDEVS, variable, value):
+        """
+        Tracing done for a user change of a variable
+
+        :param time: the time at which the change happened
+        :param aDEVS: the model that was changed
+        :param variable: the attribute that was changed
+        :param value: the new value of the attribute
+        """
+        self.record(time, aDEVS, USER, None, "%s=%s" % (variable, value))
+
+class ColumnarTraceReader(object):
+    """
+    Reader for the columnar binary trace format. The file is memory-mapped, and only the index is
+    read when opening it. Model names are read when first needed, chunks of events only when they
+    can contain matching events, and chunks of values only when one of their values is needed.
+    """
+    def __init__(self, filename, value_cache=16):
+        """
+        Constructor
+
+        :param filename: the trace file to read
+        :param value_cache: the number of chunks of values to keep decoded
+        """
+        self.trace_file = open(filename, 'rb')
+        self.data = mmap.mmap(self.trace_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a columnar trace file: %s" % filename)
+        self.index = self.readIndex()
+        if self.index is None:
+            self.index = self.recoverIndex()
+            self.complete = False
+        else:
+            self.complete = True
+        self.value_firsts = [first for _, first, _ in self.index["values"]]
+        self.value_cache = value_cache
+        self.value_chunks = OrderedDict()
+        self.names = None
+
+    def close(self):
+        """
+        Close the trace file
+        """
+        self.data.close()
+        self.trace_file.close()
+
+    def readIndex(self):
+        """
+        Read the index of a complete trace file
+
+        :returns: dict -- the index, or None if the trailer is missing
+        """
+        data = self.data
+        if len(data) < len(MAGIC) + BLOCK.size + TRAILER.size:
+            return None
+        offset, magic = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+        if magic != MAGIC or offset + BLOCK.size > len(data) - TRAILER.size:
+            return None
+        kind, size = BLOCK.unpack_from(data, offset)
+        if kind != INDEX or offset + BLOCK.size + size != len(data) - TRAILER.size:
+            return None
+        return json.loads(data[offset + BLOCK.size:offset + BLOCK.size + size].decode("utf-8"))
+
+    def recoverIndex(self):
+        """
+        Rebuild the index by following the block headers, up to the first incomplete block
+
+        :returns: dict -- the index of all complete blocks
+        """
+        data = self.data
+        index = {"models": [], "values": [], "events": []}
+        offset = len(MAGIC)
+        while offset + BLOCK.size <= len(data):
+            kind, size = BLOCK.unpack_from(data, offset)
+            if offset + BLOCK.size + size > len(data):
+                # Cut off while writing
+                break
+            payload = offset + BLOCK.size
+            if kind == MODELS:
+                index["models"].append(offset)
+            elif kind == VALUES:
+                first, count = VALUES_HEADER.unpack_from(data, payload)
+                index["values"].append([offset, first, count])
+            elif kind == EVENTS:
+                count, start, end, _ = EVENTS_HEADER.unpack_from(data, payload)
+                index["events"].append([offset, count, start, end])
+            else:
+                break
+            offset = payload + size
+        return index
+
+    @property
+    def model_names(self):
+        """
+        The full name of every model, by model ID
+        """
+        if self.names is None:
+            data = self.data
+            self.names = {}
+            for offset in self.index["models"]:
+                _, size = BLOCK.unpack_from(data, offset)
+                position = offset + BLOCK.size
+                end = position + size
+                while position < end:
+                    model_id, length = MODEL_ENTRY.unpack_from(data, position)
+                    position += MODEL_ENTRY.size
+                    self.names[model_id] = data[position:position + length].decode("utf-8")
+                    position += length
+        return self.names
+
+    def value(self, value_id):
+        """
+        Get an interned state or port value
+
+        :param value_id: the ID of the value, as stored in the state and ports columns
+        :returns: string -- the value, or None for ID -1
+        """
+        if value_id == -1:
+            return None
+        chunk = bisect.bisect_right(self.value_firsts, value_id) - 1
+        try:
+            values = self.value_chunks[chunk]
+            self.value_chunks.move_to_end(chunk)
+        except KeyError:
+            offset, first, count = self.index["values"][chunk]
+            position = offset + BLOCK.size + VALUES_HEADER.size
+            lengths = fromBytes("I", self.data[position:position + 4 * count])
+            position += 4 * count
+            values = []
+            for length in lengths:
+                values.append(self.data[position:position + length].decode("utf-8"))
+                position += length
+            self.value_chunks[chunk] = values
+            if len(self.value_chunks) > self.value_cache:
+                self.value_chunks.popitem(last=False)
+        return values[value_id - self.value_firsts[chunk]]
+
+    def chunkModels(self, chunk):
+        """
+        Get the models with events in a chunk
+
+        :param chunk: the index entry of the chunk
+        :returns: array -- the model IDs
+        """
+        position = chunk[0] + BLOCK.size
+        model_count = EVENTS_HEADER.unpack_from(self.data, position)[3]
+        position += EVENTS_HEADER.size
+        return fromBytes("i", self.data[position:position + 4 * model_count])
+
+    def resolveModels(self, models):
+        """
+        Convert model names or IDs to a set of model IDs
+
+        :param models: iterable of model names or IDs, or None for all models
+        :returns: set -- the model IDs, or None for all models
+        """
+        if models is None:
+            return None
+        model_ids = {name: model_id for model_id, name in self.model_names.items()}
+        return set([model_ids.get(m, -1) if isinstance(m, str) else m for m in models])
+
+    def selectChunks(self, model_ids, start, end):
+        """
+        Find the chunks that can contain matching events, based on the index and the chunk headers only
+
+        :param model_ids: set of model IDs, or None for all models
+        :param start: the start of the time window, or None
+        :param end: the end of the time window, or None
+        :returns: list -- the index entries of the chunks, as offset, number of events, start and end time
+        """
+        selected = []
+        for chunk in self.index["events"]:
+            if start is not None and chunk[3] < start:
+                continue
+            if end is not None and chunk[2] > end:
+                continue
+            if model_ids is not None and model_ids.isdisjoint(self.chunkModels(chunk)):
+                continue
+            selected.append(chunk)
+        return selected
+
+    def columnOffset(self, chunk):
+        """
+        Get the offset of the first column of a chunk
+
+        :param chunk: the index entry of the chunk
+        :returns: int -- the offset
+        """
+        position = chunk[0] + BLOCK.size
+        model_count = EVENTS_HEADER.unpack_from(self.data, position)[3]
+        return position + EVENTS_HEADER.size + 4 * model_count
+
+    def readColumns(self, chunk):
+        """
+        Read all columns of a chunk as arrays
+
+        :param chunk: the index entry of the chunk
+        :returns: list -- an array for every column
+        """
+        offset = self.columnOffset(chunk)
+        count = chunk[1]
+        columns = []
+        for _, typecode, _ in COLUMNS:
+            size = count * array.array(typecode).itemsize
+            columns.append(fromBytes(typecode, self.data[offset:offset + size]))
+            offset += size
+        return columns
+
+    def events(self, models=None, start=None, end=None):
+        """
+        Iterate over the events, optionally filtered on models and a time window (both bounds inclusive)
+
+        :param models: iterable of model names or IDs, or None for all models
+        :param start: the start of the time window, or None
+        :param end: the end of the time window, or None
+        :returns: generator -- tuples of time, age, model name, transition type, state and port values
+        """
+        model_ids = self.resolveModels(models)
+        names = self.model_names
+        value = self.value
+        for chunk in self.selectChunks(model_ids, start, end):
+            times, ages, ids, types, states, ports = self.readColumns(chunk)
+            for i in range(chunk[1]):
+                time = times[i]
+                if start is not None and time < start:
+                    continue
+                if end is not None and time > end:
+                    continue
+                if model_ids is not None and ids[i] not in model_ids:
+                    continue
+                yield (time, 
+                       ages[i], 
+                       names[ids[i]], 
+                       types[i], 
+                       value(states[i]), 
+                       value(ports[i]))
+
+    def replay(self, callback, models=None, start=None, end=None):
+        """
+        Call a function for every (matching) event, in the order of the trace
+
+        :param callback: function accepting the arguments of an event tuple, as produced by events
+        :param models: iterable of model names or IDs, or None for all models
+        :param start: the start of the time window, or None
+        :param end: the end of the time window, or None
+        """
+        for event in self.events(models, start, end):
+            callback(*event)
+
+    def toNumpy(self, models=None, start=None, end=None):
+        """
+        Export the (matching) events as NumPy arrays, without converting them to Python objects.
+        States and port values are returned as value IDs, which can be resolved with *value*, or -1.
+
+        :param models: iterable of model names or IDs, or None for all models
+        :param start: the start of the time window, or None
+        :param end: the end of the time window, or None
+        :returns: dict -- mapping every column name to a NumPy array
+        """
+        if np is None:
+            raise ImportError("NumPy is required to export a trace to NumPy arrays")
+        model_ids = self.resolveModels(models)
+        parts = {name: [] for name, _, _ in COLUMNS}
+        for chunk in self.selectChunks(model_ids, start, end):
+            offset = self.columnOffset(chunk)
+            count = chunk[1]
+            columns = {}
+            for name, _, dtype in COLUMNS:
+                columns[name] = np.frombuffer(self.data, dtype=dtype, count=count, offset=offset)
+                offset += columns[name].nbytes
+            mask = np.ones(count, dtype=bool)
+            if start is not None:
+                mask &= columns["time"] >= start
+            if end is not None:
+                mask &= columns["time"] <= end
+            if model_ids is not None:
+                mask &= np.isin(columns["model"], list(model_ids))
+            for name in columns:
+                # Copy, so the arrays remain valid after closing the reader
+                parts[name].append(columns[name][mask])
+        return {name: (np.concatenate(parts[name]) if parts[name] 
+                       else np.zeros(0, dtype=dtype))
+                for name, _, dtype in COLUMNS}
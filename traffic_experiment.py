@@ -57,6 +57,10 @@ sim.setTerminationTime(400.0)
 #    pass None for stdout, or a filename for writing to that file
 sim.setVerbose(None)
 
+#    The same trace can be formatted and written by a background thread instead,
+#    while the simulation only records the strings of the new states and messages:
+#sim.setCustomTracer("pypdevs.tracers.tracerBuffered", "TracerBuffered", [None])
+
 # C. Use Classic DEVS instead of Parallel DEVS
 #    If your model uses Classic DEVS, this configuration MUST be set as
 #    otherwise errors are guaranteed to happen.
@@ -284,6 +284,9 @@ class TrafficSystem(CoupledDEVS):
         # Only connect ...
         self.connectPorts(self.policeman.OUT, self.trafficLight.INTERRUPT)
 
+        # Static priority used instead of 'select', equivalent to it
+        self.select_order = [self.policeman, self.trafficLight]
+
     def select(self, immChildren):
         """
         Choose a model to transition from all possible models.
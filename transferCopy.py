@@ -0,0 +1,145 @@
+# Copyright 2014 Modelling, Simulation and Design Lab (MSDL) at
+# McGill University and the University of Antwerp (http://msdl.cs.mcgill.ca/)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Copy policies for the messages that are passed to transfer functions
+"""
+
+import copy
+import pickle
+
+from pypdevs.util import DEVSException
+from pypdevs.messageFreezer import IMMUTABLE_TYPES, FrozenDict
+
+# The transfer function does not modify its argument, so no copy is needed
+COPY_NONE = "none"
+# copy.copy
+COPY_SHALLOW = "shallow"
+# The __copy__ method of the message itself
+COPY_METHOD = "__copy__"
+# copy.deepcopy
+COPY_DEEP = "deepcopy"
+# A pickle round trip, the behaviour when no policy is declared
+COPY_PICKLE = "pickle"
+# Pick one of the above based on the type of the message
+COPY_AUTO = "auto"
+
+class TransferFunction(object):
+    """
+    A transfer function with a declared copy policy, to be passed to connectPorts:
+
+        self.connectPorts(a.OUT, b.IN, TransferFunction(f, COPY_NONE))
+
+    The copy policy is lost when transfer functions of several levels in the hierarchy are composed,
+    in which case the automatic policy is used.
+    """
+    def __init__(self, function, copy_policy=COPY_AUTO):
+        """
+        Constructor
+
+        :param function: the actual transfer function
+        :param copy_policy: one of the COPY_* constants
+        """
+        if copy_policy not in COPIERS:
+            raise DEVSException("Unknown copy policy: %s" % copy_policy)
+        self.function = function
+        self.copy_policy = copy_policy
+
+    def __call__(self, msg):
+        return self.function(msg)
+
+def identity(msg):
+    """
+    Don't copy a message at all.
+
+    :param msg: the message
+    :returns: the message itself
+    """
+    return msg
+
+def pickleCopy(msg):
+    """
+    Copy a message by means of a pickle round trip.
+
+    :param msg: the message to copy
+    :returns: the copy
+    """
+    return pickle.loads(pickle.dumps(msg, pickle.HIGHEST_PROTOCOL))
+
+def isImmutable(msg):
+    """
+    Checks whether or not a message can safely be shared without copying.
+
+    :param msg: the message to check
+    :returns: bool -- whether or not the message is immutable
+    """
+    if isinstance(msg, IMMUTABLE_TYPES) or type(msg) is FrozenDict:
+        # Frozen dictionaries only contain frozen values
+        return True
+    elif type(msg) is tuple:
+        for m in msg:
+            if not isImmutable(m):
+                return False
+        return True
+    return False
+
+# Copy functions per message type, filled in as types are encountered
+auto_copiers = {}
+
+def autoCopy(msg):
+    """
+    Copy a message with the cheapest method that is still safe for its type.
+
+    :param msg: the message to copy
+    :returns: the copy, or the message itself if it is immutable
+    """
+    msg_type = type(msg)
+    copier = auto_copiers.get(msg_type)
+    if copier is not None:
+        return copier(msg)
+    if issubclass(msg_type, IMMUTABLE_TYPES) or msg_type is FrozenDict:
+        copier = auto_copiers[msg_type] = identity
+    elif msg_type is tuple:
+        # Depends on the contents, so can't be cached
+        return msg if isImmutable(msg) else pickleCopy(msg)
+    elif hasattr(msg_type, "__deepcopy__"):
+        copier = auto_copiers[msg_type] = copy.deepcopy
+    else:
+        copier = auto_copiers[msg_type] = pickleCopy
+    return copier(msg)
+
+COPIERS = {COPY_NONE: None,
+           COPY_SHALLOW: copy.copy,
+           COPY_METHOD: lambda msg: msg.__copy__(),
+           COPY_DEEP: copy.deepcopy,
+           COPY_PICKLE: pickleCopy,
+           COPY_AUTO: autoCopy}
+
+def resolveTransfer(z, msg_copy):
+    """
+    Resolve the function to call and the copy function to use for a transfer function.
+
+    :param z: the transfer function of a connection, possibly a TransferFunction
+    :param msg_copy: the message copy mode of the simulation
+    :returns: tuple -- the function to call and the copy function, which is None if no copy is needed
+    """
+    policy = getattr(z, "copy_policy", COPY_AUTO)
+    if isinstance(z, TransferFunction):
+        # Skip the additional call
+        z = z.function
+    if msg_copy == 3 and policy == COPY_AUTO:
+        # Frozen messages can't be modified by the transfer function anyway
+        return z, None
+    return z, COPIERS[policy]